@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -36,6 +37,8 @@ INSTALLED_APPS = [
     'watermark_tools',
     'qr_tools',
     'security_center',
+    'jobs',
+    'core',
 ]
 
 MIDDLEWARE = [
@@ -48,7 +51,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'youtube_converter.middleware.FileCleanupMiddleware',
 ]
 
 ROOT_URLCONF = 'compress_website.urls'
@@ -124,6 +126,14 @@ if DEBUG:
 else:
     CORS_ALLOW_ALL_ORIGINS = False
 
+# Result details sent as headers on file downloads
+CORS_EXPOSE_HEADERS = [
+    'X-Compression-Format',
+    'X-Compression-Quality',
+    'X-Compression-Scale',
+    'X-Target-Size-Met',
+]
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -139,6 +149,49 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background jobs
+# 'process' runs jobs in a local pool of worker processes started by the web server,
+# 'database' leaves them in the job table for `python manage.py run_jobs`
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'process')
+JOB_QUEUE_WORKERS = int(os.getenv('JOB_QUEUE_WORKERS', '2'))
+JOB_QUEUE_POLL_INTERVAL = float(os.getenv('JOB_QUEUE_POLL_INTERVAL', '1.0'))
+JOB_STORAGE_ROOT = MEDIA_ROOT / 'jobs'
+JOB_RETENTION = int(os.getenv('JOB_RETENTION_HOURS', '24')) * 3600  # Finished jobs and their files are deleted after this
+JOB_MAX_RUNTIME = int(os.getenv('JOB_MAX_RUNTIME', '3600'))  # Seconds before a processing job counts as interrupted
+JOB_REQUEUE_AFTER = 300  # Seconds before a pending job is submitted again (process backend)
+JOB_JANITOR_INTERVAL = 300  # Seconds between stale/expired job sweeps (0 disables them)
+
+# Process pool for CPU-bound image operations (0 runs them on the request thread)
+IMAGE_POOL_WORKERS = int(os.getenv('IMAGE_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMAGE_POOL_QUEUE_FACTOR = 4  # In-flight operations allowed per worker before requests wait
+
+# PDF engine: 'auto' uses PyMuPDF when installed and falls back to PyPDF2
+PDF_BACKEND = os.getenv('PDF_BACKEND', 'auto')
+
+# Page ranges of a PDF-to-image conversion rendered at once in the image pool (1 renders serially)
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Content-addressed cache of processing results (0 disables it)
+RESULT_CACHE_DIR = Path(os.getenv('RESULT_CACHE_DIR', str(BASE_DIR / 'cache' / 'results')))
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+# Batch image compression: files per request (uploaded or inside a ZIP) and uncompressed ZIP content
+COMPRESSION_BATCH_MAX_FILES = int(os.getenv('COMPRESSION_BATCH_MAX_FILES', '500'))
+COMPRESSION_BATCH_MAX_BYTES = int(os.getenv('COMPRESSION_BATCH_MAX_MB', '2048')) * 1024 * 1024
+
+# Per-request scratch directories, removed when the response is closed
+SCRATCH_DIR = Path(os.getenv('SCRATCH_DIR', os.path.join(tempfile.gettempdir(), 'easy_document_scratch')))
+SCRATCH_MAX_BYTES = int(os.getenv('SCRATCH_MAX_MB', '4096')) * 1024 * 1024  # New requests get 503 above this (0: no limit)
+SCRATCH_ORPHAN_AGE = int(os.getenv('SCRATCH_ORPHAN_AGE', '3600'))  # Seconds before a leftover directory is removed
+SCRATCH_JANITOR_INTERVAL = 300  # Seconds between orphan sweeps in each process (0 disables the thread)
+SCRATCH_RETRY_AFTER = 5  # Retry-After seconds sent with 503 while scratch is full
+
+# Background editor sessions: decoded images kept in memory between edits
+EDIT_SESSION_MAX_BYTES = int(os.getenv('EDIT_SESSION_MAX_MB', '1024')) * 1024 * 1024
+EDIT_SESSION_TTL = int(os.getenv('EDIT_SESSION_TTL', '1800'))  # Seconds idle before a session is dropped
+EDIT_SESSION_UNDO_DEPTH = 20
+EDIT_SESSION_PREVIEW_SIZE = 1024  # Longest side of preview tiles, in pixels
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -157,6 +210,8 @@ if not DEBUG:
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+DATA_UPLOAD_MAX_NUMBER_FILES = COMPRESSION_BATCH_MAX_FILES
+IMAGE_MAX_PIXELS = int(float(os.getenv('IMAGE_MAX_MEGAPIXELS', '100')) * 1_000_000)  # Width x height; larger images are refused from their header
 
 # Logging
 LOGGING = {
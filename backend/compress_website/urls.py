@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/security/', include('security_center.urls')),
     path('api/watermark/', include('watermark_tools.urls')),
     path('api/qr-tools/', include('qr_tools.urls')),
+    path('api/jobs/', include('jobs.urls')),
     path('api/stats/', include('compression.api_urls')),  # Untuk statistik
 ]
 
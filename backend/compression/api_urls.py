@@ -1,7 +1,9 @@
 from django.urls import path
-from .api_views import get_stats, track_operation
+from .api_views import get_stats, track_operation, result_cache_stats, scratch_stats
 
 urlpatterns = [
     path('', get_stats, name='get_stats'),
     path('track/', track_operation, name='track_operation'),
+    path('cache/', result_cache_stats, name='result_cache_stats'),
+    path('scratch/', scratch_stats, name='scratch_stats'),
 ]
@@ -3,6 +3,8 @@ from rest_framework.response import Response
 from django.db.models import Sum, Count
 from django.utils import timezone
 from datetime import timedelta
+from core.result_cache import get_stats as get_result_cache_stats
+from core.scratch import get_scratch_space
 from .models import CompressionHistory, UserStats, FileProcessingStats
 
 @api_view(['GET'])
@@ -101,3 +103,23 @@ def track_operation(request):
         
     except Exception as e:
         return Response({'status': 'error', 'message': str(e)})
+
+@api_view(['GET'])
+def result_cache_stats(request):
+    """
+    Hit/miss counters and size of the processing result cache
+    """
+    try:
+        return Response(get_result_cache_stats())
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def scratch_stats(request):
+    """
+    Bytes held in request scratch directories and this process's open/release counters
+    """
+    try:
+        return Response(get_scratch_space().stats())
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
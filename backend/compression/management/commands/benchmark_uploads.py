@@ -0,0 +1,90 @@
+import io
+import os
+import numpy as np
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from compression.views import ImageCompressionView, PDFCompressionView
+
+
+def _bytes_written():
+    """Bytes this process has passed to write() so far (Linux only)"""
+    with open('/proc/self/io') as f:
+        for line in f:
+            if line.startswith('wchar:'):
+                return int(line.split()[1])
+    raise RuntimeError("wchar missing from /proc/self/io")
+
+
+def _synthetic_jpeg(megapixels, seed=0):
+    rng = np.random.default_rng(seed)
+    width = int(round(np.sqrt(megapixels * 1e6 * 4 / 3)))
+    height = int(round(width * 3 / 4))
+    pixels = rng.normal(128, 40, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def _synthetic_pdf(pages, image_data):
+    import fitz
+
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {number + 1}", fontsize=24)
+        page.insert_image(fitz.Rect(72, 100, 540, 700), stream=image_data)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class Command(BaseCommand):
+    help = "Count the bytes written to disk per image/PDF compression request, in memory and spooled"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, default=4, help='Size of the test image')
+        parser.add_argument('--pages', type=int, default=10, help='Pages of the test PDF')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/io'):
+            self.stderr.write("Needs Linux /proc/self/io to count written bytes")
+            return
+
+        image_data = _synthetic_jpeg(options['megapixels'])
+        cases = [('image', ImageCompressionView, 'image', 'photo.jpg', image_data, {'quality': 70})]
+        try:
+            cases.append(('pdf', PDFCompressionView, 'pdf', 'document.pdf',
+                          _synthetic_pdf(options['pages'], image_data), {'compression_level': 'high'}))
+        except ImportError:
+            self.stderr.write("PyMuPDF not installed, skipping the PDF case")
+
+        factory = RequestFactory()
+        self.stdout.write(f"\n{'request':<10}{'upload':<10}{'input (KB)':>12}{'output (KB)':>13}"
+                          f"{'written (KB)':>14}{'processing (KB)':>17}")
+
+        # Pool and result cache off: every write happens in this process and on this request
+        for spooled in (False, True):
+            memory_limit = 0 if spooled else 1 << 40
+            with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=memory_limit, IMAGE_POOL_WORKERS=0,
+                                   RESULT_CACHE_MAX_BYTES=0):
+                for label, view, field, filename, data, params in cases:
+                    request = factory.post('/', {field: SimpleUploadedFile(filename, data), **params})
+
+                    before = _bytes_written()
+                    response = view.as_view()(request)
+                    output = b''.join(response.streaming_content) if response.status_code == 200 else b''
+                    response.close()
+                    written = _bytes_written() - before
+
+                    if response.status_code != 200:
+                        self.stderr.write(f"{label}: HTTP {response.status_code} {getattr(response, 'data', '')}")
+                        continue
+
+                    # Django itself writes a spooled upload once; the rest is ours (output, history row)
+                    processing = written - (len(data) if spooled else 0)
+                    self.stdout.write(f"{label:<10}{'spooled' if spooled else 'memory':<10}"
+                                      f"{len(data) / 1024:>12.0f}{len(output) / 1024:>13.0f}"
+                                      f"{written / 1024:>14.0f}{processing / 1024:>17.0f}")
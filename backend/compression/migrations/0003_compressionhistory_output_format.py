@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compression', '0002_fileprocessingstats_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compressionhistory',
+            name='output_format',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -13,6 +13,7 @@ class CompressionHistory(models.Model):
     original_size = models.BigIntegerField()
     compressed_size = models.BigIntegerField()
     compression_ratio = models.DecimalField(max_digits=5, decimal_places=2)
+    output_format = models.CharField(max_length=10, blank=True, default='')
     ip_address = models.GenericIPAddressField()
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -1,9 +1,39 @@
 from rest_framework import serializers
 from .models import CompressionHistory
+from core.encoding import ENCODE_PROFILES
 
-class ImageCompressionSerializer(serializers.Serializer):
-    image = serializers.ImageField()
+class ImageCompressionOptionsSerializer(serializers.Serializer):
     quality = serializers.IntegerField(min_value=10, max_value=95, default=75)
+    encode_profile = serializers.ChoiceField(choices=list(ENCODE_PROFILES), default='smallest')
+    # auto picks the smallest of the formats suited to the image (photo, graphic, transparent)
+    output_format = serializers.ChoiceField(choices=['jpeg', 'webp', 'avif', 'png', 'auto'], default='jpeg')
+    # Search quality for the largest output under this size instead of using quality as is
+    target_size_kb = serializers.IntegerField(min_value=1, required=False)
+    # Omitted multipart booleans read as False, so null means "not given" (downscaling allowed)
+    allow_downscale = serializers.BooleanField(allow_null=True, default=None)
+    
+    def validate_output_format(self, value):
+        # The encoders and IMAGE_SUFFIXES use Pillow's upper-case format names
+        return value.upper()
+    
+    def validate(self, data):
+        if data.get('target_size_kb') and data['output_format'] == 'PNG':
+            raise serializers.ValidationError("target_size_kb needs a lossy output_format (jpeg, webp, avif or auto)")
+        return data
+
+class ImageCompressionSerializer(ImageCompressionOptionsSerializer):
+    image = serializers.ImageField()
+
+class BatchImageCompressionSerializer(ImageCompressionOptionsSerializer):
+    # Many files under the same field name, or one ZIP of images
+    images = serializers.ListField(child=serializers.FileField(), required=False)
+    archive = serializers.FileField(required=False)
+    
+    def validate(self, data):
+        data = super().validate(data)
+        if not data.get('images') and not data.get('archive'):
+            raise serializers.ValidationError("Provide images or a ZIP archive")
+        return data
     
 class PDFCompressionSerializer(serializers.Serializer):
     pdf = serializers.FileField()
@@ -0,0 +1,44 @@
+import os
+import shutil
+from jobs.registry import register_task
+from .models import CompressionHistory
+from .utils import compress_pdf, get_file_size, calculate_compression_ratio
+
+
+@register_task('pdf_compress')
+def compress_pdf_task(job, progress):
+    """Compress the uploaded PDF of a job"""
+    input_file = job.input_files[0]
+    compression_level = job.params.get('compression_level', 'medium')
+
+    progress(10, 'Compressing PDF')
+    compressed_path = compress_pdf(input_file['path'], compression_level)
+
+    output_filename = f"compressed_{input_file['name']}"
+    output_path = os.path.join(job.output_dir, output_filename)
+    shutil.move(compressed_path, output_path)
+
+    original_size = get_file_size(input_file['path'])
+    compressed_size = get_file_size(output_path)
+    ratio = calculate_compression_ratio(original_size, compressed_size)
+
+    CompressionHistory.objects.create(
+        file_type='pdf',
+        original_filename=input_file['name'],
+        compressed_filename=output_filename,
+        original_size=original_size,
+        compressed_size=compressed_size,
+        compression_ratio=ratio,
+        ip_address=job.ip_address or '0.0.0.0'
+    )
+
+    return {
+        'output_path': output_path,
+        'output_filename': output_filename,
+        'content_type': 'application/pdf',
+        'result': {
+            'original_size': original_size,
+            'compressed_size': compressed_size,
+            'compression_ratio': ratio,
+        }
+    }
@@ -0,0 +1,115 @@
+import io
+import os
+import pickle
+import unittest
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+import numpy as np
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from core import process_pool
+from .views import ImageCompressionView, BatchImageCompressionView
+from .management.commands.benchmark_uploads import _bytes_written, _synthetic_jpeg
+
+# Largest pickled call or result allowed through the pool's pipe once image bytes use shared memory
+PIPE_PAYLOAD_LIMIT = 4096
+
+# Room for everything a request writes besides its output (history row, scratch bookkeeping)
+WRITE_SLACK = 16 * 1024
+
+
+def _response_bytes(response):
+    data = b''.join(response.streaming_content)
+    response.close()
+    return data
+
+
+@override_settings(RESULT_CACHE_MAX_BYTES=0)
+class UploadHandOffTests(TestCase):
+    """Compression requests neither copy uploads to disk nor pickle them to the worker pool"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.image_data = _synthetic_jpeg(1)
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        if process_pool._pool is not None:
+            process_pool._reset_pool(process_pool._pool)
+
+    def _compress(self, **params):
+        request = self.factory.post('/', {
+            'image': SimpleUploadedFile('photo.jpg', self.image_data), 'quality': 70, **params
+        })
+        return ImageCompressionView.as_view()(request)
+
+    def _written_by_request(self):
+        before = _bytes_written()
+        response = self._compress()
+        self.assertEqual(response.status_code, 200)
+        output = _response_bytes(response)
+        return _bytes_written() - before, output
+
+    @unittest.skipUnless(os.path.exists('/proc/self/io'), "needs Linux /proc/self/io")
+    @override_settings(IMAGE_POOL_WORKERS=0, FILE_UPLOAD_MAX_MEMORY_SIZE=1 << 40)
+    def test_in_memory_upload_writes_only_the_output(self):
+        written, output = self._written_by_request()
+        self.assertLess(written, len(output) + WRITE_SLACK)
+
+    @unittest.skipUnless(os.path.exists('/proc/self/io'), "needs Linux /proc/self/io")
+    @override_settings(IMAGE_POOL_WORKERS=0, FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_spooled_upload_is_not_copied(self):
+        written, output = self._written_by_request()
+        # Django writes the spooled upload once; nothing else copies it
+        self.assertLess(written - len(self.image_data), len(output) + WRITE_SLACK)
+
+    @override_settings(IMAGE_POOL_WORKERS=1, FILE_UPLOAD_MAX_MEMORY_SIZE=1 << 40)
+    def test_pool_gets_image_bytes_through_shared_memory(self):
+        submit = ProcessPoolExecutor.submit
+        calls = []
+
+        def recording_submit(executor, func, *args, **kwargs):
+            future = submit(executor, func, *args, **kwargs)
+            calls.append((len(pickle.dumps((func, args, kwargs))), future))
+            return future
+
+        with mock.patch.object(ProcessPoolExecutor, 'submit', recording_submit):
+            response = self._compress()
+            self.assertEqual(response.status_code, 200)
+            Image.open(io.BytesIO(_response_bytes(response))).verify()
+
+            response = self._compress(target_size_kb=40)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(_response_bytes(response)), 40 * 1024)
+
+            uploads = [SimpleUploadedFile(f'photo{i}.jpg', self.image_data) for i in range(3)]
+            request = self.factory.post('/', {'images': uploads, 'quality': 70})
+            response = BatchImageCompressionView.as_view()(request)
+            self.assertEqual(response.status_code, 200)
+            archive = zipfile.ZipFile(io.BytesIO(_response_bytes(response)))
+            self.assertEqual(len([name for name in archive.namelist() if name.endswith('.jpg')]), 3)
+
+        compressions = [(size, future) for size, future in calls if future.result() is not True]
+        self.assertEqual(len(compressions), 5)
+        for size, future in compressions:
+            self.assertLess(size, PIPE_PAYLOAD_LIMIT)
+            self.assertLess(len(pickle.dumps(future.result())), PIPE_PAYLOAD_LIMIT)
+
+    def test_shared_memory_blocks_are_released(self):
+        def shared_blocks():
+            return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')}
+
+        if not os.path.isdir('/dev/shm'):
+            self.skipTest("needs /dev/shm to list shared memory blocks")
+        data = np.arange(1 << 16, dtype=np.uint8).tobytes()
+        before = shared_blocks()
+        with override_settings(IMAGE_POOL_WORKERS=1):
+            results = list(process_pool.imap_in_pool(bytes, [(data,), (data[:10],)], buffer_arg=0))
+            self.assertEqual(process_pool.run_on_buffer(bytes, data), data)
+        self.assertEqual(results, [data, data[:10]])
+        self.assertEqual(shared_blocks() - before, set())
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import ImageCompressionView, PDFCompressionView, CompressionHistoryView
+from .views import ImageCompressionView, BatchImageCompressionView, PDFCompressionView, CompressionHistoryView
 
 urlpatterns = [
     path('image/', ImageCompressionView.as_view(), name='compress-image'),
+    path('image/batch/', BatchImageCompressionView.as_view(), name='compress-image-batch'),
     path('pdf/', PDFCompressionView.as_view(), name='compress-pdf'),
     path('history/', CompressionHistoryView.as_view(), name='compression-history'),
 ]
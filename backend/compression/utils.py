@@ -1,71 +1,421 @@
 import os
+import math
 import tempfile
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image, features
 from PyPDF2 import PdfReader, PdfWriter
 import io
+from core.result_cache import cached_result
+from core.encoding import encode_image
+from core.imaging import open_image
 
-def compress_image(image_file, quality=75):
+# Target-size search: quality range, encode budget and how close under the target is good enough
+TARGET_QUALITY_MIN = 10
+TARGET_QUALITY_MAX = 95
+TARGET_MAX_ENCODES = 8
+# Extra encodes spent growing a downscaled result back up to the tolerance band
+TARGET_MAX_SCALE_ENCODES = 6
+TARGET_TOLERANCE = 0.05
+# Assumed growth of log(size) per quality step until two probes give the real slope
+DEFAULT_LOG_SIZE_SLOPE = 0.03
+# Assumed size ~ pixels ** exponent (detail per pixel grows as an image shrinks)
+DEFAULT_PIXEL_EXPONENT = 0.8
+MIN_DOWNSCALE_SIDE = 16
+
+IMAGE_SUFFIXES = {'JPEG': '.jpg', 'WEBP': '.webp', 'AVIF': '.avif', 'PNG': '.png'}
+
+# Auto format: the two most promising encodings per image class
+AUTO_CANDIDATES = {
+    'photo': ['JPEG', 'AVIF'],
+    'transparent': ['WEBP', 'AVIF'],
+    'graphic': ['PNG', 'WEBP_LOSSLESS'],
+}
+LOSSLESS_CANDIDATES = ('PNG', 'WEBP_LOSSLESS')
+AUTO_THUMBNAIL_SIDE = 256
+# Share of identical neighbouring thumbnail pixels from which an image counts as flat graphics
+AUTO_FLAT_SHARE = 0.5
+# Lossy candidates must keep this SSIM against the original (luma, at most 1024 px) to be chosen
+AUTO_SSIM_FLOOR = 0.95
+AUTO_SSIM_SIDE = 1024
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+def _prepare_for_format(image, output_format):
+    """Convert image to a mode output_format can store; JPEG gets transparency flattened onto white"""
+    has_alpha = _has_alpha(image)
+    if output_format in ('WEBP', 'AVIF') and has_alpha:
+        return image.convert('RGBA')
+    if has_alpha:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+def classify_image(image):
+    """'graphic' (flat colours, e.g. screenshots), 'transparent' or 'photo', from a thumbnail"""
+    # Nearest-neighbour sampling keeps flat areas exactly flat
+    scale = min(1.0, AUTO_THUMBNAIL_SIDE / max(image.size))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    pixels = np.asarray(image.resize(size, Image.NEAREST).convert('RGBA'))
+
+    # Share of neighbouring pixels with exactly the same colour
+    same_x = (pixels[:, 1:] == pixels[:, :-1]).all(axis=2)
+    same_y = (pixels[1:] == pixels[:-1]).all(axis=2)
+    pairs = same_x.size + same_y.size
+    flat_share = (same_x.sum() + same_y.sum()) / pairs if pairs else 1.0
+
+    if flat_share >= AUTO_FLAT_SHARE:
+        return 'graphic'
+    if _has_alpha(image) and pixels[:, :, 3].min() < 255:
+        return 'transparent'
+    return 'photo'
+
+def _comparison_luma(image):
+    """Luma of image flattened onto white, at most AUTO_SSIM_SIDE px, as float32"""
+    image = _prepare_for_format(image, 'JPEG')
+    scale = min(1.0, AUTO_SSIM_SIDE / max(image.size))
+    if scale < 1:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BOX)
+    return np.asarray(image.convert('L'), dtype=np.float32)
+
+def _ssim(reference, candidate):
+    """Mean structural similarity of two equally sized luma arrays"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_x, mu_y = blur(reference), blur(candidate)
+    mu_xx, mu_yy, mu_xy = mu_x * mu_x, mu_y * mu_y, mu_x * mu_y
+    sigma_xx = blur(reference * reference) - mu_xx
+    sigma_yy = blur(candidate * candidate) - mu_yy
+    sigma_xy = blur(reference * candidate) - mu_xy
+    ssim_map = ((2 * mu_xy + c1) * (2 * sigma_xy + c2)) / ((mu_xx + mu_yy + c1) * (sigma_xx + sigma_yy + c2))
+    return float(ssim_map.mean())
+
+def _encode_candidate(image, candidate, quality, encode_profile):
+    """(format, bytes) of image encoded as an auto-format candidate"""
+    if candidate == 'WEBP_LOSSLESS':
+        return 'WEBP', encode_image(image.convert('RGBA' if _has_alpha(image) else 'RGB'), 'WEBP',
+                                    encode_profile, lossless=True)
+    if candidate == 'PNG':
+        return 'PNG', encode_image(image.convert('RGBA' if _has_alpha(image) else 'RGB'), 'PNG',
+                                   encode_profile)
+    return candidate, encode_image(_prepare_for_format(image, candidate), candidate, encode_profile,
+                                   quality=quality)
+
+def choose_format(image, quality=75, encode_profile='smallest'):
+    """Encode image in the candidate formats of its class and keep the smallest good-looking one.
+
+    Lossy candidates count only if they keep AUTO_SSIM_FLOOR; if none does,
+    the most faithful one is kept. Returns a dict with format, data,
+    image_class and ssim.
+    """
+    # Decode once up front; the encoder threads only read the pixels
+    image.load()
+    image_class = classify_image(image)
+    candidates = [candidate if candidate != 'AVIF' or features.check('avif') else 'WEBP'
+                  for candidate in AUTO_CANDIDATES[image_class]]
+    candidates = list(dict.fromkeys(candidates))
+    reference = _comparison_luma(image) if any(c not in LOSSLESS_CANDIDATES for c in candidates) else None
+
+    def encode(candidate):
+        format, data = _encode_candidate(image, candidate, quality, encode_profile)
+        if candidate in LOSSLESS_CANDIDATES:
+            score = 1.0
+        else:
+            score = _ssim(reference, _comparison_luma(Image.open(io.BytesIO(data))))
+        return {'format': format, 'data': data, 'ssim': round(score, 4)}
+
+    # Encoders release the GIL, so the candidates encode side by side
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        results = list(executor.map(encode, candidates))
+
+    passing = [result for result in results if result['ssim'] >= AUTO_SSIM_FLOOR]
+    if passing:
+        best = min(passing, key=lambda result: len(result['data']))
+    else:
+        best = max(results, key=lambda result: result['ssim'])
+    best['image_class'] = image_class
+    return best
+
+def _open_image(source):
+    """Open a path, file object or in-memory bytes without copying them to disk"""
+    # Refused from the header when over the pixel budget
+    return open_image(source)
+
+def _encode_fixed(image, quality, encode_profile, output_format):
+    """(format, bytes) of image at a fixed quality; AUTO picks the format"""
+    output_format = output_format.upper()
+    if output_format == 'AUTO':
+        result = choose_format(image, quality, encode_profile)
+        return result['format'], result['data']
+    if output_format == 'PNG':
+        return _encode_candidate(image, 'PNG', quality, encode_profile)
+    return output_format, encode_image(_prepare_for_format(image, output_format), output_format,
+                                       encode_profile, quality=quality)
+
+@cached_result('compress_image', params=['quality', 'encode_profile', 'output_format'])
+def compress_image(image_file, quality=75, encode_profile='smallest', output_format='JPEG'):
     """Compress image with specified quality"""
     try:
-        # Open image
-        image = Image.open(image_file)
-        
-        # Convert RGBA to RGB if necessary
-        if image.mode == 'RGBA':
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            background.paste(image, mask=image.split()[-1])
-            image = background
+        # Open image; with AUTO the file suffix tells the caller which format won
+        image = _open_image(image_file)
+        output_format, data = _encode_fixed(image, quality, encode_profile, output_format)
         
         # Create temporary file for compressed image
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=IMAGE_SUFFIXES[output_format])
         
         # Compress and save
-        image.save(
-            temp_file.name,
-            'JPEG',
-            quality=quality,
-            optimize=True
-        )
+        temp_file.write(data)
+        temp_file.close()
         
         return temp_file.name
         
     except Exception as e:
         raise Exception(f"Image compression failed: {str(e)}")
 
-def compress_pdf(pdf_file, compression_level='medium'):
-    """Advanced PDF compression with guaranteed size reduction and distinct compression levels"""
-    
-    # Create temporary file for compressed PDF
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    temp_file.close()
-    
-    # Handle both bytes and file objects
-    temp_input = None
-    original_path = None
-    original_size = 0
+def _next_quality(samples, target, low, high):
+    """Quality where the log-size curve through the probes meets target, inside (low, high)"""
+    fitting = [sample for sample in samples if sample[1] <= target]
+    too_big = [sample for sample in samples if sample[1] > target]
+    if fitting and too_big:
+        # Interpolate between the probes bracketing the target
+        points = [max(fitting), min(too_big)]
+    else:
+        # Extrapolate from the last probe and the one furthest from it (close probes give a noisy slope)
+        last = samples[-1]
+        points = [max(samples, key=lambda sample: abs(sample[0] - last[0])), last]
+
+    quality, size = points[-1]
+    slope = DEFAULT_LOG_SIZE_SLOPE
+    if len(points) == 2 and points[0][0] != points[1][0]:
+        (q0, s0), (q1, s1) = points
+        measured = (math.log(s1) - math.log(s0)) / (q1 - q0)
+        if measured > 0:
+            slope = measured
+
+    # Round down so the next probe errs on the fitting side
+    estimate = math.floor(quality + (math.log(target) - math.log(size)) / slope)
+    return min(max(estimate, low + 1), high - 1), estimate
+
+def _grow_scale(image, fit, upper_scale, target_size, format, encode_profile, exponent, max_encodes):
+    """Scale fit (a downscaled encode well under target_size) back up towards upper_scale, where
+    the image is known not to fit, keeping its quality. Returns the largest fitting encode and the
+    number of encodes made; stops once an encode lands in the tolerance band.
+    """
+    aim = target_size * (1 - TARGET_TOLERANCE / 2)
+    width, height = image.size
+    upper_size = None
+    encodes = 0
+
+    while encodes < max_encodes and len(fit['data']) < target_size * (1 - TARGET_TOLERANCE):
+        # Secant on log(size) against log(scale) once both ends are measured, else the pixel model
+        if upper_size is not None:
+            exponent = max(0.1, math.log(upper_size / len(fit['data'])) / (2 * math.log(upper_scale / fit['scale'])))
+        scale = fit['scale'] * (aim / len(fit['data'])) ** (1 / (2 * exponent))
+        if not fit['scale'] < scale < upper_scale:
+            scale = math.sqrt(fit['scale'] * upper_scale)
+
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if new_size == fit['size'] or new_size == (round(width * upper_scale), round(height * upper_scale)):
+            break
+        data = encode_image(image.resize(new_size, Image.LANCZOS, reducing_gap=2.0), format,
+                            encode_profile, quality=fit['quality'])
+        encodes += 1
+        if len(data) <= target_size:
+            fit = {'data': data, 'quality': fit['quality'], 'scale': scale, 'size': new_size}
+        else:
+            upper_scale, upper_size = scale, len(data)
+    return fit, encodes
+
+def fit_image_to_size(image, target_size, format='JPEG', start_quality=75, allow_downscale=True,
+                      encode_profile='smallest', max_encodes=TARGET_MAX_ENCODES):
+    """Encode image as close under target_size bytes as possible.
+
+    Searches quality on the log-size curve of previous encodes, and shrinks the
+    image when even the lowest quality is too large. A shrunk image that fits
+    with room to spare is then grown back until it lands in the tolerance band,
+    so the result is the largest image that fits. Returns a dict with the
+    encoded bytes, the quality, scale and dimensions used, and whether the
+    target was met (otherwise the data is the smallest encode produced, at the
+    lowest quality and at most MIN_DOWNSCALE_SIDE on its short side).
+    """
+    aim = target_size * (1 - TARGET_TOLERANCE / 2)
+    width, height = image.size
+    scale = 1.0
+    candidate = image
+    best = None
+    smallest = None
+    encodes = 0
+    exponent = DEFAULT_PIXEL_EXPONENT
+    previous_probe = None
+    # Smallest scale known not to fit, and whether the minimum size has been reached
+    too_big_scale = None
+    at_minimum = False
+
+    while encodes < max_encodes:
+        samples = []
+        fit = None
+        low, high = TARGET_QUALITY_MIN - 1, TARGET_QUALITY_MAX + 1
+        quality = min(max(start_quality, TARGET_QUALITY_MIN), TARGET_QUALITY_MAX)
+        downscale = False
+
+        while encodes < max_encodes:
+            data = encode_image(candidate, format, encode_profile, quality=quality)
+            encodes += 1
+            samples.append((quality, len(data)))
+            if smallest is None or len(data) < len(smallest['data']):
+                smallest = {'data': data, 'quality': quality, 'scale': scale, 'size': candidate.size}
+
+            if len(data) <= target_size:
+                low = quality
+                fit = {'data': data, 'quality': quality, 'scale': scale, 'size': candidate.size}
+                # Close enough under the target, or already at the best quality
+                if len(data) >= target_size * (1 - TARGET_TOLERANCE) or quality >= TARGET_QUALITY_MAX:
+                    break
+            else:
+                high = quality
+                if quality <= TARGET_QUALITY_MIN:
+                    downscale = True
+                    break
+
+            if high - low <= 1:
+                break
+            quality, estimate = _next_quality(samples, aim, low, high)
+            # Shrink right away instead of probing qualities the curve says cannot fit
+            if fit is None and estimate < TARGET_QUALITY_MIN and allow_downscale and not at_minimum:
+                downscale = True
+                break
+
+        if fit is not None:
+            best = fit
+            break
+        if not downscale or not allow_downscale or at_minimum:
+            break
+        too_big_scale = scale
+
+        # Measure how size followed the pixel count over the last shrink (same start quality)
+        first_quality, first_size = samples[0]
+        if previous_probe and previous_probe[1] == first_quality and first_size < previous_probe[2]:
+            previous_scale, _, previous_size = previous_probe
+            exponent = min(1.0, max(0.3, math.log(first_size / previous_size) / (2 * math.log(scale / previous_scale))))
+        previous_probe = (scale, first_quality, first_size)
+
+        # Shrink so the probe nearest the start quality would land in the tolerance band
+        reference_quality, reference_size = min(samples, key=lambda sample: abs(sample[0] - start_quality))
+        start_quality = reference_quality
+        scale *= (target_size * (1 - TARGET_TOLERANCE) / reference_size) ** (1 / (2 * exponent))
+        if min(width, height) * scale < MIN_DOWNSCALE_SIDE:
+            # No smaller than the minimum side; there only the lowest quality is left to try
+            scale = min(1.0, MIN_DOWNSCALE_SIDE / min(width, height))
+            start_quality = TARGET_QUALITY_MIN
+            at_minimum = True
+            if scale >= too_big_scale:
+                break
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        candidate = image.resize(new_size, Image.LANCZOS, reducing_gap=2.0)
+
+    if best is not None and too_big_scale is not None:
+        # The shrink estimate undershoots when quality ends up maxed; grow back to the band
+        best, grown = _grow_scale(image, best, too_big_scale, target_size, format, encode_profile,
+                                  exponent, TARGET_MAX_SCALE_ENCODES)
+        encodes += grown
+
+    result = best or smallest
+    return {
+        'data': result['data'],
+        'quality': result['quality'],
+        'scale': round(result['scale'], 4),
+        'width': result['size'][0],
+        'height': result['size'][1],
+        'target_met': best is not None,
+        'encodes': encodes,
+    }
+
+def _encode_to_size(image, target_size, output_format, quality, allow_downscale, encode_profile):
+    """fit_image_to_size result plus the format; AUTO picks JPEG or WebP"""
+    output_format = output_format.upper()
+    if output_format == 'AUTO':
+        # JPEG for opaque photos; WebP keeps transparency and flat colours better
+        output_format = 'JPEG' if classify_image(image) == 'photo' else 'WEBP'
+    image = _prepare_for_format(image, output_format)
     
+    result = fit_image_to_size(image, target_size, output_format, start_quality=quality,
+                               allow_downscale=allow_downscale, encode_profile=encode_profile)
+    result['format'] = output_format
+    return result
+
+@cached_result('compress_image_to_size',
+               params=['target_size', 'output_format', 'quality', 'allow_downscale', 'encode_profile'],
+               output_arg='output_path')
+def compress_image_to_size(image_file, output_path, target_size, output_format='JPEG', quality=75,
+                           allow_downscale=True, encode_profile='smallest'):
+    """Compress image to at most target_size bytes, searching quality (and scale if allowed)"""
     try:
-        import subprocess
-        import platform
+        image = _open_image(image_file)
+        result = _encode_to_size(image, target_size, output_format, quality, allow_downscale, encode_profile)
         
+        with open(output_path, 'wb') as f:
+            f.write(result.pop('data'))
+        
+        result['file_path'] = output_path
+        return result
+        
+    except Exception as e:
+        raise Exception(f"Target-size compression failed: {str(e)}")
+
+def compress_image_item(name, data, quality=75, encode_profile='smallest', output_format='JPEG',
+                        target_size=None, allow_downscale=True):
+    """Worker entry point for batch compression: compress one image held in memory.
+
+    Returns the name, sizes, format and data, or an error message instead of
+    raising so one bad file does not abort the whole batch.
+    """
+    try:
+        image = _open_image(data)
+        if target_size:
+            result = _encode_to_size(image, target_size, output_format, quality, allow_downscale,
+                                     encode_profile)
+        else:
+            format, encoded = _encode_fixed(image, quality, encode_profile, output_format)
+            result = {'format': format, 'data': encoded, 'quality': quality}
+        result.update(name=name, original_size=len(data), compressed_size=len(result['data']))
+        return result
+    except Exception as e:
+        return {'name': name, 'original_size': len(data), 'error': f"Image compression failed: {str(e)}"}
+
+@cached_result('compress_pdf', params=['compression_level'])
+def compress_pdf(pdf_file, compression_level='medium'):
+    """Advanced PDF compression with guaranteed size reduction and distinct compression levels.
+
+    Takes a path or bytes. A path gives the path of a compressed temporary
+    file; bytes are compressed in memory and bytes are returned.
+    """
+    in_memory = isinstance(pdf_file, (bytes, bytearray))
+    output_path = None
+    
+    try:
         # Handle different input types
-        if isinstance(pdf_file, bytes):
-            # If input is bytes, create temporary file
-            temp_input = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            temp_input.write(pdf_file)
-            temp_input.close()
-            original_path = temp_input.name
+        if in_memory:
             original_size = len(pdf_file)
         else:
             # If input is file object
             original_path = pdf_file.name if hasattr(pdf_file, 'name') else str(pdf_file)
             original_size = os.path.getsize(original_path)
+            
+            # Create temporary file for compressed PDF
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+            temp_file.close()
+            output_path = temp_file.name
         
         # Method: PyMuPDF with proper text-based compression (no re-rendering)
         try:
             import fitz  # PyMuPDF
             
-            if isinstance(pdf_file, bytes):
+            if in_memory:
                 doc = fitz.open(stream=pdf_file, filetype="pdf")
             else:
                 doc = fitz.open(original_path)
@@ -73,8 +423,7 @@ def compress_pdf(pdf_file, compression_level='medium'):
             # Simplified to 2 distinct compression levels only (removed medium)
             if compression_level == 'high':
                 # AGGRESSIVE: Maximum compression with all optimizations
-                doc.save(
-                    temp_file.name,
+                save_options = dict(
                     garbage=4,              # Maximum garbage collection
                     deflate=True,           # Compress streams  
                     deflate_images=True,    # Compress images
@@ -89,8 +438,7 @@ def compress_pdf(pdf_file, compression_level='medium'):
                 
             else:  # low (default for any non-'high' value including 'medium')
                 # GENTLE: Light compression preserving quality
-                doc.save(
-                    temp_file.name,
+                save_options = dict(
                     garbage=1,              # Light garbage collection
                     deflate=True,           # Basic stream compression
                     deflate_images=False,   # Don't compress images aggressively
@@ -98,20 +446,14 @@ def compress_pdf(pdf_file, compression_level='medium'):
                     clean=True,             # Basic cleanup only
                     pretty=True,            # Keep readable structure
                 )
-                
-            doc.close()
-            
-            # Check the results
-            final_size = os.path.getsize(temp_file.name)
             
-            # Return appropriate format based on input type
-            if isinstance(pdf_file, bytes):
-                with open(temp_file.name, 'rb') as f:
-                    result = f.read()
-                os.unlink(temp_file.name)
-                return result
-            else:
-                return temp_file.name
+            try:
+                if in_memory:
+                    return doc.tobytes(**save_options)
+                doc.save(output_path, **save_options)
+                return output_path
+            finally:
+                doc.close()
                 
         except ImportError:
             # PyMuPDF not available, use PyPDF2 fallback
@@ -120,7 +462,7 @@ def compress_pdf(pdf_file, compression_level='medium'):
         # Fallback: PyPDF2 with different scaling
         try:
             # Handle different input types for PyPDF2
-            if isinstance(pdf_file, bytes):
+            if in_memory:
                 pdf_input = io.BytesIO(pdf_file)
             else:
                 pdf_input = pdf_file
@@ -142,33 +484,28 @@ def compress_pdf(pdf_file, compression_level='medium'):
                     
                 writer.add_page(page)
             
-            with open(temp_file.name, 'wb') as output:
+            output = io.BytesIO() if in_memory else open(output_path, 'wb')
+            with output:
                 writer.write(output)
-            
-            # Verify compression worked
-            final_size = os.path.getsize(temp_file.name)
-            if final_size >= original_size:
-                raise Exception("PyPDF2 compression failed to reduce size")
-            
-            # Return appropriate format based on input type
-            if isinstance(pdf_file, bytes):
-                with open(temp_file.name, 'rb') as f:
-                    result = f.read()
-                os.unlink(temp_file.name)
-                return result
-            else:
-                return temp_file.name
+                
+                # Verify compression worked
+                final_size = output.tell()
+                if final_size >= original_size:
+                    raise Exception("PyPDF2 compression failed to reduce size")
+                
+                # Return appropriate format based on input type
+                if in_memory:
+                    return output.getvalue()
+            return output_path
             
         except Exception as fallback_error:
             raise Exception(f"All PDF compression methods failed: {str(fallback_error)}")
     
-    finally:
-        # Clean up temporary input file if created
-        if temp_input and os.path.exists(temp_input.name):
-            try:
-                os.unlink(temp_input.name)
-            except:
-                pass
+    except Exception:
+        # Don't leave a half-written output behind
+        if output_path and os.path.exists(output_path):
+            os.unlink(output_path)
+        raise
 
 def get_file_size(file_path):
     """Get file size in bytes"""
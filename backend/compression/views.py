@@ -1,14 +1,30 @@
+import io
 import os
-import tempfile
+import json
+import zipfile
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser
 from django.http import FileResponse
 from django.core.files.storage import default_storage
-from .serializers import ImageCompressionSerializer, PDFCompressionSerializer
+from jobs.queue import create_job, submit_job
+from jobs.utils import wants_async, job_accepted_payload
+from core.process_pool import run_on_buffer, imap_in_pool
+from core.zip_stream import zip_response
+from core.uploads import upload_source
+from core.scratch import uses_scratch
+from django.utils.decorators import method_decorator
+from .serializers import ImageCompressionSerializer, BatchImageCompressionSerializer, PDFCompressionSerializer
 from .models import CompressionHistory
-from .utils import compress_image, compress_pdf, get_file_size, calculate_compression_ratio
+from .utils import (
+    compress_image, compress_image_to_size, compress_image_item, compress_pdf, get_file_size,
+    calculate_compression_ratio, IMAGE_SUFFIXES
+)
+
+# Members of an uploaded ZIP that are compressed; everything else is ignored
+ARCHIVE_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.avif', '.bmp', '.gif', '.tif', '.tiff'}
 
 def get_client_ip(request):
     """Get client IP address"""
@@ -22,26 +38,47 @@ def get_client_ip(request):
 class ImageCompressionView(APIView):
     parser_classes = [MultiPartParser]
     
+    @method_decorator(uses_scratch)
     def post(self, request):
         serializer = ImageCompressionSerializer(data=request.data)
         if serializer.is_valid():
             try:
                 image_file = serializer.validated_data['image']
                 quality = serializer.validated_data['quality']
+                encode_profile = serializer.validated_data['encode_profile']
+                output_format = serializer.validated_data['output_format']
+                target_size_kb = serializer.validated_data.get('target_size_kb')
+                allow_downscale = serializer.validated_data['allow_downscale'] is not False
                 
-                # Save original file temporarily
-                temp_original = tempfile.NamedTemporaryFile(delete=False)
-                for chunk in image_file.chunks():
-                    temp_original.write(chunk)
-                temp_original.close()
-                
-                # Get original file size
-                original_size = get_file_size(temp_original.name)
+                # Hand over the spooled upload's path, or its bytes through shared memory, instead of copying it
+                source = upload_source(image_file)
+                original_size = image_file.size
                 
-                # Compress image
-                compressed_path = compress_image(temp_original.name, quality)
+                # Compress image in the worker pool; the output lives in the request's scratch directory
+                fit = None
+                if target_size_kb:
+                    # Quality (and scale, if allowed) searched until the output fits
+                    compressed_path = request.scratch.path(f"compressed{IMAGE_SUFFIXES.get(output_format, '')}")
+                    fit = run_on_buffer(
+                        compress_image_to_size, source, compressed_path,
+                        target_size_kb * 1024, output_format, quality, allow_downscale, encode_profile
+                    )
+                else:
+                    compressed_path = request.scratch.adopt(run_on_buffer(
+                        compress_image, source, quality, encode_profile, output_format
+                    ))
                 compressed_size = get_file_size(compressed_path)
                 
+                # Auto mode reports the winning format in the result or the file suffix
+                if fit is not None:
+                    output_format = fit['format']
+                elif output_format == 'AUTO':
+                    suffix = os.path.splitext(compressed_path)[1]
+                    output_format = {s: f for f, s in IMAGE_SUFFIXES.items()}[suffix]
+                compressed_filename = (
+                    f"compressed_{os.path.splitext(image_file.name)[0]}{IMAGE_SUFFIXES[output_format]}"
+                )
+                
                 # Calculate compression ratio
                 ratio = calculate_compression_ratio(original_size, compressed_size)
                 
@@ -49,10 +86,11 @@ class ImageCompressionView(APIView):
                 history = CompressionHistory.objects.create(
                     file_type='image',
                     original_filename=image_file.name,
-                    compressed_filename=f"compressed_{image_file.name}",
+                    compressed_filename=compressed_filename,
                     original_size=original_size,
                     compressed_size=compressed_size,
                     compression_ratio=ratio,
+                    output_format=output_format.lower(),
                     ip_address=get_client_ip(request)
                 )
                 
@@ -60,11 +98,14 @@ class ImageCompressionView(APIView):
                 response = FileResponse(
                     open(compressed_path, 'rb'),
                     as_attachment=True,
-                    filename=f"compressed_{image_file.name}"
+                    filename=compressed_filename
                 )
-                
-                # Note: Files will be cleaned up by OS when temp files are garbage collected
-                # In production, implement proper cleanup with Celery or signals
+                response['X-Compression-Format'] = output_format.lower()
+                if fit is not None:
+                    # An unreachable target still returns the smallest encode produced, flagged here
+                    response['X-Compression-Quality'] = str(fit['quality'])
+                    response['X-Compression-Scale'] = str(fit['scale'])
+                    response['X-Target-Size-Met'] = 'true' if fit['target_met'] else 'false'
                 
                 return response
                 
@@ -76,9 +117,124 @@ class ImageCompressionView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _archive_images(archive):
+    """(name, read) pairs for the images inside an uploaded ZIP, skipping folders and hidden files"""
+    zip_file = zipfile.ZipFile(archive)
+    members = [
+        info for info in zip_file.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and not os.path.basename(info.filename).startswith('.')
+        and os.path.splitext(info.filename)[1].lower() in ARCHIVE_IMAGE_EXTENSIONS
+    ]
+    if sum(info.file_size for info in members) > settings.COMPRESSION_BATCH_MAX_BYTES:
+        raise ValueError("ZIP contents exceed the batch size limit")
+    return [(os.path.basename(info.filename), lambda info=info: zip_file.read(info)) for info in members]
+
+class BatchImageCompressionView(APIView):
+    parser_classes = [MultiPartParser]
+    
+    def post(self, request):
+        serializer = BatchImageCompressionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            options = serializer.validated_data
+            target_size_kb = options.get('target_size_kb')
+            
+            # Uploads are read one at a time, as the pool asks for more work
+            if options.get('archive'):
+                sources = _archive_images(options['archive'])
+            else:
+                sources = [(image.name, image.read) for image in options['images']]
+            
+            if not sources:
+                return Response({'error': 'No images found'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(sources) > settings.COMPRESSION_BATCH_MAX_FILES:
+                return Response(
+                    {'error': f'At most {settings.COMPRESSION_BATCH_MAX_FILES} images per batch'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            work = (
+                (name, read(), options['quality'], options['encode_profile'], options['output_format'],
+                 target_size_kb * 1024 if target_size_kb else None, options['allow_downscale'] is not False)
+                for name, read in sources
+            )
+            ip_address = get_client_ip(request)
+            
+            def compressed_images():
+                manifest = []
+                history = []
+                used_names = set()
+                
+                # Results arrive in upload order while later images are still compressing;
+                # image bytes travel to and from the workers through shared memory
+                for result in imap_in_pool(compress_image_item, work, buffer_arg=1):
+                    entry = {'file': result['name'], 'original_size': result['original_size']}
+                    if 'error' in result:
+                        entry['error'] = result['error']
+                        manifest.append(entry)
+                        continue
+                    
+                    stem = os.path.splitext(result['name'])[0]
+                    suffix = IMAGE_SUFFIXES[result['format']]
+                    name = f"compressed_{stem}{suffix}"
+                    if name in used_names:
+                        name = f"compressed_{stem}_{len(manifest) + 1}{suffix}"
+                    used_names.add(name)
+                    
+                    ratio = calculate_compression_ratio(result['original_size'], result['compressed_size'])
+                    entry.update({
+                        'output': name,
+                        'format': result['format'].lower(),
+                        'quality': result['quality'],
+                        'compressed_size': result['compressed_size'],
+                        'compression_ratio': ratio,
+                    })
+                    if target_size_kb:
+                        entry.update({'scale': result['scale'], 'target_met': result['target_met']})
+                    manifest.append(entry)
+                    
+                    history.append(CompressionHistory(
+                        file_type='image',
+                        original_filename=result['name'],
+                        compressed_filename=name,
+                        original_size=result['original_size'],
+                        compressed_size=result['compressed_size'],
+                        compression_ratio=ratio,
+                        output_format=result['format'].lower(),
+                        ip_address=ip_address
+                    ))
+                    yield name, result['data']
+                
+                # One insert for the whole batch
+                CompressionHistory.objects.bulk_create(history)
+                
+                original_total = sum(entry['original_size'] for entry in manifest if 'error' not in entry)
+                compressed_total = sum(entry['compressed_size'] for entry in manifest if 'error' not in entry)
+                yield 'manifest.json', json.dumps({
+                    'files': manifest,
+                    'compressed': len(history),
+                    'failed': len(manifest) - len(history),
+                    'original_size': original_total,
+                    'compressed_size': compressed_total,
+                    'compression_ratio': calculate_compression_ratio(original_total, compressed_total),
+                }, indent=2).encode('utf-8')
+            
+            return zip_response(compressed_images(), 'compressed_images.zip')
+            
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
 class PDFCompressionView(APIView):
     parser_classes = [MultiPartParser]
     
+    @method_decorator(uses_scratch)
     def post(self, request):
         serializer = PDFCompressionSerializer(data=request.data)
         if serializer.is_valid():
@@ -86,18 +242,29 @@ class PDFCompressionView(APIView):
                 pdf_file = serializer.validated_data['pdf']
                 compression_level = serializer.validated_data['compression_level']
                 
-                # Save original file temporarily
-                temp_original = tempfile.NamedTemporaryFile(delete=False)
-                for chunk in pdf_file.chunks():
-                    temp_original.write(chunk)
-                temp_original.close()
+                if wants_async(request):
+                    # Run in the job queue and let the client poll for the result
+                    job = create_job(
+                        'pdf_compress',
+                        files=[pdf_file],
+                        params={'compression_level': compression_level},
+                        ip_address=get_client_ip(request)
+                    )
+                    submit_job(job)
+                    return Response(job_accepted_payload(job), status=status.HTTP_202_ACCEPTED)
                 
-                # Get original file size
-                original_size = get_file_size(temp_original.name)
+                # Hand over the spooled upload's path (or its bytes) instead of copying it
+                original_size = pdf_file.size
                 
-                # Compress PDF
-                compressed_path = compress_pdf(temp_original.name, compression_level)
-                compressed_size = get_file_size(compressed_path)
+                # Compress PDF; uploads held in memory are compressed in memory too
+                compressed = compress_pdf(upload_source(pdf_file), compression_level)
+                if isinstance(compressed, bytes):
+                    compressed_size = len(compressed)
+                    compressed_file = io.BytesIO(compressed)
+                else:
+                    compressed = request.scratch.adopt(compressed)
+                    compressed_size = get_file_size(compressed)
+                    compressed_file = open(compressed, 'rb')
                 
                 # Calculate compression ratio
                 ratio = calculate_compression_ratio(original_size, compressed_size)
@@ -114,17 +281,12 @@ class PDFCompressionView(APIView):
                 )
                 
                 # Return compressed file
-                response = FileResponse(
-                    open(compressed_path, 'rb'),
+                return FileResponse(
+                    compressed_file,
                     as_attachment=True,
                     filename=f"compressed_{pdf_file.name}"
                 )
                 
-                # Note: Files will be cleaned up by OS when temp files are garbage collected
-                # In production, implement proper cleanup with Celery or signals
-                
-                return response
-                
             except Exception as e:
                 return Response(
                     {'error': str(e)},
@@ -146,6 +308,7 @@ class CompressionHistoryView(APIView):
                 'original_size': round(item.original_size / (1024 * 1024), 2),
                 'compressed_size': round(item.compressed_size / (1024 * 1024), 2),
                 'compression_ratio': float(item.compression_ratio),
+                'output_format': item.output_format,
                 'size_saved': item.size_saved_mb,
                 'created_at': item.created_at.isoformat()
             })
@@ -0,0 +1 @@
+# Core App - shared processing infrastructure
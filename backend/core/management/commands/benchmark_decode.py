@@ -0,0 +1,74 @@
+import io
+import time
+import statistics
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand
+from core.imaging import load_image
+from .benchmark_encode import _synthetic_images
+
+
+def _full_decode(data, target):
+    """Decode at full size, then resize, as the endpoints did before the shared loader"""
+    img = Image.open(io.BytesIO(data))
+    return img.resize(target, Image.Resampling.LANCZOS)
+
+
+def _psnr(reference, image):
+    error = np.mean((np.asarray(reference, np.float32) - np.asarray(image, np.float32)) ** 2)
+    return float('inf') if error == 0 else 10 * np.log10(255 ** 2 / error)
+
+
+class Command(BaseCommand):
+    help = "Benchmark reduced-size JPEG decoding (draft + reducing_gap) against full decode and resize"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JPEG to benchmark with (a synthetic one is generated otherwise)')
+        parser.add_argument('--megapixels', type=float, default=24,
+                            help='Size of the synthetic photo')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Decodes per case (the median is reported)')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], 'rb') as f:
+                data = f.read()
+            source = options['file']
+        else:
+            buffer = io.BytesIO()
+            _synthetic_images(options['megapixels'])['photo'].save(buffer, 'JPEG', quality=90)
+            data = buffer.getvalue()
+            source = 'synthetic'
+
+        width, height = Image.open(io.BytesIO(data)).size
+        self.stdout.write(f"Image: {source} {width}x{height} ({width * height / 1e6:.1f} MP), "
+                          f"{len(data) / (1024 * 1024):.1f} MB JPEG")
+
+        cases = {
+            'scale 0.85 (medium)': {'scale': 0.85},
+            'scale 0.7 (low)': {'scale': 0.7},
+            'fit 2048 px': {'max_size': (2048, 2048)},
+            'fit 1024 px': {'max_size': (1024, 1024)},
+            'thumbnail 256 px': {'max_size': (256, 256)},
+            'QR logo 100x100': {'size': (100, 100)},
+        }
+
+        self.stdout.write(f"\n{'target':<22}{'size':>12}{'full (ms)':>11}{'reduced (ms)':>14}"
+                          f"{'speedup':>9}{'PSNR (dB)':>11}")
+        for name, request in cases.items():
+            reduced = load_image(data, transpose=False, **request)
+            target = reduced.size
+            full_ms = self._time(lambda: _full_decode(data, target), options['repeat'])
+            reduced_ms = self._time(lambda: load_image(data, transpose=False, **request), options['repeat'])
+            psnr = _psnr(_full_decode(data, target), reduced)
+            self.stdout.write(f"{name:<22}{f'{target[0]}x{target[1]}':>12}{full_ms:>11.0f}{reduced_ms:>14.0f}"
+                              f"{full_ms / reduced_ms:>8.1f}x{psnr:>11.1f}")
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,78 @@
+import time
+import statistics
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand
+from core.encoding import ENCODE_PROFILES, encode_image
+
+
+def _synthetic_images(megapixels, seed=0):
+    """A noisy photo, a photo cut-out with transparency and a flat graphic, at roughly 4:3"""
+    rng = np.random.default_rng(seed)
+    width = int(round(np.sqrt(megapixels * 1e6 * 4 / 3)))
+    height = int(round(width * 3 / 4))
+
+    # Smooth gradients plus sensor-like noise
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    photo = np.stack([x / width * 200, y / height * 200, (x + y) / (width + height) * 255], axis=-1)
+    photo += rng.normal(0, 6, photo.shape).astype(np.float32)
+    photo = Image.fromarray(np.clip(photo, 0, 255).astype(np.uint8))
+
+    # Background removal output: elliptical subject, fully transparent elsewhere
+    inside = ((x - width / 2) / (width * 0.3)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 <= 1
+    cutout = photo.convert('RGBA')
+    cutout.putalpha(Image.fromarray(inside.astype(np.uint8) * 255))
+
+    # Few flat colours, like a QR code or a chart
+    blocks = rng.integers(0, 2, (height // 16 + 1, width // 16 + 1), dtype=np.uint8) * 255
+    graphic = Image.fromarray(np.kron(blocks, np.ones((16, 16), np.uint8))[:height, :width]).convert('RGB')
+
+    return {'photo': photo, 'transparent': cutout, 'graphic': graphic}
+
+
+class Command(BaseCommand):
+    help = "Benchmark encode time against output size for every encode profile"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Image to benchmark with (synthetic ones are generated otherwise)')
+        parser.add_argument('--megapixels', type=float, default=8,
+                            help='Size of the synthetic images')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Encodes per profile (the median is reported)')
+        parser.add_argument('--formats', nargs='+', choices=['PNG', 'WEBP', 'JPEG', 'AVIF'],
+                            default=['PNG', 'WEBP', 'JPEG'])
+
+    def handle(self, *args, **options):
+        if options['file']:
+            try:
+                images = {options['file']: Image.open(options['file'])}
+                images[options['file']].load()
+            except Exception as e:
+                self.stderr.write(f"Cannot read {options['file']}: {e}")
+                return
+        else:
+            images = _synthetic_images(options['megapixels'])
+
+        self.stdout.write(f"\n{'image':<14}{'format':<8}{'profile':<10}{'time (ms)':>11}{'size (KB)':>11}")
+        for name, img in images.items():
+            width, height = img.size
+            self.stdout.write(f"{name} {width}x{height} ({width * height / 1e6:.1f} MP) {img.mode}")
+            for format in options['formats']:
+                # JPEG has no alpha channel
+                source = img.convert('RGB') if format == 'JPEG' and img.mode != 'RGB' else img
+                options_for = {'quality': 85} if format != 'PNG' else {}
+                for profile in ENCODE_PROFILES:
+                    seconds, data = self._time(lambda: encode_image(source, format, profile, **options_for),
+                                               options['repeat'])
+                    self.stdout.write(f"{'':<14}{format:<8}{profile:<10}{seconds * 1000:>11.0f}"
+                                      f"{len(data) / 1024:>11.0f}")
+
+    def _time(self, func, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings), result
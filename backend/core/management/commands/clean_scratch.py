@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.scratch import ScratchSpace
+
+
+class Command(BaseCommand):
+    help = "Remove request scratch directories left behind by killed or crashed processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=settings.SCRATCH_ORPHAN_AGE,
+                            help='Remove directories not modified for this many seconds (0 removes all)')
+
+    def handle(self, *args, **options):
+        space = ScratchSpace(settings.SCRATCH_DIR, settings.SCRATCH_MAX_BYTES, settings.SCRATCH_ORPHAN_AGE)
+        removed = space.clean_orphans(options['max_age'])
+        self.stdout.write(f"Removed {removed} scratch directories, {space.usage(fresh=True)} bytes still in use")
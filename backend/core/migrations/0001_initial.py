@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(max_length=100)),
+                ('outcome', models.CharField(choices=[('hit', 'Hit'), ('miss', 'Miss')], max_length=4)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('operation', 'outcome'), name='unique_result_cache_counter')],
+            },
+        ),
+    ]
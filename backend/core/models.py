@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class ResultCacheCounter(models.Model):
+    """Hit or miss count of one cached operation, shared by every worker process"""
+    OUTCOMES = [
+        ('hit', 'Hit'),
+        ('miss', 'Miss'),
+    ]
+
+    operation = models.CharField(max_length=100)
+    outcome = models.CharField(max_length=4, choices=OUTCOMES)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['operation', 'outcome'], name='unique_result_cache_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} {self.outcome}: {self.count}"
@@ -0,0 +1,377 @@
+"""
+Shared process pool for CPU-bound image operations.
+
+OpenCV and Pillow hold the GIL for long stretches, so running GrabCut or a
+JPEG encode on the request thread blocks the whole web worker. Operations are
+sent to a bounded pool of warm worker processes instead. Image data travels
+through shared memory blocks rather than being pickled through the pool's pipe.
+
+Functions sent to the pool must be defined at module level so they can be
+referenced from the worker processes.
+"""
+import os
+import logging
+import threading
+from collections import deque, namedtuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = None
+
+# Bytes passed to or returned from a worker through a shared memory block
+_Block = namedtuple('_Block', ['name', 'size'])
+
+
+# --- Worker side ---------------------------------------------------------
+
+def _warm_worker():
+    """Import the heavy imaging libraries once per worker process"""
+    import cv2
+    import numpy  # noqa: F401
+    from PIL import Image
+
+    # Parallelism comes from the processes; avoid oversubscribing cores
+    cv2.setNumThreads(1)
+    Image.init()
+
+    # Cached functions count hits and misses through the ORM
+    if os.environ.get('DJANGO_SETTINGS_MODULE'):
+        import django
+        django.setup()
+
+
+def _ping():
+    return True
+
+
+def _write_block(data):
+    """Copy bytes-like data into a new shared memory block and return its handle"""
+    size = max(1, len(data))
+    block = shared_memory.SharedMemory(create=True, size=size)
+    block.buf[:len(data)] = data
+    name = block.name
+    block.close()
+    return name, len(data)
+
+
+def _read_block(name, size, unlink=False):
+    """Copy the contents of a shared memory block into bytes"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+        if unlink:
+            block.unlink()
+
+
+def _unlink_block(block):
+    try:
+        shared = shared_memory.SharedMemory(name=block.name)
+    except FileNotFoundError:
+        return
+    shared.close()
+    shared.unlink()
+
+
+def _bytes_to_blocks(result):
+    """Move bytes in a result (or in the values of a dict result) into shared memory"""
+    if isinstance(result, (bytes, bytearray)):
+        return _Block(*_write_block(result))
+    if isinstance(result, dict):
+        return {key: _bytes_to_blocks(value) for key, value in result.items()}
+    return result
+
+
+def _blocks_to_bytes(result):
+    """Inverse of _bytes_to_blocks, releasing the blocks"""
+    if isinstance(result, _Block):
+        return _read_block(result.name, result.size, unlink=True)
+    if isinstance(result, dict):
+        return {key: _blocks_to_bytes(value) for key, value in result.items()}
+    return result
+
+
+def _discard_result(future):
+    """Release the blocks of a result nobody is going to read"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    for value in (result.values() if isinstance(result, dict) else [result]):
+        if isinstance(value, _Block):
+            _unlink_block(value)
+
+
+def _call_with_blocks(func, args, kwargs):
+    """Worker entry point: run func with _Block arguments read from shared memory.
+
+    Each _Block argument is passed as a memoryview of its block; bytes in the
+    result go back through shared memory as well.
+    """
+    blocks, views, mapped = [], [], []
+    try:
+        for arg in args:
+            if isinstance(arg, _Block):
+                blocks.append(shared_memory.SharedMemory(name=arg.name))
+                arg = blocks[-1].buf[:arg.size]
+                views.append(arg)
+            mapped.append(arg)
+        result = func(*mapped, **kwargs)
+    finally:
+        for view in views:
+            view.release()
+        for block in blocks:
+            block.close()
+    return _bytes_to_blocks(result)
+
+
+def _image_to_block(img):
+    """Store a PIL image's pixels in shared memory"""
+    import numpy as np
+
+    if img.mode not in ('L', 'RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.mode or 'transparency' in img.info else 'RGB')
+
+    pixels = np.asarray(img)
+    name, size = _write_block(pixels.reshape(-1).view(np.uint8))
+    return {'name': name, 'size': size, 'shape': pixels.shape, 'mode': img.mode}
+
+
+def _image_from_block(descriptor):
+    """Rebuild a PIL image from shared memory and release the block"""
+    import numpy as np
+    from PIL import Image
+
+    block = shared_memory.SharedMemory(name=descriptor['name'])
+    try:
+        pixels = np.ndarray(descriptor['shape'], dtype=np.uint8, buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+    return Image.fromarray(pixels, descriptor['mode'])
+
+
+def _run_image_operation(func, input_name, input_size, args, kwargs, encoder):
+    """Worker entry point: read the input image from shared memory and run func"""
+    block = shared_memory.SharedMemory(name=input_name)
+    try:
+        view = block.buf[:input_size]
+        try:
+            result = func(view, *args, **kwargs)
+        finally:
+            view.release()
+    finally:
+        block.close()
+
+    if encoder is not None:
+        name, size = _write_block(encoder(result))
+        return {'name': name, 'size': size, 'encoded': True}
+
+    descriptor = _image_to_block(result)
+    descriptor['encoded'] = False
+    return descriptor
+
+
+# --- Request side --------------------------------------------------------
+
+def get_pool():
+    """Return the shared worker pool, or None when it is disabled"""
+    return _get_pool()[0]
+
+
+def _get_pool():
+    """(pool, backlog semaphore) created together, or (None, None) when the pool is disabled.
+
+    Callers release the semaphore they got here, so a pool replaced after a
+    crash starts with a full semaphore of its own.
+    """
+    global _pool, _pending
+    workers = settings.IMAGE_POOL_WORKERS
+    if workers <= 0:
+        return None, None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_worker,
+            )
+            # Bound the backlog so a burst of uploads queues in the web
+            # workers instead of piling unbounded work into the pool
+            _pending = threading.BoundedSemaphore(workers * settings.IMAGE_POOL_QUEUE_FACTOR)
+            # Start every worker now so the first requests don't pay the import cost
+            for _ in range(workers):
+                _pool.submit(_ping)
+        return _pool, _pending
+
+
+def _reset_pool(broken):
+    """Drop the broken pool and its semaphore; the next caller starts fresh ones"""
+    global _pool, _pending
+    with _pool_lock:
+        # Another thread may already have replaced it
+        if _pool is not broken:
+            return
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pending = None
+
+
+def run_in_pool(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the pool and wait for the result.
+
+    Runs inline when the pool is disabled or its workers have died.
+    """
+    pool, pending = _get_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+
+    with pending:
+        try:
+            return pool.submit(func, *args, **kwargs).result()
+        except BrokenProcessPool:
+            logger.warning("Image worker pool was broken, restarting it")
+            _reset_pool(pool)
+            return func(*args, **kwargs)
+
+
+def run_on_buffer(func, data, *args, **kwargs):
+    """Run func(data, *args, **kwargs) in the pool, passing bytes data through shared memory.
+
+    func receives a memoryview in the worker. A path (or anything else that is not
+    bytes) is sent as is. Bytes in the result come back through shared memory too.
+    """
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        return run_in_pool(func, data, *args, **kwargs)
+
+    pool, pending = _get_pool()
+    if pool is None:
+        return func(data, *args, **kwargs)
+
+    block = _Block(*_write_block(data))
+    try:
+        with pending:
+            try:
+                result = pool.submit(_call_with_blocks, func, (block,) + args, kwargs).result()
+            except BrokenProcessPool:
+                logger.warning("Image worker pool was broken, restarting it")
+                _reset_pool(pool)
+                return func(data, *args, **kwargs)
+    finally:
+        _unlink_block(block)
+    return _blocks_to_bytes(result)
+
+
+def run_image_operation(func, image_data, *args, encoder=None, **kwargs):
+    """Run an image operation in the pool, passing image buffers via shared memory.
+
+    func takes the encoded image bytes (plus args/kwargs) and returns a PIL image.
+    If encoder is given (a picklable callable taking the PIL image and returning
+    bytes), the result is also encoded in the worker and bytes are returned.
+    """
+    pool, pending = _get_pool()
+    if pool is None:
+        result = func(image_data, *args, **kwargs)
+        return encoder(result) if encoder is not None else result
+
+    input_name, input_size = _write_block(image_data)
+    try:
+        with pending:
+            try:
+                descriptor = pool.submit(
+                    _run_image_operation, func, input_name, input_size, args, kwargs, encoder
+                ).result()
+            except BrokenProcessPool:
+                logger.warning("Image worker pool was broken, restarting it")
+                _reset_pool(pool)
+                result = func(image_data, *args, **kwargs)
+                return encoder(result) if encoder is not None else result
+    finally:
+        block = shared_memory.SharedMemory(name=input_name)
+        block.close()
+        block.unlink()
+
+    if descriptor['encoded']:
+        return _read_block(descriptor['name'], descriptor['size'], unlink=True)
+    return _image_from_block(descriptor)
+
+
+def imap_in_pool(func, arg_tuples, max_in_flight=None, buffer_arg=None):
+    """Yield func(*args) for each tuple in arg_tuples, in order.
+
+    Up to max_in_flight calls run in the pool at once, so results are
+    consumed while later ones are still being computed. Runs inline when the
+    pool is disabled, and finishes inline if the workers die.
+
+    buffer_arg is the index of a bytes argument to pass through shared memory
+    (func then receives a memoryview); bytes in the results come back the same way.
+    """
+    pool, pending = _get_pool()
+    if pool is None:
+        for args in arg_tuples:
+            yield func(*args)
+        return
+
+    max_in_flight = max(1, max_in_flight or settings.IMAGE_POOL_WORKERS)
+    arg_tuples = iter(arg_tuples)
+    in_flight = deque()  # (future, args, input block or None)
+
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                args = next(arg_tuples, None)
+                if args is None:
+                    break
+                pending.acquire()
+                if buffer_arg is None:
+                    block = None
+                    future = pool.submit(func, *args)
+                else:
+                    block = _Block(*_write_block(args[buffer_arg]))
+                    shared_args = args[:buffer_arg] + (block,) + args[buffer_arg + 1:]
+                    future = pool.submit(_call_with_blocks, func, shared_args, {})
+                future.add_done_callback(lambda _: pending.release())
+                in_flight.append((future, args, block))
+
+            if not in_flight:
+                return
+
+            future, args, block = in_flight[0]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                logger.warning("Image worker pool was broken, restarting it")
+                _reset_pool(pool)
+                remaining = [args for _, args, _ in in_flight]
+                for _, _, block in in_flight:
+                    if block is not None:
+                        _unlink_block(block)
+                in_flight.clear()
+                for args in remaining:
+                    yield func(*args)
+                for args in arg_tuples:
+                    yield func(*args)
+                return
+            in_flight.popleft()
+            if block is not None:
+                _unlink_block(block)
+                result = _blocks_to_bytes(result)
+            yield result
+    finally:
+        # Consumer stopped early (client disconnected); drop queued work
+        for future, _, block in in_flight:
+            if block is None:
+                future.cancel()
+                continue
+            if not future.cancel():
+                # Already running or done: free its output once it is there
+                future.add_done_callback(_discard_result)
+            _unlink_block(block)
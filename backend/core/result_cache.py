@@ -0,0 +1,384 @@
+"""
+Content-addressed cache for processing results.
+
+Results are keyed on the SHA-256 of the input plus the normalized operation
+parameters, stored on local disk and evicted least-recently-used once the
+cache grows past RESULT_CACHE_MAX_BYTES. A hit skips the processing entirely.
+
+Each process keeps a running total of the cache size, taken from one walk of
+the cache directory and advanced by every write, and walks the directory again
+only when the total crosses the budget. Eviction brings the cache down to 90%,
+so a process walks after writing a tenth of the budget at the latest, and
+picks up what other processes wrote on the way.
+
+    @cached_result('compress_pdf', params=['compression_level'])
+    def compress_pdf(pdf_file, compression_level='medium'):
+        ...
+
+The decorated function may return a file path, bytes, a PIL image, or (with
+output_arg) write its result to the path passed in that argument.
+"""
+import os
+import json
+import mmap
+import shutil
+import hashlib
+import inspect
+import logging
+import tempfile
+import functools
+import threading
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Operation names given to cached_result, in registration order (reported by get_stats)
+_operations = []
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _cache_enabled():
+    # The utils are also used outside Django (scripts, spawned workers without settings)
+    try:
+        return getattr(settings, 'RESULT_CACHE_MAX_BYTES', 0) > 0
+    except ImproperlyConfigured:
+        return False
+
+
+def _hash_input(value, kind):
+    """SHA-256 of the operation input (bytes, a file path, a file object or text)"""
+    digest = hashlib.sha256()
+
+    if kind == 'text':
+        digest.update(str(value).encode('utf-8'))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(value)
+    elif isinstance(value, (str, os.PathLike)):
+        with open(value, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                # Hash straight from the page cache instead of copying chunks out of it
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+    elif hasattr(value, 'read'):
+        position = value.tell() if hasattr(value, 'tell') else 0
+        for chunk in iter(lambda: value.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        value.seek(position)
+    else:
+        raise TypeError(f"Cannot hash input of type {type(value).__name__}")
+
+    return digest.hexdigest()
+
+
+def _normalize(value):
+    """Normalize a parameter so equivalent requests share a cache entry"""
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def make_key(operation, input_digest, params):
+    payload = json.dumps(
+        {'op': operation, 'input': input_digest, 'params': params},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """On-disk LRU store of result files, addressed by key"""
+
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        # Bytes in the cache as far as this process knows; None until the first walk
+        self._total = None
+        self._lock = threading.Lock()
+
+    def _paths(self, key):
+        directory = os.path.join(self.root, key[:2])
+        return os.path.join(directory, key), os.path.join(directory, f'{key}.json')
+
+    def get(self, key):
+        """Return (data_path, meta) for a cached entry or None"""
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(data_path, None)
+            os.utime(meta_path, None)
+        except (OSError, ValueError):
+            return None
+        return data_path, meta
+
+    def put(self, key, source_path, meta):
+        """Store a copy of source_path under key"""
+        data_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        try:
+            replaced = os.stat(data_path).st_size
+        except OSError:
+            replaced = 0
+
+        # Write to temporary names first so readers never see partial entries
+        fd, temp_data = tempfile.mkstemp(dir=os.path.dirname(data_path))
+        os.close(fd)
+        shutil.copyfile(source_path, temp_data)
+        os.replace(temp_data, data_path)
+
+        fd, temp_meta = tempfile.mkstemp(dir=os.path.dirname(meta_path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_meta, meta_path)
+
+        with self._lock:
+            if self._total is not None:
+                self._total += os.path.getsize(source_path) - replaced
+                if self._total <= self.max_bytes:
+                    return
+        self.evict()
+
+    def entries(self):
+        """List (mtime, size, data_path, meta_path) for every entry"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith('.json'):
+                    continue
+                meta_path = os.path.join(directory, filename)
+                data_path = meta_path[:-len('.json')]
+                try:
+                    stat = os.stat(data_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, data_path, meta_path))
+        return entries
+
+    def size(self):
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self):
+        """Walk the cache, deleting least recently used entries until it fits its budget"""
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        if total <= self.max_bytes:
+            self._set_total(total)
+            return
+
+        # Drop to 90% so we don't evict again on the very next write
+        target = self.max_bytes * 0.9
+        for _, size, data_path, meta_path in sorted(entries):
+            if total <= target:
+                break
+            for path in (meta_path, data_path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            total -= size
+        self._set_total(total)
+
+    def _set_total(self, total):
+        with self._lock:
+            self._total = total
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._set_total(0)
+
+
+def get_cache():
+    """The process's cache for the current settings, so its running size total is kept"""
+    config = (str(settings.RESULT_CACHE_DIR), settings.RESULT_CACHE_MAX_BYTES)
+    with _caches_lock:
+        if config not in _caches:
+            _caches[config] = ResultCache(*config)
+        return _caches[config]
+
+
+def _count(operation, outcome):
+    """Increment the hit/miss counter of an operation.
+
+    The increment is a single UPDATE ... SET count = count + 1, so concurrent
+    workers never lose each other's counts.
+    """
+    from django.db import IntegrityError, transaction
+    from django.db.models import F
+
+    try:
+        from .models import ResultCacheCounter
+        counter = ResultCacheCounter.objects.filter(operation=operation, outcome=outcome)
+        if counter.update(count=F('count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                ResultCacheCounter.objects.create(operation=operation, outcome=outcome, count=1)
+        except IntegrityError:
+            # Another worker created the row first
+            counter.update(count=F('count') + 1)
+    except Exception as e:
+        logger.warning(f"Result cache {outcome} for {operation} not counted: {str(e)}")
+
+
+def get_stats():
+    """Hit/miss counters per operation plus the current cache size"""
+    from .models import ResultCacheCounter
+
+    counts = {}
+    for operation, outcome, count in ResultCacheCounter.objects.values_list('operation', 'outcome', 'count'):
+        counts[(operation, outcome)] = count
+        counts[('all', outcome)] = counts.get(('all', outcome), 0) + count
+
+    data = {}
+    for operation in _operations + ['all']:
+        hits = counts.get((operation, 'hit'), 0)
+        misses = counts.get((operation, 'miss'), 0)
+        total = hits + misses
+        data[operation] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total * 100, 2) if total else 0,
+        }
+
+    cache = get_cache()
+    return {
+        'operations': data,
+        'size_bytes': cache.size(),
+        'max_bytes': cache.max_bytes,
+    }
+
+
+def _store(cache, key, result, output_path):
+    """Persist a fresh result; returns nothing, failures only disable caching"""
+    from PIL import Image
+
+    if output_path is not None:
+        meta = {'type': 'output', 'value': result}
+        cache.put(key, output_path, meta)
+    elif isinstance(result, Image.Image):
+        fd, temp_path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
+        try:
+            # Fast lossless encode; the entry only has to round-trip the pixels
+            result.save(temp_path, format='PNG', compress_level=1)
+            cache.put(key, temp_path, {'type': 'image'})
+        finally:
+            os.unlink(temp_path)
+    elif isinstance(result, (bytes, bytearray)):
+        fd, temp_path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(result)
+        try:
+            cache.put(key, temp_path, {'type': 'bytes'})
+        finally:
+            os.unlink(temp_path)
+    elif isinstance(result, str) and os.path.isfile(result):
+        meta = {'type': 'path', 'suffix': os.path.splitext(result)[1]}
+        # Results written into their own temp directory keep their file name
+        if os.path.dirname(os.path.abspath(result)) != os.path.abspath(tempfile.gettempdir()):
+            meta['filename'] = os.path.basename(result)
+        cache.put(key, result, meta)
+
+
+def _restore(data_path, meta, output_path):
+    """Rebuild the function's return value from a cached entry"""
+    from PIL import Image
+
+    kind = meta['type']
+    if kind == 'output':
+        shutil.copyfile(data_path, output_path)
+        result = dict(meta['value'])
+        result['file_path'] = output_path
+        return result
+    if kind == 'image':
+        img = Image.open(data_path)
+        img.load()
+        return img
+    if kind == 'bytes':
+        with open(data_path, 'rb') as f:
+            return f.read()
+    if kind == 'path':
+        # Callers own (and usually delete) the returned file, so hand out a copy
+        if meta.get('filename'):
+            temp_path = os.path.join(tempfile.mkdtemp(), meta['filename'])
+        else:
+            fd, temp_path = tempfile.mkstemp(suffix=meta.get('suffix', ''))
+            os.close(fd)
+        shutil.copyfile(data_path, temp_path)
+        return temp_path
+    raise ValueError(f"Unknown cache entry type: {kind}")
+
+
+def cached_result(operation, params=(), input_arg=None, input_kind='file',
+                  file_params=(), output_arg=None):
+    """Decorator caching a processing function's result by input content and params.
+
+    operation   -- name used in the key and the hit/miss counters
+    params      -- names of the arguments that change the output
+    input_arg   -- argument holding the input (defaults to the first one)
+    input_kind  -- 'file' for bytes/paths/file objects, 'text' for strings
+    file_params -- arguments holding optional extra file paths (hashed by content)
+    output_arg  -- argument naming the file the function writes its result to
+    """
+    if operation not in _operations:
+        _operations.append(operation)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        input_name = input_arg or next(iter(signature.parameters))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _cache_enabled():
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+
+            try:
+                key_params = {name: _normalize(arguments.get(name)) for name in params}
+                for name in file_params:
+                    path = arguments.get(name)
+                    key_params[name] = (
+                        _hash_input(path, 'file') if path and os.path.exists(path) else None
+                    )
+                key = make_key(operation, _hash_input(arguments[input_name], input_kind), key_params)
+            except Exception as e:
+                logger.warning(f"Result cache key failed for {operation}: {str(e)}")
+                return func(*args, **kwargs)
+
+            output_path = arguments.get(output_arg) if output_arg else None
+            cache = get_cache()
+
+            cached = cache.get(key)
+            if cached:
+                try:
+                    result = _restore(cached[0], cached[1], output_path)
+                    _count(operation, 'hit')
+                    return result
+                except Exception as e:
+                    logger.warning(f"Result cache entry for {operation} unreadable: {str(e)}")
+
+            _count(operation, 'miss')
+            result = func(*args, **kwargs)
+
+            try:
+                _store(cache, key, result, output_path)
+            except Exception as e:
+                logger.warning(f"Result cache store failed for {operation}: {str(e)}")
+
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,236 @@
+"""
+Per-request scratch space for temporary files.
+
+A view that needs files on disk gets a private working directory under
+SCRATCH_DIR. The directory is removed when the response is closed, i.e. after
+the last byte of a download has been sent, or right away when the view fails.
+Directories left behind by killed processes are removed by a janitor thread
+once they are older than SCRATCH_ORPHAN_AGE (or by `manage.py clean_scratch`).
+
+While the scratch directory holds more than SCRATCH_MAX_MB, new requests are
+answered with 503 and Retry-After instead of filling up the disk:
+
+    @method_decorator(csrf_exempt, name='dispatch')
+    @method_decorator(uses_scratch, name='post')
+    class MergeView(View):
+        def post(self, request):
+            output_path = request.scratch.path('merged.pdf')
+            ...
+            return FileResponse(open(output_path, 'rb'))
+
+Files made elsewhere (by a library or a pool worker) are moved in with
+request.scratch.adopt(path) so they share the directory's lifetime.
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import functools
+import threading
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Usage is re-measured at most this often; a burst of requests shares one directory walk
+USAGE_CACHE_SECONDS = 1.0
+
+
+class ScratchFull(Exception):
+    pass
+
+
+def _disk_usage(path):
+    """Bytes used by the files under path"""
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _disk_usage(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            # Released while we were counting
+            pass
+    return total
+
+
+class ScratchDir:
+    """One request's working directory, created on first use"""
+
+    def __init__(self, space):
+        self.space = space
+        self._root = None
+        self._released = False
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = tempfile.mkdtemp(prefix='req_', dir=self.space.root)
+        return self._root
+
+    def path(self, name):
+        """Path for a new file called name inside the directory"""
+        return os.path.join(self.root, os.path.basename(name))
+
+    def adopt(self, path):
+        """Move a file or directory created elsewhere into this directory; returns its new path"""
+        target = os.path.join(self.root, os.path.basename(path.rstrip(os.sep)))
+        if os.path.exists(target):
+            target = os.path.join(tempfile.mkdtemp(dir=self.root), os.path.basename(target))
+        shutil.move(path, target)
+        return target
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        freed = 0
+        if self._root is not None:
+            freed = _disk_usage(self._root)
+            shutil.rmtree(self._root, ignore_errors=True)
+        self.space._released(freed)
+
+
+class ScratchSpace:
+    """Quota-checked factory of scratch directories plus usage counters for this process"""
+
+    def __init__(self, root, max_bytes, orphan_age):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.orphan_age = orphan_age
+        self._lock = threading.Lock()
+        self._usage = None
+        self._usage_time = 0.0
+        self._janitor = None
+        self._counters = {'opened': 0, 'released': 0, 'rejected': 0, 'bytes_released': 0, 'orphans_removed': 0}
+        os.makedirs(self.root, exist_ok=True)
+
+    def usage(self, fresh=False):
+        """Bytes currently held in scratch by every process sharing the directory"""
+        with self._lock:
+            now = time.monotonic()
+            if fresh or self._usage is None or now - self._usage_time > USAGE_CACHE_SECONDS:
+                self._usage = _disk_usage(self.root)
+                self._usage_time = now
+            return self._usage
+
+    def open(self):
+        """New scratch directory for a request; raises ScratchFull over the quota"""
+        if self.max_bytes and self.usage() >= self.max_bytes:
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise ScratchFull("Scratch space is full")
+        with self._lock:
+            self._counters['opened'] += 1
+        return ScratchDir(self)
+
+    def _released(self, freed):
+        with self._lock:
+            self._counters['released'] += 1
+            self._counters['bytes_released'] += freed
+            if self._usage is not None:
+                self._usage = max(0, self._usage - freed)
+
+    def clean_orphans(self, max_age=None):
+        """Remove request directories older than max_age seconds; returns how many"""
+        max_age = self.orphan_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            with self._lock:
+                self._counters['orphans_removed'] += removed
+            logger.info(f"Removed {removed} orphaned scratch directories")
+        return removed
+
+    def start_janitor(self, interval):
+        """Clean orphans every interval seconds in a daemon thread (once per process)"""
+        with self._lock:
+            if self._janitor is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.clean_orphans()
+                    except Exception as e:
+                        logger.warning(f"Scratch janitor failed: {str(e)}")
+
+            self._janitor = threading.Thread(target=run, name='scratch-janitor', daemon=True)
+            self._janitor.start()
+
+    def stats(self):
+        active = sum(1 for entry in os.scandir(self.root) if entry.is_dir(follow_symlinks=False))
+        with self._lock:
+            counters = dict(self._counters)
+        counters.update({
+            'bytes_in_use': self.usage(fresh=True),
+            'max_bytes': self.max_bytes,
+            'active_dirs': active,
+            'in_flight': counters['opened'] - counters['released'],
+        })
+        return counters
+
+
+_space = None
+_space_lock = threading.Lock()
+
+
+def get_scratch_space():
+    global _space
+    with _space_lock:
+        if _space is None:
+            _space = ScratchSpace(
+                root=settings.SCRATCH_DIR,
+                max_bytes=settings.SCRATCH_MAX_BYTES,
+                orphan_age=settings.SCRATCH_ORPHAN_AGE,
+            )
+            if settings.SCRATCH_JANITOR_INTERVAL > 0:
+                _space.start_janitor(settings.SCRATCH_JANITOR_INTERVAL)
+        return _space
+
+
+def uses_scratch(view_func):
+    """View decorator giving request.scratch a directory that lives until the response is closed"""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            scratch = get_scratch_space().open()
+        except ScratchFull:
+            response = JsonResponse({'error': 'Server is busy, please try again shortly'}, status=503)
+            response['Retry-After'] = str(settings.SCRATCH_RETRY_AFTER)
+            return response
+
+        request.scratch = scratch
+        try:
+            response = view_func(request, *args, **kwargs)
+        except BaseException:
+            scratch.release()
+            raise
+
+        # The server closes the response after the last byte is sent
+        close = response.close
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                scratch.release()
+
+        response.close = close_and_release
+        return response
+
+    return wrapper
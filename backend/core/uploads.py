@@ -0,0 +1,37 @@
+"""
+Zero-copy access to uploaded files.
+
+Django keeps small uploads in memory and spools larger ones (over
+FILE_UPLOAD_MAX_MEMORY_SIZE) to a temporary file. Processing functions take
+either a path or bytes, so an upload is handed over as it already is instead
+of being copied into yet another temporary file:
+
+    source = upload_source(request.FILES['file'])   # path if spooled, else bytes
+    result = compress_pdf(source)
+"""
+from django.core.files.move import file_move_safe
+
+
+def is_spooled(uploaded_file):
+    return hasattr(uploaded_file, 'temporary_file_path')
+
+
+def upload_source(uploaded_file):
+    """Path of an upload Django spooled to disk, or the bytes of one held in memory"""
+    if is_spooled(uploaded_file):
+        return uploaded_file.temporary_file_path()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def save_upload(uploaded_file, path):
+    """Store an upload at path, moving the spooled file into place instead of copying it"""
+    if is_spooled(uploaded_file):
+        # A rename on the same filesystem; Django's cleanup tolerates the file being gone
+        file_move_safe(uploaded_file.temporary_file_path(), path)
+        return path
+
+    with open(path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return path
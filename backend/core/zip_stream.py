@@ -0,0 +1,114 @@
+"""
+Streaming ZIP archives.
+
+Members are written one at a time and the archive is yielded chunk by chunk,
+so a response can start before the last member exists and only one member is
+held in memory at a time. Nothing touches the filesystem.
+
+Formats that are already compressed (images, PDFs, archives) are STORED;
+everything else is DEFLATEd.
+
+    members = ((f'page_{i}.png', png_bytes) for i, png_bytes in render_pages())
+    return zip_response(members, 'pdf_images.zip')
+"""
+import os
+import time
+import zipfile
+from django.http import StreamingHttpResponse
+
+
+# Deflating these again costs CPU and saves next to nothing
+STORED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.pdf',
+    '.zip', '.gz', '.mp3', '.mp4', '.docx', '.xlsx', '.pptx',
+}
+
+
+def compress_type_for(name):
+    """STORED for already-compressed formats, DEFLATED for the rest"""
+    extension = os.path.splitext(name)[1].lower()
+    return zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+class _ChunkWriter:
+    """Write-only, non-seekable file object that buffers what ZipFile writes"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_data(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        yield data
+    else:
+        yield from data
+
+
+def stream_zip(members, compress_type=None):
+    """Yield a ZIP archive as byte chunks.
+
+    members is an iterable of (name, data) pairs where data is bytes or an
+    iterable of bytes chunks. It is consumed lazily. compress_type forces one
+    method for every member instead of choosing by file extension.
+    """
+    writer = _ChunkWriter()
+    # Without seek() ZipFile writes sizes in data descriptors after each member
+    with zipfile.ZipFile(writer, 'w') as zip_file:
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = compress_type if compress_type is not None else compress_type_for(name)
+            with zip_file.open(info, 'w') as member:
+                for chunk in _iter_data(data):
+                    member.write(chunk)
+                    buffered = writer.drain()
+                    if buffered:
+                        yield buffered
+            buffered = writer.drain()
+            if buffered:
+                yield buffered
+
+    # Central directory
+    yield writer.drain()
+
+
+def write_zip(members, output_path, compress_type=None):
+    """Write a streamed ZIP archive to output_path and return the member count"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for member in members:
+            count += 1
+            yield member
+
+    with open(output_path, 'wb') as f:
+        for chunk in stream_zip(counted(), compress_type):
+            f.write(chunk)
+    return count
+
+
+def zip_response(members, filename, compress_type=None):
+    """StreamingHttpResponse sending the archive as it is built"""
+    response = StreamingHttpResponse(
+        stream_zip(members, compress_type),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,144 @@
+"""
+Single-pass color adjustments.
+
+Brightness, contrast, saturation and vibrance steps are compiled into stages:
+consecutive linear steps collapse into one 3x3 matrix plus offset, while
+vibrance, which depends on each pixel's own saturation, sits between them.
+The compiled chain then makes one pass over the uint8 pixels:
+
+    linear, no channel mixing   one lookup table per channel (Image.point)
+    linear, channels mixing     one color matrix (Image.convert)
+    with vibrance               OpenCV over bands of pixels, so only one band is held as floats
+
+Values are clipped once at the end rather than after every step, and alpha
+is left as it is.
+"""
+import math
+import cv2
+import numpy as np
+from PIL import Image
+
+# ITU-R 601-2 luma weights, as used by PIL's L conversion and ImageEnhance
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+# Pixels converted to float at once when vibrance is involved (small enough to stay in cache)
+CHUNK_PIXELS = 1 << 18
+
+# Contrast measures the mean gray on at most this many pixels (a nearest-neighbour subsample)
+MEAN_SAMPLE_PIXELS = 1 << 20
+
+
+def _brightness_stages(channels, mean_luma, factor=1.2):
+    """Scale towards black"""
+    return [('linear', factor * np.eye(channels), np.zeros(channels))]
+
+
+def _contrast_stages(channels, mean_luma, factor=1.2):
+    """Scale around the mean gray of the image, as transformed so far"""
+    return [('linear', factor * np.eye(channels), np.full(channels, (1 - factor) * int(mean_luma() + 0.5)))]
+
+
+def _color_stages(channels, mean_luma, saturation=1.2, vibrance=1.1):
+    """Saturation moves every pixel away from its gray value; vibrance mostly moves muted ones"""
+    if channels == 1:
+        return []
+    stages = [('linear', saturation * np.eye(3) + (1 - saturation) * np.outer(np.ones(3), LUMA_WEIGHTS),
+               np.zeros(3))]
+    if vibrance != 1.0:
+        stages.append(('vibrance', vibrance))
+    return stages
+
+
+COLOR_STEPS = {
+    'brightness': _brightness_stages,
+    'contrast': _contrast_stages,
+    'color_enhance': _color_stages,
+}
+
+
+def _run_stages(pixels, stages):
+    """Apply compiled stages to an (N, 1, channels) float32 array; returns the result unclipped"""
+    for stage in stages:
+        if stage[0] == 'linear':
+            _, matrix, offset = stage
+            pixels = cv2.transform(pixels, np.column_stack([matrix, offset]).astype(np.float32))
+        else:
+            # Boost runs from the full amount for gray pixels down to none for fully saturated ones
+            gray = cv2.transform(pixels, LUMA_WEIGHTS[None, :].astype(np.float32))
+            red, green, blue = cv2.split(pixels)
+            spread = cv2.max(cv2.max(red, green), blue) - cv2.min(cv2.min(red, green), blue)
+            boost = 1 + (stage[1] - 1) * (1 - np.clip(spread * (1 / 255), 0, 1))
+            pixels = cv2.merge([gray + boost * (channel - gray) for channel in (red, green, blue)])
+    return pixels
+
+
+def compile_color_steps(steps, base):
+    """
+    Compose (step, params) pairs into stages for base (an L or RGB image).
+    Consecutive linear steps become one matrix and offset.
+    """
+    channels = len(base.getbands())
+    stages = []
+    sample = []
+
+    def mean_luma():
+        # Mean gray of the image after the stages compiled so far
+        if not sample:
+            step = max(1, math.ceil(math.sqrt(base.width * base.height / MEAN_SAMPLE_PIXELS)))
+            small = base if step == 1 else base.resize(
+                (max(1, base.width // step), max(1, base.height // step)), Image.Resampling.NEAREST)
+            sample.append(np.asarray(small, dtype=np.float32).reshape(-1, 1, channels))
+        pixels = _run_stages(sample[0], stages).reshape(-1, channels)
+        weights = LUMA_WEIGHTS if channels == 3 else np.ones(1)
+        return float((pixels @ weights).mean())
+
+    for step, params in steps:
+        for stage in COLOR_STEPS[step](channels, mean_luma, **params):
+            if stage[0] == 'linear' and stages and stages[-1][0] == 'linear':
+                _, matrix, offset = stage
+                _, previous_matrix, previous_offset = stages[-1]
+                stages[-1] = ('linear', matrix @ previous_matrix, matrix @ previous_offset + offset)
+            else:
+                stages.append(stage)
+    return stages
+
+
+def apply_color_steps(img, steps):
+    """Apply consecutive brightness/contrast/color_enhance steps in one pass over the pixels"""
+    if not steps:
+        return img
+
+    if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or 'A' in img.getbands() else 'RGB')
+    alpha = img.getchannel('A') if 'A' in img.getbands() else None
+    base = img.convert(img.mode.rstrip('A')) if alpha is not None else img
+    channels = len(base.getbands())
+
+    stages = compile_color_steps(steps, base)
+    if not stages:
+        result = base.copy()
+    elif len(stages) == 1 and stages[0][0] == 'linear':
+        _, matrix, offset = stages[0]
+        if np.count_nonzero(matrix - np.diag(np.diag(matrix))) == 0:
+            # No channel mixing: one lookup table per channel
+            levels = np.arange(256)
+            lut = np.concatenate([
+                np.clip(np.round(levels * matrix[c, c] + offset[c]), 0, 255) for c in range(channels)
+            ])
+            result = base.point(lut.astype(int).tolist())
+        else:
+            result = base.convert('RGB', tuple(np.column_stack([matrix, offset]).ravel().tolist()))
+    else:
+        # Results are written back over the one uint8 copy of the pixels
+        pixels = np.array(base)
+        flat = pixels.reshape(-1, 1, channels)
+        for start in range(0, len(flat), CHUNK_PIXELS):
+            chunk = _run_stages(flat[start:start + CHUNK_PIXELS].astype(np.float32), stages)
+            np.rint(chunk, out=chunk)
+            np.clip(chunk, 0, 255, out=chunk)
+            flat[start:start + CHUNK_PIXELS] = chunk.reshape(-1, 1, channels)
+        result = Image.fromarray(pixels)
+
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
@@ -0,0 +1,233 @@
+"""
+Denoise engines.
+
+Every engine takes a uint8 RGB (or L) array and returns one the same shape.
+They are run tile by tile by process_tiles, so each also says how far it
+reads beyond a pixel (its halo). Presets trade speed against quality, and
+filter strength follows the noise level measured on the image, so the same
+preset suits light and heavy noise:
+
+    bilateral       OpenCV bilateral filter (fixed strength, as before)
+    gaussian        Gaussian blur
+    nlm             non-local means on luma at full resolution, chroma at reduced resolution
+    guided          guided filter steered by luma
+    fast_bilateral  separable bilateral: a 1-D pass along rows, then along columns
+    auto            picked by image size from DENOISE_AUTO
+
+`manage.py benchmark_denoise` reports PSNR against runtime for every engine and preset.
+"""
+import math
+import cv2
+import numpy as np
+
+DENOISE_PRESETS = {
+    'bilateral': {
+        'fast': {'diameter': 5},
+        'balanced': {'diameter': 9},
+        'quality': {'diameter': 13},
+    },
+    'gaussian': {
+        'fast': {'kernel': 3},
+        'balanced': {'kernel': 5},
+        'quality': {'kernel': 7},
+    },
+    'nlm': {
+        'fast': {'template': 5, 'search': 11, 'chroma_scale': 4},
+        'balanced': {'template': 7, 'search': 15, 'chroma_scale': 2},
+        'quality': {'template': 7, 'search': 21, 'chroma_scale': 2},
+    },
+    'guided': {
+        'fast': {'radius': 4, 'subsample': 2},
+        'balanced': {'radius': 2, 'subsample': 1},
+        'quality': {'radius': 3, 'subsample': 1},
+    },
+    'fast_bilateral': {
+        'fast': {'radius': 3},
+        'balanced': {'radius': 5},
+        'quality': {'radius': 8},
+    },
+}
+
+DENOISE_PRESET_NAMES = ('fast', 'balanced', 'quality')
+
+# Engine and preset used for method='auto': the first row whose pixel limit the image fits under
+DENOISE_AUTO = [
+    (2_000_000, 'nlm', 'fast'),
+    (12_000_000, 'guided', 'quality'),
+    (None, 'guided', 'fast'),
+]
+
+# Filter strength per unit of measured noise standard deviation
+NLM_STRENGTH = 1.0
+GUIDED_STRENGTH = 3.0
+FAST_BILATERAL_STRENGTH = 2.5
+
+# Noise is measured on a centered crop of at most this many pixels per side
+NOISE_SAMPLE_SIDE = 1024
+
+# Assumed noise level when the image is too small to measure
+DEFAULT_NOISE_SIGMA = 10.0
+
+
+def estimate_noise(img):
+    """Standard deviation of Gaussian noise in the luma of a PIL image (Immerkaer's fast estimate)"""
+    width, height = img.size
+    if width < 3 or height < 3:
+        return DEFAULT_NOISE_SIGMA
+
+    left = max(0, (width - NOISE_SAMPLE_SIDE) // 2)
+    top = max(0, (height - NOISE_SAMPLE_SIDE) // 2)
+    crop = img.crop((left, top, min(width, left + NOISE_SAMPLE_SIDE), min(height, top + NOISE_SAMPLE_SIDE)))
+    gray = np.asarray(crop.convert('L'), dtype=np.float32)
+
+    # Difference of two Laplacians cancels image structure and keeps the noise
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], np.float32)
+    response = cv2.filter2D(gray, -1, kernel)[1:-1, 1:-1]
+    rows, cols = response.shape
+    return float(math.sqrt(math.pi / 2) * np.abs(response).sum() / (6 * rows * cols))
+
+
+def _bilateral(pixels, sigma, diameter):
+    return cv2.bilateralFilter(pixels, diameter, 75, 75)
+
+
+def _gaussian(pixels, sigma, kernel):
+    return cv2.GaussianBlur(pixels, (kernel, kernel), 0)
+
+
+def _nlm(pixels, sigma, template, search, chroma_scale):
+    """Non-local means; chroma noise is coarse, so chroma is filtered on a smaller copy"""
+    strength = max(1.0, NLM_STRENGTH * sigma)
+    if pixels.ndim == 2:
+        return cv2.fastNlMeansDenoising(pixels, None, strength, template, search)
+
+    luma, cr, cb = cv2.split(cv2.cvtColor(pixels, cv2.COLOR_RGB2YCrCb))
+    luma = cv2.fastNlMeansDenoising(luma, None, strength, template, search)
+
+    # Channel noise reaches Cr and Cb about as strongly as luma; downscaling averages it away
+    chroma = cv2.merge([cr, cb])
+    height, width = luma.shape
+    if chroma_scale > 1:
+        chroma = cv2.resize(chroma, (max(1, width // chroma_scale), max(1, height // chroma_scale)),
+                            interpolation=cv2.INTER_AREA)
+    chroma_strength = max(1.0, strength / chroma_scale)
+    chroma = cv2.fastNlMeansDenoising(chroma, None, chroma_strength, template, search)
+    if chroma_scale > 1:
+        chroma = cv2.resize(chroma, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    cr, cb = cv2.split(chroma)
+    return cv2.cvtColor(cv2.merge([luma, cr, cb]), cv2.COLOR_YCrCb2RGB)
+
+
+def _guided(pixels, sigma, radius, subsample):
+    """
+    Guided filter (He et al.) of every channel, steered by luma. With subsample > 1 the
+    linear coefficients are fitted on a reduced copy and upsampled (the "fast guided filter").
+    """
+    eps = (GUIDED_STRENGTH * sigma) ** 2
+    src = pixels.astype(np.float32)
+    guide = src if pixels.ndim == 2 else cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY).astype(np.float32)
+    if pixels.ndim == 3:
+        guide_channels = cv2.merge([guide] * pixels.shape[2])
+    else:
+        guide_channels = guide
+
+    height, width = guide.shape
+    small_size = (max(1, width // subsample), max(1, height // subsample))
+    if subsample > 1:
+        fit_guide = cv2.resize(guide_channels, small_size, interpolation=cv2.INTER_AREA)
+        fit_src = cv2.resize(src, small_size, interpolation=cv2.INTER_AREA)
+    else:
+        fit_guide, fit_src = guide_channels, src
+    size = (2 * (radius // subsample) + 1,) * 2
+
+    def box(values):
+        return cv2.boxFilter(values, cv2.CV_32F, size, borderType=cv2.BORDER_REFLECT)
+
+    mean_i = box(fit_guide)
+    var_i = box(fit_guide * fit_guide) - mean_i * mean_i
+    mean_p = box(fit_src)
+    cov_ip = box(fit_guide * fit_src) - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    mean_a, mean_b = box(a), box(b)
+    if subsample > 1:
+        mean_a = cv2.resize(mean_a, (width, height), interpolation=cv2.INTER_LINEAR)
+        mean_b = cv2.resize(mean_b, (width, height), interpolation=cv2.INTER_LINEAR)
+    result = mean_a * guide_channels + mean_b
+    return np.clip(result + 0.5, 0, 255).astype(np.uint8)
+
+
+def _shifted(padded, offset, radius, length, axis):
+    """View of padded moved by offset along axis, cropped back to length"""
+    start = radius + offset
+    return padded[:, start:start + length] if axis == 1 else padded[start:start + length]
+
+
+def _bilateral_pass(src, gray, radius, sigma_spatial, sigma_range, axis):
+    """1-D bilateral filter of a float32 image along one axis, with range weights taken from gray"""
+    length = src.shape[axis]
+    mode = 'reflect' if length > radius else 'edge'
+    pad = [(0, 0)] * src.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(src, pad, mode=mode)
+    padded_gray = np.pad(gray, pad[:2], mode=mode)
+
+    total = src.copy()
+    weights = np.ones(gray.shape, np.float32)
+    range_scale = np.float32(-0.5 / (sigma_range * sigma_range))
+    for offset in range(-radius, radius + 1):
+        if offset == 0:
+            continue
+        difference = _shifted(padded_gray, offset, radius, length, axis) - gray
+        weight = np.exp(difference * difference * range_scale
+                        + np.float32(-offset * offset / (2 * sigma_spatial ** 2)))
+        weights += weight
+        neighbour = _shifted(padded, offset, radius, length, axis)
+        total += neighbour * (weight if src.ndim == 2 else weight[..., None])
+    return total / (weights if src.ndim == 2 else weights[..., None])
+
+
+def _fast_bilateral(pixels, sigma, radius):
+    """
+    Separable bilateral approximation: rows, then columns, so 4 * radius samples per
+    pixel instead of a disc of them. Edges are found on luma and applied to every channel.
+    """
+    sigma_range = max(1.0, FAST_BILATERAL_STRENGTH * sigma)
+    src = pixels.astype(np.float32)
+    gray = src if pixels.ndim == 2 else cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY).astype(np.float32)
+    result = _bilateral_pass(src, gray, radius, radius / 2, sigma_range, axis=1)
+    gray = result if pixels.ndim == 2 else cv2.cvtColor(result, cv2.COLOR_RGB2GRAY)
+    result = _bilateral_pass(result, gray, radius, radius / 2, sigma_range, axis=0)
+    return np.clip(result + 0.5, 0, 255).astype(np.uint8)
+
+
+DENOISE_ENGINES = {
+    # engine, halo for the preset
+    'bilateral': (_bilateral, lambda diameter: diameter // 2),
+    'gaussian': (_gaussian, lambda kernel: kernel // 2),
+    'nlm': (_nlm, lambda template, search, chroma_scale: (search // 2 + template // 2 + 1) * chroma_scale),
+    'guided': (_guided, lambda radius, subsample: 2 * radius + 2 * subsample),
+    'fast_bilateral': (_fast_bilateral, lambda radius: radius),
+}
+
+
+def resolve_denoise(method, preset, width, height):
+    """(engine name, preset name) for a request; raises ValueError for unknown names"""
+    if method == 'auto':
+        for max_pixels, method, auto_preset in DENOISE_AUTO:
+            if max_pixels is None or width * height <= max_pixels:
+                return method, auto_preset
+    if method not in DENOISE_PRESETS:
+        raise ValueError(f"Unknown denoise method: {method}")
+    if preset not in DENOISE_PRESET_NAMES:
+        raise ValueError(f"Unknown denoise preset: {preset}")
+    return method, preset
+
+
+def denoise_engine(method, preset, sigma):
+    """(function of a uint8 array, halo in pixels) for an engine, preset and noise level"""
+    engine, halo = DENOISE_ENGINES[method]
+    settings = DENOISE_PRESETS[method][preset]
+    return (lambda pixels: engine(pixels, sigma, **settings)), halo(**settings)
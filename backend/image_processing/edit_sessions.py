@@ -0,0 +1,182 @@
+"""
+In-memory background editing sessions.
+
+The image is uploaded and decoded once; every edit then only sends stroke
+deltas and gets back a low-resolution tile of the region that changed. The
+full-resolution PNG is encoded only on export. Undo restores alpha deltas
+from a capped stack.
+
+Sessions live in the memory of the process that created them, so deployments
+with several web workers need sticky sessions for the editor endpoints.
+"""
+import math
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+import cv2
+from PIL import Image
+from django.conf import settings
+from core.encoding import encode_image
+from .utils import decode_rgba, rasterize_strokes, stroke_edit_box, apply_stroke_runs
+
+
+class EditSessionError(Exception):
+    pass
+
+
+class EditSession:
+    """Decoded RGBA image plus an undo stack of (box, alpha before the edit)"""
+
+    def __init__(self, image, filename, undo_depth, preview_max_side):
+        self.id = uuid.uuid4().hex
+        self.image = image
+        self.filename = filename
+        self.undo_stack = deque(maxlen=undo_depth)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+        height, width = image.shape[:2]
+        self.preview_scale = min(1.0, preview_max_side / max(width, height))
+
+    @property
+    def size(self):
+        height, width = self.image.shape[:2]
+        return width, height
+
+    @property
+    def nbytes(self):
+        return self.image.nbytes + sum(before.nbytes for _, before in self.undo_stack)
+
+    def apply(self, strokes, brush_size=10, operation='erase'):
+        """Apply strokes to the alpha channel; returns the changed box"""
+        width, height = self.size
+        runs = rasterize_strokes(strokes, width, height, brush_size, operation)
+        if not runs:
+            raise EditSessionError("No valid edits could be applied")
+
+        # Keep only the alpha pixels the edit is about to overwrite
+        x0, y0, x1, y1 = box = stroke_edit_box(runs, width, height)
+        self.undo_stack.append((box, self.image[y0:y1, x0:x1, 3].copy()))
+
+        apply_stroke_runs(self.image[:, :, 3], runs)
+        return box
+
+    def undo(self):
+        """Revert the last edit; returns the changed box"""
+        if not self.undo_stack:
+            raise EditSessionError("Nothing to undo")
+
+        box, before = self.undo_stack.pop()
+        x0, y0, x1, y1 = box
+        self.image[y0:y1, x0:x1, 3] = before
+        return box
+
+    @property
+    def preview_size(self):
+        width, height = self.size
+        return math.ceil(width * self.preview_scale), math.ceil(height * self.preview_scale)
+
+    def preview(self, box=None):
+        """Low-resolution PNG tile of box (the whole image by default) and its preview coordinates"""
+        width, height = self.size
+        preview_width, preview_height = self.preview_size
+        x0, y0, x1, y1 = box or (0, 0, width, height)
+        scale = self.preview_scale
+
+        # Snap the tile to whole preview pixels so it lines up with the full preview
+        px0, py0 = math.floor(x0 * scale), math.floor(y0 * scale)
+        px1 = min(preview_width, math.ceil(x1 * scale))
+        py1 = min(preview_height, math.ceil(y1 * scale))
+        region = self.image[math.floor(py0 / scale):min(height, math.ceil(py1 / scale)),
+                            math.floor(px0 / scale):min(width, math.ceil(px1 / scale))]
+
+        if scale < 1:
+            region = cv2.resize(region, (px1 - px0, py1 - py0), interpolation=cv2.INTER_AREA)
+
+        return {
+            'x': px0, 'y': py0,
+            'width': px1 - px0, 'height': py1 - py0,
+            # Fast encode; a tile is replaced by the next edit anyway
+            'png': encode_image(Image.fromarray(region), 'PNG', 'fast'),
+        }
+
+    def export(self):
+        """Full-resolution image"""
+        return Image.fromarray(self.image)
+
+
+class EditSessionStore:
+    """Bounded, thread-safe LRU of edit sessions that expire after ttl seconds idle"""
+
+    def __init__(self, max_bytes, ttl, undo_depth, preview_max_side):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.undo_depth = undo_depth
+        self.preview_max_side = preview_max_side
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, image_data, filename=''):
+        image = decode_rgba(image_data)
+        if image.nbytes > self.max_bytes:
+            raise EditSessionError("Image too large for an editing session")
+
+        session = EditSession(image, filename, self.undo_depth, self.preview_max_side)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(keep=session.id)
+        return session
+
+    def get(self, session_id):
+        """Session by id, or None if it never existed, expired or was evicted"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def touch(self, session):
+        """Re-check the memory budget after a session grew"""
+        with self._lock:
+            self._evict(keep=session.id)
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id in [session_id for session_id, session in self._sessions.items()
+                           if now - session.last_used > self.ttl]:
+            del self._sessions[session_id]
+
+    def _evict(self, keep):
+        """Drop expired sessions, then least recently used ones until under budget"""
+        self._expire()
+        total = sum(session.nbytes for session in self._sessions.values())
+        for session_id in list(self._sessions):
+            if total <= self.max_bytes:
+                break
+            if session_id == keep:
+                continue
+            total -= self._sessions.pop(session_id).nbytes
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = EditSessionStore(
+                max_bytes=settings.EDIT_SESSION_MAX_BYTES,
+                ttl=settings.EDIT_SESSION_TTL,
+                undo_depth=settings.EDIT_SESSION_UNDO_DEPTH,
+                preview_max_side=settings.EDIT_SESSION_PREVIEW_SIZE,
+            )
+        return _store
@@ -0,0 +1,94 @@
+import time
+import statistics
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand
+from image_processing import utils
+
+
+def _synthetic_photo(megapixels, seed=0):
+    """Bright textured subject on a darker gradient background, at roughly 4:3"""
+    rng = np.random.default_rng(seed)
+    width = int(round(np.sqrt(megapixels * 1e6 * 4 / 3)))
+    height = int(round(width * 3 / 4))
+
+    # Smooth, slightly noisy backdrop
+    ramp = np.linspace(40, 90, width, dtype=np.float32)
+    background = np.empty((height, width, 3), np.float32)
+    background[:] = ramp[None, :, None]
+    background[..., 0] += 20
+
+    # Irregular subject built from overlapping ellipses
+    subject = np.zeros((height, width), np.uint8)
+    center = (width // 2, height // 2)
+    for _ in range(6):
+        offset = rng.integers(-width // 10, width // 10, size=2)
+        axes = (int(width * rng.uniform(0.12, 0.22)), int(height * rng.uniform(0.18, 0.3)))
+        cv2.ellipse(subject, (center[0] + int(offset[0]), center[1] + int(offset[1])), axes,
+                    float(rng.uniform(0, 180)), 0, 360, 255, -1)
+
+    texture = cv2.resize(rng.uniform(130, 230, (64, 64, 3)).astype(np.float32), (width, height),
+                         interpolation=cv2.INTER_CUBIC)
+    image = np.where(subject[..., None] > 0, texture, background)
+    image += rng.normal(0, 4, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _iou(mask_a, mask_b):
+    union = np.logical_or(mask_a, mask_b).sum()
+    return np.logical_and(mask_a, mask_b).sum() / union if union else 1.0
+
+
+class Command(BaseCommand):
+    help = "Benchmark full-resolution against proxy background removal (latency and mask IoU)"
+    requires_system_checks = []
+
+    methods = {
+        'auto': utils._remove_background_auto_enhanced,
+        'grabcut': utils._remove_background_grabcut_enhanced,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Photo to benchmark with (a synthetic one is generated otherwise)')
+        parser.add_argument('--megapixels', type=float, default=12,
+                            help='Size of the synthetic photo')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Runs per resolution (the median is reported)')
+        parser.add_argument('--methods', nargs='+', choices=list(self.methods),
+                            default=list(self.methods))
+
+    def handle(self, *args, **options):
+        if options['file']:
+            opencv_img = cv2.imread(options['file'], cv2.IMREAD_COLOR)
+            if opencv_img is None:
+                self.stderr.write(f"Cannot read {options['file']}")
+                return
+            source = options['file']
+        else:
+            opencv_img = _synthetic_photo(options['megapixels'])
+            source = 'synthetic'
+
+        height, width = opencv_img.shape[:2]
+        self.stdout.write(f"Image: {source} {width}x{height} ({width * height / 1e6:.1f} MP), "
+                          f"proxy cap {utils.PROXY_MAX_PIXELS / 1e6:.1f} MP")
+
+        self.stdout.write(f"\n{'method':<12}{'full (s)':>10}{'proxy (s)':>11}{'speedup':>10}{'mask IoU':>10}")
+        for name in options['methods']:
+            remove = self.methods[name]
+            full_seconds, full_result = self._time(lambda: remove(opencv_img, 'full'), options['repeat'])
+            proxy_seconds, proxy_result = self._time(lambda: remove(opencv_img, 'proxy'), options['repeat'])
+
+            # Compare the binarized alpha channels of both results
+            full_mask = np.asarray(full_result.getchannel('A')) > 127
+            proxy_mask = np.asarray(proxy_result.getchannel('A')) > 127
+            self.stdout.write(f"{name:<12}{full_seconds:>10.2f}{proxy_seconds:>11.2f}"
+                              f"{full_seconds / proxy_seconds:>9.1f}x{_iou(full_mask, proxy_mask):>10.4f}")
+
+    def _time(self, func, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings), result
@@ -0,0 +1,101 @@
+import gc
+import time
+import statistics
+from PIL import Image, ImageEnhance
+from django.core.management.base import BaseCommand
+from image_processing.color import apply_color_steps
+from .benchmark_background import _synthetic_photo
+
+
+def _memory_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} missing from /proc/self/status")
+
+
+def _peak_extra_mb(func):
+    """Peak resident memory above the current level while func runs (Linux only)"""
+    gc.collect()
+    # Writing 5 to clear_refs resets the peak (VmHWM) to the current resident size
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    before = _memory_kb('VmRSS')
+    result = func()
+    peak = _memory_kb('VmHWM')
+    del result
+    return (peak - before) / 1024
+
+
+def _image_enhance(img, steps):
+    """The chain as the ImageEnhance calls it replaced: one full-frame blend per step"""
+    for step, params in steps:
+        if step == 'brightness':
+            img = ImageEnhance.Brightness(img).enhance(params['factor'])
+        elif step == 'contrast':
+            img = ImageEnhance.Contrast(img).enhance(params['factor'])
+        else:
+            img = ImageEnhance.Color(img).enhance(params['saturation'])
+            # "Vibrance" used to be a second saturation blend
+            if params['vibrance'] != 1.0:
+                img = ImageEnhance.Color(img).enhance(params['vibrance'])
+    return img
+
+
+class Command(BaseCommand):
+    help = "Benchmark fused color adjustments against chained ImageEnhance blends (latency and peak memory)"
+    requires_system_checks = []
+
+    chains = {
+        'brightness+contrast': [
+            ('brightness', {'factor': 1.1}),
+            ('contrast', {'factor': 1.2}),
+        ],
+        '+saturation': [
+            ('brightness', {'factor': 1.1}),
+            ('contrast', {'factor': 1.2}),
+            ('color_enhance', {'saturation': 1.3, 'vibrance': 1.0}),
+        ],
+        '+vibrance': [
+            ('brightness', {'factor': 1.1}),
+            ('contrast', {'factor': 1.2}),
+            ('color_enhance', {'saturation': 1.2, 'vibrance': 1.3}),
+        ],
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Photo to benchmark with (a synthetic one is generated otherwise)')
+        parser.add_argument('--megapixels', type=float, default=20,
+                            help='Size of the synthetic photo')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per case (the median is reported)')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            img = Image.open(options['file']).convert('RGB')
+            source = options['file']
+        else:
+            img = Image.fromarray(_synthetic_photo(options['megapixels']))
+            source = 'synthetic'
+
+        # Pillow stores RGB with 4 bytes per pixel
+        frame_mb = img.width * img.height * 4 / (1024 * 1024)
+        self.stdout.write(f"Image: {source} {img.width}x{img.height} ({img.width * img.height / 1e6:.1f} MP), "
+                          f"one frame = {frame_mb:.0f} MB")
+
+        self.stdout.write(f"\n{'chain':<22}{'engine':<14}{'time (s)':>10}{'peak (MB)':>11}{'frames':>8}")
+        for name, steps in self.chains.items():
+            for engine, func in (('ImageEnhance', lambda: _image_enhance(img, steps)),
+                                 ('fused', lambda: apply_color_steps(img, steps))):
+                seconds = self._time(func, options['repeat'])
+                peak = _peak_extra_mb(func)
+                self.stdout.write(f"{name:<22}{engine:<14}{seconds:>10.3f}{peak:>11.0f}{peak / frame_mb:>8.1f}")
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,62 @@
+import time
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand
+from image_processing import utils
+from image_processing.denoise import DENOISE_PRESETS, DENOISE_PRESET_NAMES, DENOISE_AUTO, estimate_noise
+from .benchmark_background import _synthetic_photo
+
+
+def _psnr(reference, image):
+    error = np.mean((reference.astype(np.float32) - image.astype(np.float32)) ** 2)
+    return float('inf') if error == 0 else 10 * np.log10(255 ** 2 / error)
+
+
+class Command(BaseCommand):
+    help = "Benchmark denoise engines and presets: PSNR against runtime on synthetic Gaussian noise"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Clean photo to add noise to (a synthetic one is generated otherwise)')
+        parser.add_argument('--megapixels', type=float, nargs='+', default=[1, 4],
+                            help='Sizes of the synthetic photo')
+        parser.add_argument('--sigma', type=float, nargs='+', default=[10, 25],
+                            help='Standard deviations of the added noise')
+        parser.add_argument('--methods', nargs='+', choices=list(DENOISE_PRESETS),
+                            default=list(DENOISE_PRESETS))
+        parser.add_argument('--presets', nargs='+', choices=DENOISE_PRESET_NAMES,
+                            default=list(DENOISE_PRESET_NAMES))
+
+    def handle(self, *args, **options):
+        if options['file']:
+            photos = [(options['file'], np.asarray(Image.open(options['file']).convert('RGB')))]
+        else:
+            photos = [(f"synthetic {megapixels:g} MP", _synthetic_photo(megapixels))
+                      for megapixels in options['megapixels']]
+
+        rng = np.random.default_rng(0)
+        for name, clean in photos:
+            height, width = clean.shape[:2]
+            for sigma in options['sigma']:
+                noisy = np.clip(clean + rng.normal(0, sigma, clean.shape), 0, 255).astype(np.uint8)
+                noisy_img = Image.fromarray(noisy)
+                self.stdout.write(
+                    f"\n{name} ({width}x{height}), noise sigma {sigma:g} "
+                    f"(luma noise estimated at {estimate_noise(noisy_img):.1f}), noisy PSNR {_psnr(clean, noisy):.2f} dB"
+                )
+                self.stdout.write(f"{'method':<16}{'preset':<10}{'time (s)':>10}{'PSNR (dB)':>11}{'MP/s':>8}")
+                for method in options['methods']:
+                    for preset in options['presets']:
+                        start = time.perf_counter()
+                        result = utils._denoise_image(noisy_img, method, preset)
+                        seconds = time.perf_counter() - start
+                        self.stdout.write(
+                            f"{method:<16}{preset:<10}{seconds:>10.2f}{_psnr(clean, np.asarray(result)):>11.2f}"
+                            f"{width * height / 1e6 / seconds:>8.1f}"
+                        )
+
+        auto = ', '.join(
+            f"{'above' if limit is None else f'up to {limit / 1e6:g} MP'}: {method}/{preset}"
+            for limit, method, preset in DENOISE_AUTO
+        )
+        self.stdout.write(f"\nmethod=auto picks by size ({auto})")
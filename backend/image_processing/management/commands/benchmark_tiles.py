@@ -0,0 +1,74 @@
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageFilter
+from django.core.management.base import BaseCommand
+from image_processing import utils, tiles
+from image_processing.denoise import DENOISE_PRESETS
+from .benchmark_background import _synthetic_photo
+from .benchmark_color import _peak_extra_mb
+
+
+def _whole_frame_denoise(img):
+    """Denoise as it was done before tiling: the full frame through OpenCV at once"""
+    opencv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    denoised = cv2.bilateralFilter(opencv_img, DENOISE_PRESETS['bilateral']['balanced']['diameter'], 75, 75)
+    return Image.fromarray(cv2.cvtColor(denoised, cv2.COLOR_BGR2RGB))
+
+
+class Command(BaseCommand):
+    help = "Benchmark tiled denoise/sharpen/upscale against whole-frame processing (latency and peak memory)"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Photo to benchmark with (a synthetic one is generated otherwise)')
+        parser.add_argument('--megapixels', type=float, default=40,
+                            help='Size of the synthetic photo')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, tiles.TILE_WORKERS],
+                            help='Tile thread counts to compare')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            img = Image.open(options['file']).convert('RGB')
+            source = options['file']
+        else:
+            img = Image.fromarray(_synthetic_photo(options['megapixels']))
+            source = 'synthetic'
+
+        # Pillow stores RGB with 4 bytes per pixel
+        frame_mb = img.width * img.height * 4 / (1024 * 1024)
+        self.stdout.write(f"Image: {source} {img.width}x{img.height} ({img.width * img.height / 1e6:.1f} MP), "
+                          f"one input frame = {frame_mb:.0f} MB, tiles of {tiles.TILE_SIZE} px")
+
+        operations = {
+            'upscale 2x LANCZOS': (
+                lambda: img.resize((img.width * 2, img.height * 2), Image.Resampling.LANCZOS),
+                lambda: utils._upscale_image(img, 2.0, 'LANCZOS'),
+            ),
+            'sharpen': (
+                lambda: img.filter(ImageFilter.UnsharpMask(radius=utils.SHARPEN_RADIUS, percent=150, threshold=3)),
+                lambda: utils._sharpen_image(img, 1.0),
+            ),
+            'denoise bilateral': (
+                lambda: _whole_frame_denoise(img),
+                lambda: utils._denoise_image(img, 'bilateral'),
+            ),
+        }
+
+        self.stdout.write(f"\n{'operation':<20}{'mode':<16}{'time (s)':>10}{'peak (MB)':>11}{'frames':>8}")
+        default_workers = tiles.TILE_WORKERS
+        try:
+            for name, (whole_frame, tiled) in operations.items():
+                self._report(name, 'whole frame', whole_frame, frame_mb)
+                for workers in sorted(set(options['workers'])):
+                    tiles.TILE_WORKERS = workers
+                    self._report(name, f"tiled, {workers} thr", tiled, frame_mb)
+        finally:
+            tiles.TILE_WORKERS = default_workers
+
+    def _report(self, name, mode, func, frame_mb):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        peak = _peak_extra_mb(func)
+        self.stdout.write(f"{name:<20}{mode:<16}{seconds:>10.2f}{peak:>11.0f}{peak / frame_mb:>8.1f}")
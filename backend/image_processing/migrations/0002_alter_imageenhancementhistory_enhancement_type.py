@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_processing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageenhancementhistory',
+            name='enhancement_type',
+            field=models.CharField(choices=[('sharpen', 'Sharpen'), ('denoise', 'Denoise'), ('upscale', 'Upscale'), ('color_enhance', 'Color Enhancement'), ('brightness', 'Brightness Adjustment'), ('contrast', 'Contrast Adjustment'), ('pipeline', 'Enhancement Pipeline')], max_length=20),
+        ),
+    ]
@@ -28,6 +28,7 @@ class ImageEnhancementHistory(models.Model):
         ('color_enhance', 'Color Enhancement'),
         ('brightness', 'Brightness Adjustment'),
         ('contrast', 'Contrast Adjustment'),
+        ('pipeline', 'Enhancement Pipeline'),
     ]
     
     original_filename = models.CharField(max_length=255)
@@ -0,0 +1,53 @@
+import os
+import time
+from jobs.registry import register_task
+from .models import BackgroundRemovalHistory
+from .utils import remove_background, save_image_with_quality
+
+
+@register_task('remove_background')
+def remove_background_task(job, progress):
+    """Remove the background of the uploaded image of a job"""
+    input_file = job.input_files[0]
+    start_time = time.time()
+
+    with open(input_file['path'], 'rb') as f:
+        file_data = f.read()
+
+    progress(10, 'Removing background')
+    result_img = remove_background(
+        file_data,
+        method=job.params.get('method', 'auto'),
+        resolution=job.params.get('resolution', 'proxy')
+    )
+
+    progress(80, 'Encoding result')
+    result_data = save_image_with_quality(
+        result_img, format='PNG', profile=job.params.get('encode_profile', 'fast')
+    )
+
+    output_filename = f"{os.path.splitext(input_file['name'])[0]}_no_bg.png"
+    output_path = os.path.join(job.output_dir, output_filename)
+    with open(output_path, 'wb') as f:
+        f.write(result_data)
+
+    processing_time = time.time() - start_time
+
+    try:
+        BackgroundRemovalHistory.objects.create(
+            original_filename=input_file['name'],
+            output_filename=output_filename,
+            file_size_before=len(file_data),
+            file_size_after=len(result_data),
+            processing_time=processing_time,
+            ip_address=job.ip_address
+        )
+    except Exception:
+        pass  # Don't fail if logging fails
+
+    return {
+        'output_path': output_path,
+        'output_filename': output_filename,
+        'content_type': 'image/png',
+        'result': {'processing_time': round(processing_time, 2)}
+    }
@@ -0,0 +1,89 @@
+"""
+Tiled execution of local image filters.
+
+Denoise, sharpen and upscale only look a few pixels around each output pixel,
+so the output is built tile by tile: each tile reads a window of the input
+grown by a halo as wide as the filter's reach, is rendered in a worker thread
+(OpenCV and Pillow release the GIL while filtering) and is pasted into the
+output image, allocated once up front. Halo pixels make every tile match the
+whole-frame result (resampling by a fractional factor can differ by a level or
+two where coefficients round differently); at the image border the window
+stops at the edge, as the whole-frame filter does.
+
+Besides the input and output images, memory is bounded by the windows in
+flight: at most TILE_WORKERS * TILES_IN_FLIGHT_PER_WORKER of them, each
+TILE_SIZE (scaled back to input pixels) plus halo on every side.
+"""
+import os
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Output tile side, in pixels
+TILE_SIZE = 1024
+
+# Threads rendering tiles of one image
+TILE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Tiles queued per thread ahead of the one being pasted
+TILES_IN_FLIGHT_PER_WORKER = 2
+
+
+def _tile_boxes(out_size, in_size, halo, tile_size):
+    """Yield (output box, input window, tile box inside the window in input coordinates)"""
+    out_width, out_height = out_size
+    in_width, in_height = in_size
+    scale_x, scale_y = in_width / out_width, in_height / out_height
+
+    for top in range(0, out_height, tile_size):
+        for left in range(0, out_width, tile_size):
+            right, bottom = min(left + tile_size, out_width), min(top + tile_size, out_height)
+
+            # The tile's footprint on the input, grown by the halo and clipped to the image
+            x0, y0 = left * scale_x, top * scale_y
+            x1, y1 = right * scale_x, bottom * scale_y
+            window = (
+                max(0, math.floor(x0) - halo), max(0, math.floor(y0) - halo),
+                min(in_width, math.ceil(x1) + halo), min(in_height, math.ceil(y1) + halo),
+            )
+            inner = (x0 - window[0], y0 - window[1], x1 - window[0], y1 - window[1])
+            yield (left, top, right, bottom), window, inner
+
+
+def process_tiles(img, render, halo, out_size=None, tile_size=None, workers=None):
+    """
+    Build render's output tile by tile.
+
+    render(window, inner, size) gets a crop of img, the tile's box inside it (in input
+    pixels, fractional when scaling) and the tile's output size, and returns the tile as a
+    PIL image. halo is how far, in input pixels, render looks beyond the tile.
+    """
+    out_size = out_size or img.size
+    tile_size = tile_size or TILE_SIZE
+    workers = TILE_WORKERS if workers is None else workers
+    output = Image.new(img.mode, out_size)
+    # Decode now; threads must only ever read the input
+    img.load()
+
+    def run(window, inner, size):
+        return render(img.crop(window), inner, size)
+
+    tiles = _tile_boxes(out_size, img.size, halo, tile_size)
+    if workers <= 1:
+        for box, window, inner in tiles:
+            output.paste(run(window, inner, (box[2] - box[0], box[3] - box[1])), box[:2])
+        return output
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile') as executor:
+        pending = deque()
+        for box, window, inner in tiles:
+            pending.append((box, executor.submit(run, window, inner, (box[2] - box[0], box[3] - box[1]))))
+            # Paste finished tiles before queueing more, so only a few windows exist at once
+            while len(pending) >= workers * TILES_IN_FLIGHT_PER_WORKER:
+                done_box, future = pending.popleft()
+                output.paste(future.result(), done_box[:2])
+        while pending:
+            done_box, future = pending.popleft()
+            output.paste(future.result(), done_box[:2])
+    return output
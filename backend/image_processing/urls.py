@@ -1,8 +1,17 @@
 from django.urls import path
-from .views import BackgroundRemoverView, ImageEnhancerView, BackgroundEditorView
+from .views import (
+    BackgroundRemoverView, ImageEnhancerView, BackgroundEditorView,
+    EditSessionView, EditSessionDetailView, EditSessionEditView,
+    EditSessionUndoView, EditSessionExportView,
+)
 
 urlpatterns = [
     path('remove-background/', BackgroundRemoverView.as_view(), name='remove_background'),
     path('enhance/', ImageEnhancerView.as_view(), name='enhance_image'),
     path('edit-background/', BackgroundEditorView.as_view(), name='edit_background'),
+    path('edit-sessions/', EditSessionView.as_view(), name='edit_session_create'),
+    path('edit-sessions/<str:session_id>/', EditSessionDetailView.as_view(), name='edit_session_detail'),
+    path('edit-sessions/<str:session_id>/edit/', EditSessionEditView.as_view(), name='edit_session_edit'),
+    path('edit-sessions/<str:session_id>/undo/', EditSessionUndoView.as_view(), name='edit_session_undo'),
+    path('edit-sessions/<str:session_id>/export/', EditSessionExportView.as_view(), name='edit_session_export'),
 ]
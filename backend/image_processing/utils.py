@@ -1,19 +1,53 @@
 import os
+import math
 import tempfile
 import numpy as np
-from PIL import Image, ImageFilter, ImageEnhance
-from io import BytesIO
+from PIL import Image, ImageFilter
 import cv2
+from core.result_cache import cached_result
+from core.encoding import encode_image, DEFAULT_PROFILE
+from core.imaging import load_image, check_pixels
+from .color import apply_color_steps
+from .tiles import process_tiles
+from .denoise import resolve_denoise, denoise_engine, estimate_noise
 
+# GrabCut runs on a downscaled proxy of about this many pixels for larger images
+PROXY_MAX_PIXELS = 1_000_000
 
-def remove_background(image_data, method='auto'):
+# Tile size used when refining the upsampled mask around its boundary
+MASK_REFINE_TILE = 512
+
+# Parameters each enhancement accepts, with the type they are parsed as
+ENHANCEMENT_PARAMS = {
+    'sharpen': {'intensity': float},
+    'denoise': {'method': str, 'preset': str},
+    'upscale': {'scale_factor': float, 'method': str},
+    'color_enhance': {'saturation': float, 'vibrance': float},
+    'brightness': {'factor': float},
+    'contrast': {'factor': float},
+}
+
+# Enhancements that map each pixel on its own; consecutive ones are fused into a single pass (see color.py)
+POINTWISE_ENHANCEMENTS = ('color_enhance', 'brightness', 'contrast')
+
+# Longest enhancement chain accepted in one request
+MAX_ENHANCEMENT_OPERATIONS = 10
+
+# Largest upscale factor accepted per step; the output is also held to the pixel budget
+MAX_UPSCALE_FACTOR = 4.0
+
+
+@cached_result('remove_background', params=['method', 'resolution'])
+def remove_background(image_data, method='auto', resolution='proxy'):
     """
     Remove background from image using enhanced methods
     Methods: 'auto', 'grabcut', 'threshold', 'ai_enhanced'
+    Resolution: 'proxy' segments large images on a ~1 MP copy and refines
+    the upscaled mask at its edges, 'full' runs GrabCut on every pixel
     """
     try:
-        # Open image
-        img = Image.open(BytesIO(image_data))
+        # Decode upright, refusing images over the pixel budget
+        img = load_image(image_data)
         
         # Convert to RGB if necessary
         if img.mode != 'RGB':
@@ -23,59 +57,177 @@ def remove_background(image_data, method='auto'):
         opencv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
         
         if method == 'grabcut':
-            return _remove_background_grabcut_enhanced(opencv_img)
+            return _remove_background_grabcut_enhanced(opencv_img, resolution)
         elif method == 'threshold':
             return _remove_background_threshold_enhanced(opencv_img)
         elif method == 'ai_enhanced':
             return _remove_background_ai_enhanced(opencv_img)
         else:  # auto method (enhanced)
-            return _remove_background_auto_enhanced(opencv_img)
+            return _remove_background_auto_enhanced(opencv_img, resolution)
             
     except Exception as e:
         raise Exception(f"Background removal failed: {str(e)}")
 
 
-def _remove_background_auto_enhanced(opencv_img):
-    """Enhanced automatic background removal using improved GrabCut with fallbacks"""
+def _proxy_scale(opencv_img, resolution):
+    """Downscale factor for the segmentation proxy, or None to segment at full size"""
     height, width = opencv_img.shape[:2]
+    if resolution == 'full' or height * width <= PROXY_MAX_PIXELS:
+        return None
+    return math.sqrt(PROXY_MAX_PIXELS / (height * width))
+
+
+def _guided_filter(guide, src, radius, eps):
+    """Edge-preserving guided filter (He et al.) of src steered by a grayscale guide"""
+    size = (2 * radius + 1, 2 * radius + 1)
+
+    def box(values):
+        return cv2.boxFilter(values, cv2.CV_32F, size, borderType=cv2.BORDER_REFLECT)
+
+    mean_i = box(guide)
+    mean_p = box(src)
+    var_i = box(guide * guide) - mean_i * mean_i
+    cov_ip = box(guide * src) - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return box(a) * guide + box(b)
+
+
+def _band_tiles(band, pad):
+    """Yield (tile, window, inner) slices for every tile the band passes through.
+
+    window is the tile grown by pad pixels on each side (clipped to the
+    image) and inner locates the tile inside the window.
+    """
+    height, width = band.shape
+    for top in range(0, height, MASK_REFINE_TILE):
+        for left in range(0, width, MASK_REFINE_TILE):
+            bottom = min(top + MASK_REFINE_TILE, height)
+            right = min(left + MASK_REFINE_TILE, width)
+            if not band[top:bottom, left:right].any():
+                continue
+
+            y0, x0 = max(0, top - pad), max(0, left - pad)
+            y1, x1 = min(height, bottom + pad), min(width, right + pad)
+            yield (
+                (slice(top, bottom), slice(left, right)),
+                (slice(y0, y1), slice(x0, x1)),
+                (slice(top - y0, bottom - y0), slice(left - x0, right - x0)),
+            )
+
+
+def _boundary_band(mask, reach):
+    """Pixels within reach of a 0/1 mask's boundary (morphological gradient)"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * reach + 1, 2 * reach + 1))
+    return cv2.morphologyEx(mask, cv2.MORPH_GRADIENT, kernel).astype(bool)
+
+
+def _refine_mask(mask, smooth, reach):
+    """uint8 alpha channel from a hard 0/1 mask, smoothed only near its boundary.
+
+    smooth() takes a float32 crop of the mask and returns it smoothed, looking
+    at most reach pixels around each pixel. Further from the boundary than
+    that its input is constant, so those pixels keep their hard value and
+    only the tiles the boundary band crosses are filtered.
+    """
+    alpha = mask * np.uint8(255)
+    band = _boundary_band(mask, reach)
+
+    for tile, window, inner in _band_tiles(band, reach):
+        refined = smooth(mask[window].astype(np.float32))[inner]
+        tile_band = band[tile]
+        alpha[tile][tile_band] = (np.clip(refined[tile_band], 0, 1) * 255).astype(np.uint8)
+
+    return alpha
+
+
+def _upsample_mask(proxy_mask, opencv_img, scale):
+    """Scale a hard 0/1 proxy mask to full resolution.
+
+    The mask is upscaled bilinearly, then pixels in a narrow band around the
+    boundary are re-decided by a guided filter on the full-resolution image,
+    so edges follow the real object outline instead of the proxy's staircase.
+    Only tiles the band passes through are filtered.
+    """
+    height, width = opencv_img.shape[:2]
+    soft = cv2.resize(proxy_mask.astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR)
+    mask = (soft >= 0.5).astype(np.uint8)
+
+    # Band a couple of proxy pixels wide around the boundary
+    radius = max(2, math.ceil(2 / scale))
+    band = _boundary_band(mask, radius)
+    if not band.any():
+        return mask
+
+    gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
+    # The guided filter's support is two box passes wide
+    for tile, window, inner in _band_tiles(band, 2 * radius):
+        guide = gray[window].astype(np.float32) / 255.0
+        refined = _guided_filter(guide, soft[window], radius, 1e-3)[inner]
+        tile_band = band[tile]
+        mask[tile][tile_band] = refined[tile_band] >= 0.5
+
+    return mask
+
+
+def _segment_multiresolution(opencv_img, segment, resolution):
+    """Hard 0/1 foreground mask from segment(), run on a downscaled proxy for large images"""
+    scale = _proxy_scale(opencv_img, resolution)
+    if scale is None:
+        return segment(opencv_img)
+
+    height, width = opencv_img.shape[:2]
+    proxy_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    proxy = cv2.resize(opencv_img, proxy_size, interpolation=cv2.INTER_AREA)
+    return _upsample_mask(segment(proxy), opencv_img, scale)
+
+
+def _grabcut_auto_mask(opencv_img):
+    """GrabCut from a rectangle centred on the image's center of mass"""
+    height, width = opencv_img.shape[:2]
+    
+    # Create smart rectangle based on image analysis
+    gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
+    
+    # Find image center of mass for better rectangle placement
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    
+    # Calculate center of mass
+    M = cv2.moments(thresh)
+    if M["m00"] != 0:
+        cx = int(M["m10"] / M["m00"])
+        cy = int(M["m01"] / M["m00"])
+    else:
+        cx, cy = width // 2, height // 2
+    
+    # Create adaptive rectangle
+    rect_width = int(width * 0.7)
+    rect_height = int(height * 0.8)
+    
+    rect_x = max(0, cx - rect_width // 2)
+    rect_y = max(0, cy - rect_height // 2)
+    rect_width = min(rect_width, width - rect_x)
+    rect_height = min(rect_height, height - rect_y)
     
+    rect = (rect_x, rect_y, rect_width, rect_height)
+    
+    # Initialize GrabCut
+    mask = np.zeros((height, width), np.uint8)
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+    
+    # Apply GrabCut with more iterations for better results
+    cv2.grabCut(opencv_img, mask, rect, bgdModel, fgdModel, 8, cv2.GC_INIT_WITH_RECT)
+    
+    return np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+
+
+def _remove_background_auto_enhanced(opencv_img, resolution='proxy'):
+    """Enhanced automatic background removal using improved GrabCut with fallbacks"""
     try:
         # Method 1: Enhanced GrabCut with better initialization
-        # Create smart rectangle based on image analysis
-        gray = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2GRAY)
-        
-        # Find image center of mass for better rectangle placement
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Calculate center of mass
-        M = cv2.moments(thresh)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-        else:
-            cx, cy = width // 2, height // 2
-        
-        # Create adaptive rectangle
-        rect_width = int(width * 0.7)
-        rect_height = int(height * 0.8)
-        
-        rect_x = max(0, cx - rect_width // 2)
-        rect_y = max(0, cy - rect_height // 2)
-        rect_width = min(rect_width, width - rect_x)
-        rect_height = min(rect_height, height - rect_y)
-        
-        rect = (rect_x, rect_y, rect_width, rect_height)
-        
-        # Initialize GrabCut
-        mask = np.zeros((height, width), np.uint8)
-        bgdModel = np.zeros((1, 65), np.float64)
-        fgdModel = np.zeros((1, 65), np.float64)
-        
-        # Apply GrabCut with more iterations for better results
-        cv2.grabCut(opencv_img, mask, rect, bgdModel, fgdModel, 8, cv2.GC_INIT_WITH_RECT)
-        
-        # Refine the result
-        mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+        mask2 = _segment_multiresolution(opencv_img, _grabcut_auto_mask, resolution)
         
         # Enhanced post-processing
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
@@ -86,13 +238,15 @@ def _remove_background_auto_enhanced(opencv_img):
         # Remove small noise
         mask2 = cv2.morphologyEx(mask2, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)), iterations=1)
         
-        # Apply bilateral filter for better edge preservation
-        mask_float = mask2.astype(np.float32)
-        mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+        def smooth(mask_float):
+            # Apply bilateral filter for better edge preservation
+            mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+            
+            # Final Gaussian blur for smooth edges
+            return cv2.GaussianBlur(mask_float, (5, 5), 1)
         
-        # Final Gaussian blur for smooth edges
-        mask_float = cv2.GaussianBlur(mask_float, (5, 5), 1)
-        mask2 = np.clip(mask_float, 0, 1)
+        # Only the boundary band changes (bilateral radius 4 + Gaussian radius 2)
+        mask2 = _refine_mask(mask2, smooth, reach=6)
         
     except Exception:
         # Fallback to enhanced edge-based method
@@ -193,38 +347,35 @@ def _create_simple_mask(opencv_img):
 
 
 def _apply_mask_to_image(opencv_img, mask):
-    """Apply mask to image with transparency"""
-    # Ensure mask is in correct format
-    if mask.dtype != np.float32:
-        mask = mask.astype(np.float32)
-    
-    if len(mask.shape) == 2:
-        # Create 3-channel mask
-        mask_3channel = np.stack([mask, mask, mask], axis=-1)
-    else:
-        mask_3channel = mask
-    
-    # Apply mask
-    result = opencv_img.astype(np.float32) * mask_3channel
-    result = result.astype(np.uint8)
+    """Apply mask to image with transparency.
+
+    mask is either a uint8 alpha channel or a float mask in 0-1. The RGBA
+    result is built in place in uint8; colour is premultiplied by alpha, which
+    only needs arithmetic on the partially transparent edge pixels.
+    """
+    # Ensure mask is a uint8 alpha channel
+    if mask.ndim == 3:
+        mask = mask[:, :, 0]
+    if mask.dtype != np.uint8:
+        mask = (np.clip(mask, 0, 1) * 255).astype(np.uint8)
     
-    # Convert to PIL with transparency
-    result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-    result_pil = Image.fromarray(result_rgb)
+    rgba = cv2.cvtColor(opencv_img, cv2.COLOR_BGR2RGBA)
+    rgba[:, :, 3] = mask
     
-    # Create alpha channel
-    alpha_channel = (mask * 255).astype(np.uint8)
-    if len(alpha_channel.shape) == 3:
-        alpha_channel = alpha_channel[:, :, 0]
+    # Fully transparent pixels turn black
+    np.multiply(rgba, (mask > 0)[:, :, None], out=rgba)
     
-    alpha = Image.fromarray(alpha_channel)
-    result_pil.putalpha(alpha)
+    # Scale the colour of partially transparent pixels by their alpha
+    ys, xs = np.nonzero(cv2.inRange(mask, 1, 254))
+    if len(ys):
+        edge_alpha = mask[ys, xs].astype(np.uint16)[:, None]
+        rgba[ys, xs, :3] = (rgba[ys, xs, :3] * edge_alpha // 255).astype(np.uint8)
     
-    return result_pil
+    return Image.fromarray(rgba)
 
 
-def _remove_background_grabcut_enhanced(opencv_img):
-    """Enhanced GrabCut algorithm with better initialization and post-processing"""
+def _grabcut_rect_mask(opencv_img):
+    """GrabCut from the padded bounding box of the largest Otsu contour"""
     height, width = opencv_img.shape[:2]
     
     # Enhanced rectangle calculation based on image content
@@ -258,12 +409,16 @@ def _remove_background_grabcut_enhanced(opencv_img):
     bgdModel = np.zeros((1, 65), np.float64)
     fgdModel = np.zeros((1, 65), np.float64)
     
+    # Apply GrabCut with more iterations
+    cv2.grabCut(opencv_img, mask, rect, bgdModel, fgdModel, 8, cv2.GC_INIT_WITH_RECT)
+    
+    return np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+
+
+def _remove_background_grabcut_enhanced(opencv_img, resolution='proxy'):
+    """Enhanced GrabCut algorithm with better initialization and post-processing"""
     try:
-        # Apply GrabCut with more iterations
-        cv2.grabCut(opencv_img, mask, rect, bgdModel, fgdModel, 8, cv2.GC_INIT_WITH_RECT)
-        
-        # Create final mask
-        mask2 = np.where((mask == 2) | (mask == 0), 0, 1).astype('uint8')
+        mask2 = _segment_multiresolution(opencv_img, _grabcut_rect_mask, resolution)
         
         # Enhanced post-processing
         # Remove small noise
@@ -274,13 +429,14 @@ def _remove_background_grabcut_enhanced(opencv_img):
         kernel_large = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
         mask2 = cv2.morphologyEx(mask2, cv2.MORPH_CLOSE, kernel_large)
         
-        # Smooth edges with bilateral filter
-        mask_float = mask2.astype(np.float32)
-        mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+        def smooth(mask_float):
+            # Smooth edges with bilateral filter
+            mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+            
+            # Final Gaussian blur for natural edges
+            return cv2.GaussianBlur(mask_float, (3, 3), 1)
         
-        # Final Gaussian blur for natural edges
-        mask_float = cv2.GaussianBlur(mask_float, (3, 3), 1)
-        mask2 = np.clip(mask_float, 0, 1)
+        mask2 = _refine_mask(mask2, smooth, reach=5)
         
     except Exception:
         # Fallback if GrabCut fails
@@ -361,15 +517,17 @@ def _remove_background_threshold_enhanced(opencv_img):
     kernel_large = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (9, 9))
     foreground_mask = cv2.morphologyEx(foreground_mask, cv2.MORPH_CLOSE, kernel_large)
     
-    # Smooth the mask
-    mask_float = foreground_mask.astype(np.float32) / 255.0
-    mask_float = cv2.GaussianBlur(mask_float, (5, 5), 1)
+    def smooth(mask_float):
+        # Smooth the mask
+        mask_float = cv2.GaussianBlur(mask_float, (5, 5), 1)
+        
+        # Apply bilateral filter for edge preservation
+        return cv2.bilateralFilter(mask_float, 9, 75, 75)
     
-    # Apply bilateral filter for edge preservation
-    mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+    alpha = _refine_mask((foreground_mask > 0).astype(np.uint8), smooth, reach=6)
     
     # Apply mask to image
-    result = _apply_mask_to_image(opencv_img, mask_float)
+    result = _apply_mask_to_image(opencv_img, alpha)
     return result
 
 
@@ -436,85 +594,176 @@ def _remove_background_ai_enhanced(opencv_img):
                 except:
                     pass  # Use watershed mask if GrabCut fails
         
-        # Convert to float for processing
-        mask_float = mask.astype(np.float32) / 255.0
-        
         # Advanced post-processing
-        # Edge-preserving filter
-        mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
-        
-        # Morphological refinement
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        mask_uint8 = (mask_float * 255).astype(np.uint8)
-        mask_uint8 = cv2.morphologyEx(mask_uint8, cv2.MORPH_CLOSE, kernel)
-        mask_uint8 = cv2.morphologyEx(mask_uint8, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
-        
-        mask_float = mask_uint8.astype(np.float32) / 255.0
+        def smooth(mask_float):
+            # Edge-preserving filter
+            mask_float = cv2.bilateralFilter(mask_float, 9, 75, 75)
+            
+            # Morphological refinement
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+            mask_uint8 = (mask_float * 255).astype(np.uint8)
+            mask_uint8 = cv2.morphologyEx(mask_uint8, cv2.MORPH_CLOSE, kernel)
+            mask_uint8 = cv2.morphologyEx(mask_uint8, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+            
+            mask_float = mask_uint8.astype(np.float32) / 255.0
+            
+            # Final smoothing
+            return cv2.GaussianBlur(mask_float, (3, 3), 1)
         
-        # Final smoothing
-        mask_float = cv2.GaussianBlur(mask_float, (3, 3), 1)
+        # Bilateral 4 + closing 4 + opening 2 + Gaussian 1
+        alpha = _refine_mask((mask > 0).astype(np.uint8), smooth, reach=11)
         
     except Exception:
         # Fallback to enhanced GrabCut
         return _remove_background_grabcut_enhanced(opencv_img)
     
     # Apply mask to image
-    result = _apply_mask_to_image(opencv_img, mask_float)
+    result = _apply_mask_to_image(opencv_img, alpha)
     return result
 
 
-def enhance_image(image_data, enhancement_type, **kwargs):
+def normalize_operations(operations):
+    """
+    Validate an enhancement chain: a list of {'type': ..., <params>} objects.
+    Returns copies with parameters converted to their types; raises ValueError.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > MAX_ENHANCEMENT_OPERATIONS:
+        raise ValueError(f"At most {MAX_ENHANCEMENT_OPERATIONS} operations per request")
+    
+    normalized = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError("Each operation must be an object")
+        params = dict(operation)
+        enhancement_type = params.pop('type', None)
+        if enhancement_type not in ENHANCEMENT_PARAMS:
+            raise ValueError(f"Unknown enhancement type: {enhancement_type}")
+        
+        allowed = ENHANCEMENT_PARAMS[enhancement_type]
+        unknown = set(params) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {enhancement_type}: {', '.join(sorted(unknown))}")
+        try:
+            params = {name: allowed[name](value) for name, value in params.items()}
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid parameters for {enhancement_type}")
+        if enhancement_type == 'upscale' and 'scale_factor' in params:
+            # The negated test also rejects NaN
+            if not 1.0 < params['scale_factor'] <= MAX_UPSCALE_FACTOR:
+                raise ValueError(f"scale_factor must be above 1 and at most {MAX_UPSCALE_FACTOR:g}")
+        if enhancement_type == 'denoise':
+            # Reject unknown engine or preset names before the image is decoded
+            resolve_denoise(params.get('method', 'bilateral'), params.get('preset', 'balanced'), 0, 0)
+        normalized.append({'type': enhancement_type, **params})
+    return normalized
+
+
+def chain_output_size(size, operations):
+    """(width, height) a normalized enhancement chain turns an image of the given size into"""
+    for operation in operations:
+        if operation['type'] == 'upscale':
+            scale_factor = operation.get('scale_factor', 2.0)
+            size = (int(size[0] * scale_factor), int(size[1] * scale_factor))
+    return size
+
+
+def enhance_image(image_data, enhancement_type=None, operations=None, **kwargs):
     """
-    Enhance image with various methods
+    Enhance image with one method, or an ordered chain of them
     Types: 'sharpen', 'denoise', 'upscale', 'color_enhance', 'brightness', 'contrast'
+    operations: [{'type': 'denoise', 'method': 'bilateral'}, {'type': 'sharpen', 'intensity': 1.5}, ...]
+    The chain runs on one decoded image and is encoded once by the caller.
     """
     try:
-        img = Image.open(BytesIO(image_data))
-        
-        if enhancement_type == 'sharpen':
-            return _sharpen_image(img, **kwargs)
-        elif enhancement_type == 'denoise':
-            return _denoise_image(img, **kwargs)
-        elif enhancement_type == 'upscale':
-            return _upscale_image(img, **kwargs)
-        elif enhancement_type == 'color_enhance':
-            return _enhance_colors(img, **kwargs)
-        elif enhancement_type == 'brightness':
-            return _adjust_brightness(img, **kwargs)
-        elif enhancement_type == 'contrast':
-            return _adjust_contrast(img, **kwargs)
-        else:
-            raise ValueError(f"Unknown enhancement type: {enhancement_type}")
+        if operations is None:
+            operations = [{'type': enhancement_type, **kwargs}]
+        img = load_image(image_data)
+        
+        # Pointwise steps wait here until a spatial step (or the end) needs the pixels
+        pending = []
+        for operation in operations:
+            params = dict(operation)
+            step = params.pop('type')
+            if step in POINTWISE_ENHANCEMENTS:
+                pending.append((step, params))
+                continue
+            
+            img = apply_color_steps(img, pending)
+            pending = []
+            if step == 'sharpen':
+                img = _sharpen_image(img, **params)
+            elif step == 'denoise':
+                img = _denoise_image(img, **params)
+            elif step == 'upscale':
+                img = _upscale_image(img, **params)
+            else:
+                raise ValueError(f"Unknown enhancement type: {step}")
+        
+        return apply_color_steps(img, pending)
             
     except Exception as e:
         raise Exception(f"Image enhancement failed: {str(e)}")
 
 
+# Unsharp mask radius used for sharpening
+SHARPEN_RADIUS = 2
+
+# Resampling filters for upscaling, with how many input pixels each reads beyond the output
+UPSCALE_FILTERS = {
+    'NEAREST': (Image.Resampling.NEAREST, 0),
+    'BILINEAR': (Image.Resampling.BILINEAR, 2),
+    'BICUBIC': (Image.Resampling.BICUBIC, 3),
+    'LANCZOS': (Image.Resampling.LANCZOS, 4),
+}
+
+
+def _crop_inner(tile, inner):
+    """The tile's own pixels out of a rendered window (scale 1, so inner is whole pixels)"""
+    return tile.crop(tuple(int(edge) for edge in inner))
+
+
+def _split_alpha(img):
+    """(color image, alpha or None) in modes the filters handle"""
+    if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or 'A' in img.getbands() else 'RGB')
+    if 'A' not in img.getbands():
+        return img, None
+    return img.convert(img.mode.rstrip('A')), img.getchannel('A')
+
+
 def _sharpen_image(img, intensity=1.0):
     """Sharpen image using unsharp mask"""
     if intensity <= 0:
         return img
     
-    # Create sharpening filter
-    filter_kernel = ImageFilter.UnsharpMask(radius=2, percent=int(150 * intensity), threshold=3)
-    return img.filter(filter_kernel)
+    # Create sharpening filter; its blur reaches about three radii
+    filter_kernel = ImageFilter.UnsharpMask(radius=SHARPEN_RADIUS, percent=int(150 * intensity), threshold=3)
+    img, alpha = _split_alpha(img)
+    result = process_tiles(
+        img, lambda window, inner, size: _crop_inner(window.filter(filter_kernel), inner),
+        halo=3 * SHARPEN_RADIUS + 2
+    )
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
 
 
-def _denoise_image(img, method='bilateral'):
-    """Remove noise from image"""
-    # Convert to OpenCV format
-    opencv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+def _denoise_image(img, method='bilateral', preset='balanced'):
+    """Remove noise from image with one of the engines in denoise.py"""
+    img, alpha = _split_alpha(img)
+    method, preset = resolve_denoise(method, preset, img.width, img.height)
     
-    if method == 'bilateral':
-        # Bilateral filter preserves edges while reducing noise
-        denoised = cv2.bilateralFilter(opencv_img, 9, 75, 75)
-    else:
-        # Gaussian blur for simple denoising
-        denoised = cv2.GaussianBlur(opencv_img, (5, 5), 0)
-    
-    # Convert back to PIL
-    result_rgb = cv2.cvtColor(denoised, cv2.COLOR_BGR2RGB)
-    return Image.fromarray(result_rgb)
+    # Strength follows the noise measured on the whole image, so every tile filters alike
+    denoise, halo = denoise_engine(method, preset, estimate_noise(img))
+    result = process_tiles(
+        img, lambda window, inner, size: _crop_inner(Image.fromarray(denoise(np.asarray(window))), inner),
+        halo=halo
+    )
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
 
 
 def _upscale_image(img, scale_factor=2.0, method='LANCZOS'):
@@ -524,43 +773,23 @@ def _upscale_image(img, scale_factor=2.0, method='LANCZOS'):
     
     original_size = img.size
     new_size = (int(original_size[0] * scale_factor), int(original_size[1] * scale_factor))
+    # Refuse before the output image is allocated
+    check_pixels(new_size)
     
     # Choose resampling method
-    resample_map = {
-        'NEAREST': Image.Resampling.NEAREST,
-        'BILINEAR': Image.Resampling.BILINEAR,
-        'BICUBIC': Image.Resampling.BICUBIC,
-        'LANCZOS': Image.Resampling.LANCZOS,
-    }
+    resample, reach = UPSCALE_FILTERS.get(method.upper(), UPSCALE_FILTERS['LANCZOS'])
+    if resample == Image.Resampling.NEAREST:
+        # Copies pixels straight into the output, with no intermediate image to bound
+        return img.resize(new_size, resample)
     
-    resample = resample_map.get(method.upper(), Image.Resampling.LANCZOS)
-    return img.resize(new_size, resample)
-
-
-def _enhance_colors(img, saturation=1.2, vibrance=1.1):
-    """Enhance color saturation and vibrance"""
-    # Enhance color saturation
-    enhancer = ImageEnhance.Color(img)
-    enhanced = enhancer.enhance(saturation)
-    
-    # Additional vibrance enhancement (simple version)
-    if vibrance != 1.0:
-        enhancer2 = ImageEnhance.Color(enhanced)
-        enhanced = enhancer2.enhance(vibrance)
-    
-    return enhanced
-
-
-def _adjust_brightness(img, factor=1.2):
-    """Adjust image brightness"""
-    enhancer = ImageEnhance.Brightness(img)
-    return enhancer.enhance(factor)
-
-
-def _adjust_contrast(img, factor=1.2):
-    """Adjust image contrast"""
-    enhancer = ImageEnhance.Contrast(img)
-    return enhancer.enhance(factor)
+    # The other filters resample in two passes through an image as wide as the output and as
+    # tall as the input; tile by tile, each tile resamples only its own box of the input
+    if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or 'A' in img.getbands() else 'RGB')
+    return process_tiles(
+        img, lambda window, inner, size: window.resize(size, resample, box=inner),
+        halo=reach, out_size=new_size
+    )
 
 
 def get_supported_formats():
@@ -580,10 +809,8 @@ def is_image_format(filename):
     return ext in get_supported_formats()
 
 
-def save_image_with_quality(img, format='PNG', quality=95):
-    """Save image to bytes with specified format and quality"""
-    output = BytesIO()
-    
+def save_image_with_quality(img, format='PNG', quality=95, profile=DEFAULT_PROFILE):
+    """Save image to bytes with specified format, quality and encode profile"""
     if format.upper() == 'JPEG' or format.upper() == 'JPG':
         # Convert to RGB for JPEG (no transparency)
         if img.mode in ('RGBA', 'LA', 'P'):
@@ -593,134 +820,239 @@ def save_image_with_quality(img, format='PNG', quality=95):
                 img = img.convert('RGBA')
             background.paste(img, mask=img.split()[-1] if 'A' in img.mode else None)
             img = background
-        img.save(output, format='JPEG', quality=quality, optimize=True)
+        return encode_image(img, 'JPEG', profile, quality=quality)
+    elif format.upper() == 'WEBP':
+        return encode_image(img, 'WEBP', profile, quality=quality)
     else:
         # PNG supports transparency
-        img.save(output, format='PNG', optimize=True)
+        return encode_image(img, 'PNG', profile)
+
+
+BRUSH_OPERATIONS = ('erase', 'restore', 'soften')
+
+# Largest stroke coordinate accepted, in pixels either side of the image origin
+MAX_STROKE_COORDINATE = 1 << 24
+
+# Largest brush diameter accepted, in pixels (strokes are also capped at a quarter of the image)
+MAX_BRUSH_SIZE = 1024
+
+
+def _stroke_points(points):
+    """Stroke coordinates as an int32 (N, 2) array; malformed points are skipped.
+
+    Raises ValueError for coordinates that are not finite or beyond MAX_STROKE_COORDINATE.
+    """
+    parsed = []
+    for point in points or []:
+        try:
+            # Handle different coordinate formats
+            if isinstance(point, dict):
+                x, y = point['x'], point['y']
+            elif hasattr(point, 'x') and hasattr(point, 'y'):
+                x, y = point.x, point.y
+            else:
+                x, y = point[0], point[1]
+            x, y = float(x), float(y)
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        # JSON's Infinity, NaN and 1e999 parse to floats that int() and int32 cannot hold
+        if not (abs(x) <= MAX_STROKE_COORDINATE and abs(y) <= MAX_STROKE_COORDINATE):
+            raise ValueError(f"Invalid coordinates: points must be finite and within "
+                             f"{MAX_STROKE_COORDINATE} pixels of the image")
+        parsed.append((int(x), int(y)))
+    return np.array(parsed, dtype=np.int32).reshape(-1, 2)
+
+
+def _brush_size(value):
+    """Brush diameter in whole pixels; raises ValueError outside 1..MAX_BRUSH_SIZE"""
+    try:
+        size = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("brush_size must be a number")
+    # The negated test also rejects NaN and infinity
+    if not 1 <= size <= MAX_BRUSH_SIZE:
+        raise ValueError(f"brush_size must be between 1 and {MAX_BRUSH_SIZE}")
+    return int(size)
+
+
+def validate_strokes(strokes):
+    """Check strokes before rasterize_strokes() draws them; raises ValueError.
+
+    Brush sizes are converted to ints in place.
+    """
+    for stroke in strokes:
+        if 'operation' in stroke and stroke['operation'] not in BRUSH_OPERATIONS:
+            raise ValueError(f"Unknown brush operation: {stroke['operation']}")
+        if 'brush_size' in stroke:
+            stroke['brush_size'] = _brush_size(stroke['brush_size'])
+        _stroke_points(stroke.get('points'))
+    return strokes
+
+
+def _draw_stroke(mask, points, radius):
+    """Rasterize a brush stroke into mask in one pass.
+
+    Consecutive points are joined by a line as wide as the brush; OpenCV's
+    round line caps give the same circular dab at every point.
+    """
+    if len(points) == 1:
+        cv2.circle(mask, (int(points[0][0]), int(points[0][1])), radius, 255, -1)
+    else:
+        cv2.polylines(mask, [points.reshape(-1, 1, 2)], False, 255, thickness=2 * radius + 1)
+
+
+def decode_rgba(image_data):
+    """Decode image bytes into an (height, width, 4) uint8 RGBA array"""
+    # Decode upright, refusing images over the pixel budget
+    img = load_image(image_data)
+    
+    # Ensure image has alpha channel
+    if img.mode != 'RGBA':
+        if img.mode == 'RGB':
+            # Add alpha channel (fully opaque)
+            img.putalpha(255)
+        else:
+            img = img.convert('RGBA')
+    
+    # Convert to numpy array for editing
+    img_array = np.array(img, dtype=np.uint8)
+    
+    # Validate array dimensions
+    if len(img_array.shape) != 3 or img_array.shape[2] != 4:
+        raise ValueError("Invalid image format - expected RGBA")
+    
+    return img_array
+
+
+def rasterize_strokes(strokes, width, height, brush_size=10, operation='erase'):
+    """Rasterize brush strokes into (operation, mask, (x, y, w, h)) runs, in order.
+
+    strokes is a list of {'points': [[x, y], ...], 'operation': ..., 'brush_size': ...};
+    missing keys fall back to brush_size and operation. Consecutive strokes
+    with the same operation share one mask, which covers only the run's
+    bounding box: mask[0, 0] is image pixel (x, y). Runs entirely outside
+    the image are dropped.
+    """
+    # Group strokes into runs of (operation, [(points, radius), ...]) first, so each
+    # run's mask is allocated once at the size of its bounding box
+    runs = []
+    for stroke in strokes:
+        stroke_operation = stroke.get('operation', operation)
+        if stroke_operation not in BRUSH_OPERATIONS:
+            raise ValueError(f"Unknown brush operation: {stroke_operation}")
+        
+        # Validate brush size
+        stroke_size = int(stroke.get('brush_size', brush_size))
+        stroke_size = max(1, min(stroke_size, min(width, height) // 4))
+        
+        points = _stroke_points(stroke.get('points'))
+        if not len(points):
+            continue
+        
+        if not runs or runs[-1][0] != stroke_operation:
+            runs.append((stroke_operation, []))
+        runs[-1][1].append((points, max(1, stroke_size // 2)))
+    
+    rasterized = []
+    for run_operation, run_strokes in runs:
+        # The brush reaches its radius (plus a pixel of rounding) beyond the points
+        x0 = max(0, min(int(points[:, 0].min()) - radius - 1 for points, radius in run_strokes))
+        y0 = max(0, min(int(points[:, 1].min()) - radius - 1 for points, radius in run_strokes))
+        x1 = min(width, max(int(points[:, 0].max()) + radius + 2 for points, radius in run_strokes))
+        y1 = min(height, max(int(points[:, 1].max()) + radius + 2 for points, radius in run_strokes))
+        if x0 >= x1 or y0 >= y1:
+            continue
+        
+        stroke_mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        origin = np.array([x0, y0], np.int32)
+        for points, radius in run_strokes:
+            _draw_stroke(stroke_mask, points - origin, radius)
+        
+        x, y, w, h = cv2.boundingRect(stroke_mask)
+        if w and h:
+            rasterized.append((run_operation, stroke_mask[y:y + h, x:x + w], (x0 + x, y0 + y, w, h)))
+    return rasterized
+
+
+def _grow_box(box, margin, width, height):
+    return (max(0, box[0] - margin), max(0, box[1] - margin),
+            min(width, box[2] + margin), min(height, box[3] + margin))
+
+
+def stroke_edit_box(runs, width, height):
+    """(x0, y0, x1, y1) of every alpha pixel apply_stroke_runs() may change"""
+    x0 = min(x for _, _, (x, y, w, h) in runs)
+    y0 = min(y for _, _, (x, y, w, h) in runs)
+    x1 = max(x + w for _, _, (x, y, w, h) in runs)
+    y1 = max(y + h for _, _, (x, y, w, h) in runs)
+    # Edge smoothing reaches one pixel past the strokes
+    return _grow_box((x0, y0, x1, y1), 1, width, height)
+
+
+def apply_stroke_runs(alpha, runs):
+    """Apply rasterized strokes to an alpha channel in place and return the changed box"""
+    height, width = alpha.shape
+    
+    # Apply each mask to the alpha channel in one operation; masks cover just their box
+    for run_operation, stroke_mask, (x, y, w, h) in runs:
+        brushed = stroke_mask > 0
+        alpha_region = alpha[y:y + h, x:x + w]
+        
+        if run_operation == 'erase':
+            # Set alpha to 0 (transparent) where brush is applied
+            np.putmask(alpha_region, brushed, 0)
+        elif run_operation == 'restore':
+            # Set alpha to 255 (opaque) where brush is applied
+            np.putmask(alpha_region, brushed, 255)
+        elif run_operation == 'soften':
+            # Reduce alpha by 50% where brush is applied
+            np.right_shift(alpha_region, 1, out=alpha_region, where=brushed)
+    
+    # Apply slight smoothing to alpha channel for better edges, around the edits only
+    x0, y0, x1, y1 = box = stroke_edit_box(runs, width, height)
+    # The 3x3 kernel reads one pixel beyond what it changes
+    cx0, cy0, cx1, cy1 = _grow_box(box, 1, width, height)
+    alpha_channel = alpha[cy0:cy1, cx0:cx1].astype(np.float32)
+    alpha_channel = cv2.GaussianBlur(alpha_channel, (3, 3), 0.5)
+    alpha[y0:y1, x0:x1] = np.clip(
+        alpha_channel[y0 - cy0:y1 - cy0, x0 - cx0:x1 - cx0], 0, 255
+    ).astype(np.uint8)
     
-    output.seek(0)
-    return output.getvalue()
+    return box
 
 
-def apply_manual_edits(image_data, coordinates, brush_size=10, operation='erase'):
-    """Apply manual brush edits to background removal with enhanced error handling"""
+def apply_manual_edits(image_data, coordinates=None, brush_size=10, operation='erase', strokes=None):
+    """Apply manual brush edits to background removal with enhanced error handling
+
+    strokes is a list of {'points': [[x, y], ...], 'operation': ..., 'brush_size': ...}
+    applied in order; without it the coordinates form a single stroke drawn
+    with brush_size and operation.
+    """
     try:
         # Validate input data
         if not image_data:
             raise ValueError("No image data provided")
         
-        if not coordinates:
-            raise ValueError("No coordinates provided")
-        
-        # Open image
-        img = Image.open(BytesIO(image_data))
+        if strokes is None:
+            strokes = [{'points': coordinates, 'operation': operation, 'brush_size': brush_size}]
         
-        # Ensure image has alpha channel
-        if img.mode != 'RGBA':
-            if img.mode == 'RGB':
-                # Add alpha channel (fully opaque)
-                img.putalpha(255)
-            else:
-                img = img.convert('RGBA')
-        
-        # Convert to numpy array for editing
-        img_array = np.array(img, dtype=np.uint8)
-        
-        # Validate array dimensions
-        if len(img_array.shape) != 3 or img_array.shape[2] != 4:
-            raise ValueError("Invalid image format - expected RGBA")
+        if not strokes or not any(stroke.get('points') for stroke in strokes):
+            raise ValueError("No coordinates provided")
         
+        img_array = decode_rgba(image_data)
         height, width = img_array.shape[:2]
         
-        # Validate brush size
-        brush_size = max(1, min(brush_size, min(width, height) // 4))
-        brush_radius = max(1, brush_size // 2)
-        
-        # Create circular brush mask
-        brush_diameter = brush_radius * 2 + 1
-        y_indices, x_indices = np.ogrid[:brush_diameter, :brush_diameter]
-        center = brush_radius
-        brush_mask = (x_indices - center) ** 2 + (y_indices - center) ** 2 <= brush_radius ** 2
-        
-        # Apply edits at each coordinate
-        edits_applied = 0
-        for coord in coordinates:
-            try:
-                if not coord or len(coord) < 2:
-                    continue
-                
-                # Handle different coordinate formats
-                if isinstance(coord, (list, tuple)):
-                    cx, cy = float(coord[0]), float(coord[1])
-                elif hasattr(coord, 'x') and hasattr(coord, 'y'):
-                    cx, cy = float(coord.x), float(coord.y)
-                else:
-                    continue
-                
-                cx, cy = int(cx), int(cy)
-                
-                # Ensure coordinates are within image bounds
-                if not (0 <= cx < width and 0 <= cy < height):
-                    continue
-                
-                # Calculate brush area bounds
-                y_start = max(0, cy - brush_radius)
-                y_end = min(height, cy + brush_radius + 1)
-                x_start = max(0, cx - brush_radius)
-                x_end = min(width, cx + brush_radius + 1)
-                
-                # Calculate corresponding mask bounds
-                mask_y_start = max(0, brush_radius - cy)
-                mask_y_end = mask_y_start + (y_end - y_start)
-                mask_x_start = max(0, brush_radius - cx)
-                mask_x_end = mask_x_start + (x_end - x_start)
-                
-                # Ensure mask bounds are valid
-                if (mask_y_end <= mask_y_start or mask_x_end <= mask_x_start or
-                    mask_y_end > brush_diameter or mask_x_end > brush_diameter):
-                    continue
-                
-                # Get the brush area mask
-                current_brush_mask = brush_mask[mask_y_start:mask_y_end, mask_x_start:mask_x_end]
-                
-                if current_brush_mask.size == 0:
-                    continue
-                
-                # Apply the operation
-                if operation == 'erase':
-                    # Set alpha to 0 (transparent) where brush is applied
-                    alpha_slice = img_array[y_start:y_end, x_start:x_end, 3]
-                    alpha_slice[current_brush_mask] = 0
-                elif operation == 'restore':
-                    # Set alpha to 255 (opaque) where brush is applied
-                    alpha_slice = img_array[y_start:y_end, x_start:x_end, 3]
-                    alpha_slice[current_brush_mask] = 255
-                elif operation == 'soften':
-                    # Reduce alpha by 50% where brush is applied
-                    alpha_slice = img_array[y_start:y_end, x_start:x_end, 3]
-                    alpha_slice[current_brush_mask] = (alpha_slice[current_brush_mask] * 0.5).astype(np.uint8)
-                
-                edits_applied += 1
-                
-            except Exception as coord_error:
-                # Log coordinate-specific error but continue with other coordinates
-                print(f"Error processing coordinate {coord}: {coord_error}")
-                continue
-        
-        if edits_applied == 0:
+        runs = rasterize_strokes(strokes, width, height, brush_size, operation)
+        if not runs:
             raise ValueError("No valid edits could be applied")
         
-        # Apply slight smoothing to alpha channel for better edges
-        if edits_applied > 0:
-            alpha_channel = img_array[:, :, 3].astype(np.float32)
-            alpha_channel = cv2.GaussianBlur(alpha_channel, (3, 3), 0.5)
-            img_array[:, :, 3] = np.clip(alpha_channel, 0, 255).astype(np.uint8)
+        apply_stroke_runs(img_array[:, :, 3], runs)
         
         # Convert back to PIL Image
         result_img = Image.fromarray(img_array, 'RGBA')
         
         # Validate result
-        if result_img.size != img.size:
+        if result_img.size != (width, height):
             raise ValueError("Image size changed during processing")
         
         return result_img
@@ -1,17 +1,26 @@
+import io
 import os
+import json
 import time
-import tempfile
-from io import BytesIO
-from django.http import FileResponse, JsonResponse
+import base64
+from functools import partial
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.conf import settings
 from .utils import (
-    remove_background, enhance_image, is_image_format, 
-    save_image_with_quality, get_supported_formats, apply_manual_edits
+    remove_background, enhance_image, normalize_operations, is_image_format, 
+    save_image_with_quality, get_supported_formats, apply_manual_edits, chain_output_size, validate_strokes,
+    MAX_ENHANCEMENT_OPERATIONS, MAX_UPSCALE_FACTOR
 )
 from .models import BackgroundRemovalHistory, ImageEnhancementHistory
+from .edit_sessions import get_session_store, EditSessionError
+from jobs.queue import create_job, submit_job
+from jobs.utils import wants_async, job_accepted_payload
+from core.process_pool import run_image_operation
+from core.encoding import encode_image, resolve_profile
+from core.imaging import open_image, check_pixels, ImageTooLarge
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -25,6 +34,13 @@ class BackgroundRemoverView(View):
             
             uploaded_file = request.FILES['file']
             method = request.POST.get('method', 'auto')  # auto, grabcut, threshold
+            resolution = request.POST.get('resolution', 'proxy')  # proxy, full
+            
+            # Large transparent PNGs: favour encode speed unless asked otherwise
+            try:
+                encode_profile = resolve_profile(request.POST.get('encode_profile'), 'fast')
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
             
             # Validate file
             if not is_image_format(uploaded_file.name):
@@ -36,26 +52,39 @@ class BackgroundRemoverView(View):
             if uploaded_file.size > 50 * 1024 * 1024:
                 return JsonResponse({'error': 'File too large. Maximum size is 50MB'}, status=400)
             
+            # Check dimensions against the pixel budget from the header, before any decoding
+            try:
+                open_image(uploaded_file)
+            except ImageTooLarge as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            uploaded_file.seek(0)
+            
+            if wants_async(request):
+                # Run in the job queue and let the client poll for the result
+                job = create_job(
+                    'remove_background',
+                    files=[uploaded_file],
+                    params={'method': method, 'resolution': resolution, 'encode_profile': encode_profile},
+                    ip_address=self.get_client_ip(request)
+                )
+                submit_job(job)
+                return JsonResponse(job_accepted_payload(job), status=202)
+            
             start_time = time.time()
             
             # Read file data
             file_data = uploaded_file.read()
             original_size = len(file_data)
             
-            # Remove background
-            result_img = remove_background(file_data, method=method)
-            
-            # Save result
-            result_data = save_image_with_quality(result_img, format='PNG')
+            # Remove background and encode the result in the worker pool
+            result_data = run_image_operation(
+                remove_background, file_data, method=method, resolution=resolution,
+                encoder=partial(save_image_with_quality, format='PNG', profile=encode_profile)
+            )
             final_size = len(result_data)
             
             processing_time = time.time() - start_time
             
-            # Save to temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            temp_file.write(result_data)
-            temp_file.close()
-            
             # Log operation
             try:
                 BackgroundRemovalHistory.objects.create(
@@ -69,24 +98,14 @@ class BackgroundRemoverView(View):
             except Exception:
                 pass  # Don't fail if logging fails
             
-            # Return file
-            response = FileResponse(
-                open(temp_file.name, 'rb'),
+            # Return file straight from memory; nothing is left on disk
+            return FileResponse(
+                io.BytesIO(result_data),
                 content_type='image/png',
                 as_attachment=True,
                 filename=f"{os.path.splitext(uploaded_file.name)[0]}_no_bg.png"
             )
             
-            # Clean up temp file after response
-            def cleanup():
-                try:
-                    os.unlink(temp_file.name)
-                except:
-                    pass
-            
-            response.close = cleanup
-            return response
-            
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -99,6 +118,10 @@ class BackgroundRemoverView(View):
                 {'value': 'grabcut', 'label': 'GrabCut Algorithm'},
                 {'value': 'threshold', 'label': 'Smart Threshold'},
             ],
+            'resolutions': [
+                {'value': 'proxy', 'label': 'Fast (segment a ~1 MP copy, refine edges)'},
+                {'value': 'full', 'label': 'Full resolution'},
+            ],
             'supported_formats': get_supported_formats(),
             'max_file_size': '50MB'
         })
@@ -125,7 +148,7 @@ class ImageEnhancerView(View):
             uploaded_file = request.FILES['file']
             enhancement_type = request.POST.get('type', 'sharpen')
             
-            # Get enhancement parameters
+            # Get enhancement parameters (ignored when a whole chain is sent as 'operations')
             params = {}
             if enhancement_type == 'sharpen':
                 params['intensity'] = float(request.POST.get('intensity', 1.0))
@@ -141,6 +164,12 @@ class ImageEnhancerView(View):
                 params['factor'] = float(request.POST.get('factor', 1.2))
             elif enhancement_type == 'denoise':
                 params['method'] = request.POST.get('method', 'bilateral')
+                params['preset'] = request.POST.get('preset', 'balanced')
+            
+            try:
+                operations = parse_operations(request, enhancement_type, params)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
             
             # Validate file
             if not is_image_format(uploaded_file.name):
@@ -152,32 +181,47 @@ class ImageEnhancerView(View):
             if uploaded_file.size > 50 * 1024 * 1024:
                 return JsonResponse({'error': 'File too large. Maximum size is 50MB'}, status=400)
             
+            # Check dimensions, and the size after any upscaling, against the pixel budget
+            # from the header, before any decoding
+            try:
+                check_pixels(chain_output_size(open_image(uploaded_file).size, operations))
+            except ImageTooLarge as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            uploaded_file.seek(0)
+            
             start_time = time.time()
             
             # Read file data
             file_data = uploaded_file.read()
             original_size = len(file_data)
             
-            # Enhance image
-            result_img = enhance_image(file_data, enhancement_type, **params)
-            
             # Determine output format
             output_format = 'PNG' if uploaded_file.name.lower().endswith('.png') else 'JPEG'
             quality = int(request.POST.get('quality', 95))
-            
-            # Save result
-            result_data = save_image_with_quality(result_img, format=output_format, quality=quality)
+            try:
+                encode_profile = resolve_profile(request.POST.get('encode_profile'), 'balanced')
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            
+            # Run the whole chain on one decoded image and encode the result once, in the worker pool
+            result_data = run_image_operation(
+                enhance_image, file_data, operations=operations,
+                encoder=partial(save_image_with_quality, format=output_format, quality=quality,
+                                profile=encode_profile)
+            )
             final_size = len(result_data)
             
             processing_time = time.time() - start_time
             
-            # Save to temporary file
             ext = 'png' if output_format == 'PNG' else 'jpg'
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{ext}')
-            temp_file.write(result_data)
-            temp_file.close()
             
-            # Log operation
+            # Log operation; a chain is recorded as 'pipeline' with every step and its parameters
+            if len(operations) > 1:
+                enhancement_type, params = 'pipeline', {'operations': operations}
+            else:
+                enhancement_type, params = operations[0]['type'], {
+                    name: value for name, value in operations[0].items() if name != 'type'
+                }
             try:
                 ImageEnhancementHistory.objects.create(
                     original_filename=uploaded_file.name,
@@ -194,23 +238,13 @@ class ImageEnhancerView(View):
             
             # Return file
             content_type = 'image/png' if output_format == 'PNG' else 'image/jpeg'
-            response = FileResponse(
-                open(temp_file.name, 'rb'),
+            return FileResponse(
+                io.BytesIO(result_data),
                 content_type=content_type,
                 as_attachment=True,
                 filename=f"{os.path.splitext(uploaded_file.name)[0]}_enhanced.{ext}"
             )
             
-            # Clean up temp file after response
-            def cleanup():
-                try:
-                    os.unlink(temp_file.name)
-                except:
-                    pass
-            
-            response.close = cleanup
-            return response
-            
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -229,14 +263,18 @@ class ImageEnhancerView(View):
                     'value': 'denoise',
                     'label': 'Noise Reduction',
                     'parameters': [
-                        {'name': 'method', 'type': 'select', 'options': ['bilateral', 'gaussian'], 'default': 'bilateral'}
+                        {'name': 'method', 'type': 'select',
+                         'options': ['bilateral', 'gaussian', 'nlm', 'guided', 'fast_bilateral', 'auto'],
+                         'default': 'bilateral'},
+                        {'name': 'preset', 'type': 'select', 'options': ['fast', 'balanced', 'quality'],
+                         'default': 'balanced'}
                     ]
                 },
                 {
                     'value': 'upscale',
                     'label': 'Upscale',
                     'parameters': [
-                        {'name': 'scale_factor', 'type': 'float', 'min': 1.1, 'max': 4.0, 'default': 2.0},
+                        {'name': 'scale_factor', 'type': 'float', 'min': 1.1, 'max': MAX_UPSCALE_FACTOR, 'default': 2.0},
                         {'name': 'method', 'type': 'select', 'options': ['LANCZOS', 'BICUBIC', 'BILINEAR'], 'default': 'LANCZOS'}
                     ]
                 },
@@ -263,6 +301,10 @@ class ImageEnhancerView(View):
                     ]
                 }
             ],
+            'operations': {
+                'description': 'JSON list of {"type": ..., <parameters>} applied in order, encoded once',
+                'max_length': MAX_ENHANCEMENT_OPERATIONS,
+            },
             'supported_formats': get_supported_formats(),
             'max_file_size': '50MB'
         })
@@ -277,6 +319,52 @@ class ImageEnhancerView(View):
         return ip
 
 
+def parse_operations(request, enhancement_type, params):
+    """Enhancement chain of a request.
+
+    Either the 'operations' JSON list of {type, <parameters>} objects,
+    or the single type and its parameters.
+    Raises ValueError for malformed input.
+    """
+    if 'operations' in request.POST:
+        try:
+            operations = json.loads(request.POST['operations'])
+        except json.JSONDecodeError:
+            raise ValueError('Invalid operations data')
+        return normalize_operations(operations)
+
+    return normalize_operations([{'type': enhancement_type, **params}])
+
+
+def parse_strokes(request):
+    """Brush strokes of an editor request.
+
+    Either the 'strokes' JSON list of {points, operation, brush_size} objects,
+    or the coordinates field as a single stroke. The brush_size and operation
+    fields fill in what a stroke leaves out.
+    Raises ValueError for malformed input: unknown operations, brush sizes
+    out of range and coordinates that are not finite.
+    """
+    if 'strokes' in request.POST:
+        try:
+            strokes = json.loads(request.POST['strokes'])
+        except json.JSONDecodeError:
+            raise ValueError('Invalid strokes data')
+        if not isinstance(strokes, list) or not all(isinstance(stroke, dict) for stroke in strokes):
+            raise ValueError('strokes must be a list of objects')
+    else:
+        try:
+            coordinates = json.loads(request.POST.get('coordinates', '[]'))
+        except json.JSONDecodeError:
+            coordinates = []
+        strokes = [{'points': coordinates}]
+
+    for stroke in strokes:
+        stroke.setdefault('operation', request.POST.get('operation', 'erase'))
+        stroke.setdefault('brush_size', request.POST.get('brush_size', 10))
+    return validate_strokes(strokes)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class BackgroundEditorView(View):
     """Manual background editing tools"""
@@ -287,19 +375,18 @@ class BackgroundEditorView(View):
             if 'image_data' not in request.POST:
                 return JsonResponse({'error': 'No image data provided'}, status=400)
             
-            import json
-            import base64
-            
             # Get image data and editing parameters
             image_data_b64 = request.POST.get('image_data')
-            brush_size = int(request.POST.get('brush_size', 10))
-            operation = request.POST.get('operation', 'erase')  # erase, restore
-            coordinates_str = request.POST.get('coordinates', '[]')
-            
             try:
-                coordinates = json.loads(coordinates_str)
-            except json.JSONDecodeError:
-                coordinates = []
+                encode_profile = resolve_profile(request.POST.get('encode_profile'), 'fast')
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            # A whole editing session: [{"points": [[x, y], ...], "operation": ..., "brush_size": ...}, ...],
+            # or the coordinates as a single stroke; either way the points are checked before decoding
+            try:
+                strokes = parse_strokes(request)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
             
             # Decode base64 image data
             try:
@@ -308,30 +395,176 @@ class BackgroundEditorView(View):
                 return JsonResponse({'error': 'Invalid image data format'}, status=400)
             
             # Apply manual edits
-            from .utils import apply_manual_edits
-            edited_image = apply_manual_edits(
-                image_data, 
-                coordinates, 
-                brush_size, 
-                operation
-            )
+            edited_image = apply_manual_edits(image_data, strokes=strokes)
             
-            # Convert result to base64
-            output = BytesIO()
-            edited_image.save(output, format='PNG')
-            output.seek(0)
-            
-            result_b64 = base64.b64encode(output.getvalue()).decode('utf-8')
+            # Convert result to base64; it is re-sent on every edit, so encode fast by default
+            result_b64 = base64.b64encode(
+                encode_image(edited_image, 'PNG', encode_profile)
+            ).decode('utf-8')
             
             return JsonResponse({
                 'success': True,
                 'image': f'data:image/png;base64,{result_b64}',
                 'parameters': {
-                    'brush_size': brush_size,
-                    'operation': operation,
-                    'coordinates': coordinates
+                    'brush_size': strokes[0]['brush_size'],
+                    'operation': strokes[0]['operation'],
+                    'coordinates': strokes[0]['points'],
+                    'strokes': len(strokes)
                 }
             })
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+
+def _tile_payload(session, box=None):
+    """Preview tile of a session as JSON, with the PNG as a data URI"""
+    tile = session.preview(box)
+    tile['image'] = f"data:image/png;base64,{base64.b64encode(tile.pop('png')).decode('utf-8')}"
+    return tile
+
+
+def _session_not_found():
+    return JsonResponse({'error': 'Editing session not found or expired'}, status=404)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EditSessionView(View):
+    """Start a background editing session: upload the image once"""
+    
+    def post(self, request):
+        try:
+            if 'file' in request.FILES:
+                uploaded_file = request.FILES['file']
+                image_data = uploaded_file.read()
+                filename = uploaded_file.name
+            elif 'image_data' in request.POST:
+                try:
+                    image_data = base64.b64decode(request.POST['image_data'].split(',')[1])
+                except (IndexError, ValueError):
+                    return JsonResponse({'error': 'Invalid image data format'}, status=400)
+                filename = request.POST.get('filename', 'image.png')
+            else:
+                return JsonResponse({'error': 'No image provided'}, status=400)
+            
+            store = get_session_store()
+            try:
+                session = store.create(image_data, filename)
+            except EditSessionError as e:
+                return JsonResponse({'error': str(e)}, status=413)
+            
+            width, height = session.size
+            preview_width, preview_height = session.preview_size
+            return JsonResponse({
+                'session_id': session.id,
+                'width': width,
+                'height': height,
+                'preview_scale': session.preview_scale,
+                'preview_width': preview_width,
+                'preview_height': preview_height,
+                'preview': _tile_payload(session),
+                'expires_in': store.ttl,
+            }, status=201)
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EditSessionDetailView(View):
+    """Inspect or discard an editing session"""
+    
+    def get(self, request, session_id):
+        session = get_session_store().get(session_id)
+        if session is None:
+            return _session_not_found()
+        
+        width, height = session.size
+        return JsonResponse({
+            'session_id': session.id,
+            'width': width,
+            'height': height,
+            'undo_depth': len(session.undo_stack),
+        })
+    
+    def delete(self, request, session_id):
+        if not get_session_store().delete(session_id):
+            return _session_not_found()
+        return JsonResponse({'success': True})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EditSessionEditView(View):
+    """Apply stroke deltas and return a preview tile of the changed region"""
+    
+    def post(self, request, session_id):
+        try:
+            store = get_session_store()
+            session = store.get(session_id)
+            if session is None:
+                return _session_not_found()
+            
+            try:
+                strokes = parse_strokes(request)
+                # Stroke coordinates are in full-resolution pixels
+                with session.lock:
+                    box = session.apply(strokes)
+                    tile = _tile_payload(session, box)
+                    undo_depth = len(session.undo_stack)
+            except (ValueError, EditSessionError) as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            
+            # The undo stack grew; keep the store within its memory budget
+            store.touch(session)
+            
+            return JsonResponse({'tile': tile, 'undo_depth': undo_depth})
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EditSessionUndoView(View):
+    """Revert the last edit of a session"""
+    
+    def post(self, request, session_id):
+        session = get_session_store().get(session_id)
+        if session is None:
+            return _session_not_found()
+        
+        try:
+            with session.lock:
+                box = session.undo()
+                tile = _tile_payload(session, box)
+                undo_depth = len(session.undo_stack)
+        except EditSessionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse({'tile': tile, 'undo_depth': undo_depth})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EditSessionExportView(View):
+    """Encode the edited image at full resolution"""
+    
+    def get(self, request, session_id):
+        try:
+            session = get_session_store().get(session_id)
+            if session is None:
+                return _session_not_found()
+            
+            try:
+                encode_profile = resolve_profile(request.GET.get('encode_profile'), 'balanced')
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            
+            with session.lock:
+                result_data = save_image_with_quality(session.export(), format='PNG', profile=encode_profile)
+            
+            response = HttpResponse(result_data, content_type='image/png')
+            filename = f"{os.path.splitext(session.filename)[0] or 'image'}_edited.png"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
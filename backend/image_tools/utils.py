@@ -3,11 +3,13 @@ import tempfile
 from PIL import Image, ImageFilter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
+from core.imaging import load_image
 
 
 def images_to_pdf(image_files, output_path, page_size='A4', orientation='portrait', quality='high'):
     """Convert multiple images to a single PDF"""
-    temp_dir = tempfile.mkdtemp()
+    # Working files sit next to the output so they count against the same scratch quota
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(output_path) or None)
     try:
         # Set page size based on parameters
         if page_size == 'A4':
@@ -23,9 +25,12 @@ def images_to_pdf(image_files, output_path, page_size='A4', orientation='portrai
         
         c = canvas.Canvas(output_path, pagesize=(page_width, page_height))
         
+        # Lower qualities embed the image at a fraction of its size
+        decode_scale = {'low': 0.7, 'medium': 0.85}.get(quality)
+        
         for image_file in image_files:
-            # Open image
-            img = Image.open(image_file)
+            # Decode upright and only as large as it is embedded (high quality uses original size)
+            img = load_image(image_file, scale=decode_scale)
             img_width, img_height = img.size
             
             # Always fit to page while maintaining aspect ratio
@@ -43,13 +48,6 @@ def images_to_pdf(image_files, output_path, page_size='A4', orientation='portrai
             # Save image temporarily
             temp_img_path = os.path.join(temp_dir, f'temp_{image_file.name}')
             
-            # Adjust quality if needed
-            if quality == 'low':
-                img = img.resize((int(img_width * 0.7), int(img_height * 0.7)), Image.Resampling.LANCZOS)
-            elif quality == 'medium':
-                img = img.resize((int(img_width * 0.85), int(img_height * 0.85)), Image.Resampling.LANCZOS)
-            # High quality uses original size
-            
             img.save(temp_img_path)
             c.drawImage(temp_img_path, x, y, width=new_width, height=new_height)
             c.showPage()  # New page for next image
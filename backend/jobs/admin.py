@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'job_type', 'status', 'progress', 'created_at', 'completed_at']
+    list_filter = ['job_type', 'status', 'created_at']
+    search_fields = ['id', 'output_filename']
+    readonly_fields = ['id', 'created_at', 'started_at', 'completed_at']
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        # Register the job handlers that every app declares in its tasks.py
+        autodiscover_modules('tasks')
+
+        # Stale and expired jobs are handled by a janitor thread started with the first request
+        from django.core.signals import request_started
+        from .queue import start_janitor
+        request_started.connect(start_janitor, dispatch_uid='jobs_start_janitor')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs.queue import recover_stale_jobs, purge_finished_jobs
+
+
+class Command(BaseCommand):
+    help = "Fail interrupted jobs, resubmit lost pending ones and delete finished jobs past their retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=settings.JOB_RETENTION,
+                            help='Delete jobs finished more than this many seconds ago (0 deletes all finished jobs)')
+
+    def handle(self, *args, **options):
+        failed, requeued = recover_stale_jobs()
+        purged = purge_finished_jobs(options['max_age'])
+        self.stdout.write(f"Marked {failed} interrupted jobs failed, submitted {requeued} pending jobs again, "
+                          f"deleted {purged} finished jobs")
@@ -0,0 +1,67 @@
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from jobs.models import Job
+from jobs.worker import init_worker, execute_job
+from jobs.queue import recover_stale_jobs, purge_finished_jobs
+from jobs.registry import registered_job_types
+
+
+class Command(BaseCommand):
+    help = "Run pending jobs from the database queue (JOB_QUEUE_BACKEND = 'database')"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_QUEUE_WORKERS,
+                            help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_QUEUE_POLL_INTERVAL,
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        running = {}  # future -> job id
+
+        self.stdout.write(f"Job worker started with {workers} process(es)")
+        last_sweep = None
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        ) as executor:
+            while True:
+                # Fail jobs a dead worker left processing and drop expired ones, at start and then periodically
+                if last_sweep is None or 0 < settings.JOB_JANITOR_INTERVAL <= time.monotonic() - last_sweep:
+                    failed, _ = recover_stale_jobs()
+                    purged = purge_finished_jobs()
+                    if failed or purged:
+                        self.stdout.write(f"Marked {failed} interrupted job(s) failed, purged {purged} expired job(s)")
+                    last_sweep = time.monotonic()
+
+                free_slots = workers - len(running)
+                if free_slots > 0:
+                    # Oldest first; each job is claimed atomically each row so several workers can share the table.
+                    # Rows of job types without a handler (from the old per-app tables) are left alone
+                    job_ids = list(
+                        Job.objects.filter(status='pending', job_type__in=registered_job_types())
+                        .exclude(id__in=list(running.values()))
+                        .order_by('created_at')
+                        .values_list('id', flat=True)[:free_slots]
+                    )
+                    for job_id in job_ids:
+                        running[executor.submit(execute_job, str(job_id))] = job_id
+
+                if running:
+                    done, _ = wait(running, timeout=options['poll_interval'],
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del running[future]
+                        if future.exception():
+                            self.stderr.write(f"Job worker error: {future.exception()}")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:23
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('job_type', models.CharField(choices=[('pdf_compress', 'PDF Compression'), ('pdf_to_image', 'PDF to Image'), ('remove_background', 'Background Removal'), ('word_to_pdf', 'Word to PDF'), ('merge_word', 'Merge Word Documents'), ('text_watermark', 'Text Watermark'), ('image_watermark', 'Image Watermark'), ('remove_watermark', 'Remove Watermark'), ('generate_text', 'Generate QR from Text'), ('generate_url', 'Generate QR from URL'), ('generate_contact', 'Generate QR from Contact'), ('read_qr', 'Read QR Code'), ('batch_generate', 'Batch Generate QR')], max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('progress_message', models.CharField(blank=True, default='', max_length=255)),
+                ('input_files', models.JSONField(blank=True, default=list)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('output_file_path', models.CharField(blank=True, max_length=500, null=True)),
+                ('output_filename', models.CharField(blank=True, max_length=255, null=True)),
+                ('output_content_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,104 @@
+import os
+import uuid
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import models
+from django.urls import reverse
+
+
+class Job(models.Model):
+    """Shared job table used by every processing app"""
+    JOB_TYPES = [
+        # Document processing
+        ('pdf_compress', 'PDF Compression'),
+        ('pdf_to_image', 'PDF to Image'),
+        ('remove_background', 'Background Removal'),
+        # Word tools
+        ('word_to_pdf', 'Word to PDF'),
+        ('merge_word', 'Merge Word Documents'),
+        # Watermark tools
+        ('text_watermark', 'Text Watermark'),
+        ('image_watermark', 'Image Watermark'),
+        ('remove_watermark', 'Remove Watermark'),
+        # QR tools
+        ('generate_text', 'Generate QR from Text'),
+        ('generate_url', 'Generate QR from URL'),
+        ('generate_contact', 'Generate QR from Contact'),
+        ('read_qr', 'Read QR Code'),
+        ('batch_generate', 'Batch Generate QR'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=30, choices=JOB_TYPES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)  # 0 - 100
+    progress_message = models.CharField(max_length=255, blank=True, default='')
+
+    # Input files ({'name', 'path', 'size'}) and operation settings
+    input_files = models.JSONField(default=list, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+
+    # Output file info
+    output_file_path = models.CharField(max_length=500, blank=True, null=True)
+    output_filename = models.CharField(max_length=255, blank=True, null=True)
+    output_content_type = models.CharField(max_length=100, blank=True, null=True)
+    result = models.JSONField(default=dict, blank=True)
+
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} - {self.status}"
+
+    @property
+    def work_dir(self):
+        """Directory holding this job's input and output files"""
+        return os.path.join(settings.JOB_STORAGE_ROOT, str(self.id))
+
+    @property
+    def output_dir(self):
+        return os.path.join(self.work_dir, 'output')
+
+    def open_output(self):
+        """Open the output file for reading, or None when it is gone.
+
+        Queue jobs store an absolute path; watermark and QR jobs store the name
+        default_storage gave the file.
+        """
+        path = self.output_file_path
+        if not path:
+            return None
+        if os.path.isabs(path):
+            return open(path, 'rb') if os.path.isfile(path) else None
+        try:
+            if not default_storage.exists(path):
+                return None
+        except SuspiciousFileOperation:
+            return None
+        return default_storage.open(path, 'rb')
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    @property
+    def status_url(self):
+        return reverse('jobs:job_status', args=[self.id])
+
+    @property
+    def result_url(self):
+        return reverse('jobs:job_result', args=[self.id])
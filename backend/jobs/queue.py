@@ -0,0 +1,258 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from datetime import timedelta
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from core.uploads import save_upload
+from .models import Job
+from .registry import get_task, registered_job_types
+from .worker import init_worker, execute_job
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared pool of job worker processes"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.JOB_QUEUE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def create_job(job_type, files=(), params=None, ip_address=None):
+    """Create a pending job and store its uploaded input files"""
+    job = Job.objects.create(
+        job_type=job_type,
+        params=params or {},
+        ip_address=ip_address,
+    )
+
+    input_dir = os.path.join(job.work_dir, 'input')
+    os.makedirs(input_dir, exist_ok=True)
+
+    input_files = []
+    for index, uploaded_file in enumerate(files):
+        # Prefix with the index so identical names never collide
+        name = os.path.basename(uploaded_file.name)
+        path = save_upload(uploaded_file, os.path.join(input_dir, f'{index}_{name}'))
+        input_files.append({'name': name, 'path': path, 'size': uploaded_file.size})
+
+    job.input_files = input_files
+    job.save(update_fields=['input_files'])
+    return job
+
+
+def submit_job(job):
+    """Hand a pending job to the configured broker"""
+    if settings.JOB_QUEUE_BACKEND == 'database':
+        # Picked up by `manage.py run_jobs`
+        return job
+
+    def dispatch():
+        try:
+            get_executor().submit(execute_job, str(job.id))
+        except BrokenProcessPool:
+            logger.warning("Job worker pool was broken, restarting it")
+            _reset_executor()
+            get_executor().submit(execute_job, str(job.id))
+
+    transaction.on_commit(dispatch)
+    return job
+
+
+def claim_job(job_id):
+    """Atomically move a job from pending to processing; False if someone else has it"""
+    return Job.objects.filter(id=job_id, status='pending').update(
+        status='processing',
+        started_at=timezone.now(),
+    ) == 1
+
+
+class ProgressReporter:
+    """Callable passed to job handlers to report progress"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.last_percent = -1
+
+    def __call__(self, percent, message=''):
+        percent = max(0, min(100, int(percent)))
+        # Skip redundant writes when a handler reports very often
+        if percent == self.last_percent and not message:
+            return
+        self.last_percent = percent
+        Job.objects.filter(id=self.job_id).update(
+            progress=percent,
+            progress_message=message[:255],
+        )
+
+
+def run_job(job_id):
+    """Execute a job; runs in a worker process or inline for synchronous requests"""
+    if not claim_job(job_id):
+        return
+
+    job = Job.objects.get(id=job_id)
+    os.makedirs(job.output_dir, exist_ok=True)
+
+    try:
+        handler = get_task(job.job_type)
+        outcome = handler(job, ProgressReporter(job.id)) or {}
+
+        job.output_file_path = outcome.get('output_path')
+        job.output_filename = outcome.get('output_filename')
+        job.output_content_type = outcome.get('content_type')
+        job.result = outcome.get('result', {})
+        job.status = 'completed'
+        job.progress = 100
+        job.completed_at = timezone.now()
+        job.save()
+
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job.job_type}) failed: {str(e)}")
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save()
+
+
+def _delete_stored_file(path):
+    """Delete a file a job refers to: a default_storage name, or an absolute path under MEDIA_ROOT or JOB_STORAGE_ROOT"""
+    if not path:
+        return
+    if not os.path.isabs(path):
+        try:
+            default_storage.delete(path)
+        except Exception as e:
+            logger.warning(f"Could not delete stored job file {path}: {str(e)}")
+        return
+
+    # Never follow a stored path out of the directories jobs write to
+    path = os.path.realpath(path)
+    roots = [os.path.realpath(root) for root in (settings.MEDIA_ROOT, settings.JOB_STORAGE_ROOT)]
+    if any(path.startswith(root + os.sep) for root in roots):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def delete_job_files(job):
+    """Remove a job's working directory and the input and output files it refers to elsewhere.
+
+    Queue jobs keep everything in their working directory; watermark and QR jobs,
+    and jobs migrated from the old per-app tables, keep theirs in MEDIA storage.
+    """
+    shutil.rmtree(job.work_dir, ignore_errors=True)
+    for path in [job.output_file_path] + [item.get('path') for item in job.input_files or []]:
+        _delete_stored_file(path)
+
+
+def delete_job_inputs(job):
+    """Remove a finished job's uploaded inputs, keeping its output for download"""
+    shutil.rmtree(os.path.join(job.work_dir, 'input'), ignore_errors=True)
+
+
+def purge_finished_jobs(max_age=None):
+    """Delete jobs finished more than max_age seconds ago together with their files; returns how many"""
+    max_age = settings.JOB_RETENTION if max_age is None else max_age
+    expired = Job.objects.filter(
+        status__in=('completed', 'failed'),
+        completed_at__lt=timezone.now() - timedelta(seconds=max_age),
+    )
+    purged = 0
+    for job in expired.iterator():
+        delete_job_files(job)
+        job.delete()
+        purged += 1
+    return purged
+
+
+def recover_stale_jobs():
+    """
+    Fail jobs left processing by a worker that died (a server restart) and, with the process
+    backend, submit pending jobs again whose submission was lost with the old pool. Returns
+    (failed, requeued).
+    """
+    now = timezone.now()
+    failed = Job.objects.filter(
+        status='processing',
+        started_at__lt=now - timedelta(seconds=settings.JOB_MAX_RUNTIME),
+    ).update(
+        status='failed',
+        error_message='Job was interrupted (the worker running it stopped); please submit it again',
+        completed_at=now,
+    )
+
+    requeued = 0
+    if settings.JOB_QUEUE_BACKEND == 'process':
+        # claim_job lets only one submission of a job run, so a duplicate is harmless. Only
+        # job types the queue runs are submitted; older rows of other types have no handler
+        stale = Job.objects.filter(
+            status='pending',
+            job_type__in=registered_job_types(),
+            created_at__lt=now - timedelta(seconds=settings.JOB_REQUEUE_AFTER),
+        )
+        for job in stale.only('id'):
+            submit_job(job)
+            requeued += 1
+    if failed or requeued:
+        logger.warning(f"Recovered stale jobs: {failed} failed, {requeued} submitted again")
+    return failed, requeued
+
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def start_janitor(**kwargs):
+    """
+    Recover stale jobs and purge expired ones now and then every JOB_JANITOR_INTERVAL seconds,
+    in a daemon thread (once per process). Connected to request_started, so a restarted web
+    server recovers on its first request; `run_jobs` does the same for the database backend.
+    """
+    global _janitor
+    if _janitor is not None or settings.JOB_QUEUE_BACKEND != 'process' or settings.JOB_JANITOR_INTERVAL <= 0:
+        return
+    with _janitor_lock:
+        if _janitor is not None:
+            return
+
+        def run():
+            from django.db import connection
+            while True:
+                try:
+                    recover_stale_jobs()
+                    purge_finished_jobs()
+                except Exception as e:
+                    logger.warning(f"Job janitor failed: {str(e)}")
+                finally:
+                    connection.close()
+                time.sleep(settings.JOB_JANITOR_INTERVAL)
+
+        _janitor = threading.Thread(target=run, name='job-janitor', daemon=True)
+        _janitor.start()
@@ -0,0 +1,37 @@
+"""
+Registry of job handlers.
+
+Each app declares its handlers in a ``tasks.py`` module, which the jobs app
+imports on startup (including inside worker processes):
+
+    @register_task('pdf_compress')
+    def compress_pdf_task(job, progress):
+        ...
+        return {'output_path': path, 'output_filename': name, 'content_type': 'application/pdf'}
+
+A handler receives the ``Job`` instance and a ``progress(percent, message='')``
+callable, and returns a dict describing the output file plus an optional
+``result`` dict of extra metadata.
+"""
+
+_handlers = {}
+
+
+def register_task(job_type):
+    """Decorator registering a handler for a job type"""
+    def decorator(func):
+        _handlers[job_type] = func
+        return func
+    return decorator
+
+
+def get_task(job_type):
+    """Return the handler registered for a job type"""
+    try:
+        return _handlers[job_type]
+    except KeyError:
+        raise ValueError(f"No handler registered for job type: {job_type}")
+
+
+def registered_job_types():
+    return sorted(_handlers)
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    job_type_display = serializers.CharField(source='get_job_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    input_filenames = serializers.SerializerMethodField()
+    status_url = serializers.CharField(read_only=True)
+    result_url = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'job_type', 'job_type_display', 'status', 'status_display',
+            'progress', 'progress_message', 'params', 'input_filenames',
+            'output_filename', 'result', 'created_at', 'started_at',
+            'completed_at', 'error_message', 'status_url', 'result_url'
+        ]
+
+    def get_input_filenames(self, job):
+        return [input_file.get('name') for input_file in job.input_files]
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('<uuid:job_id>/status/', views.job_status, name='job_status'),
+    path('<uuid:job_id>/result/', views.job_result, name='job_result'),
+]
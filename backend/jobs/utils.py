@@ -0,0 +1,15 @@
+def wants_async(request):
+    """Check whether the client asked for the request to run as a background job"""
+    value = request.POST.get('async', request.GET.get('async', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def job_accepted_payload(job):
+    """Response body returned when a job has been queued"""
+    return {
+        'success': True,
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': job.status_url,
+        'result_url': job.result_url,
+    }
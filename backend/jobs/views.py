@@ -0,0 +1,48 @@
+import os
+from django.http import FileResponse, Http404
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework import status
+from .models import Job
+from .serializers import JobSerializer
+
+
+@api_view(['GET'])
+def job_status(request, job_id):
+    """Get job status and progress"""
+    try:
+        job = Job.objects.get(id=job_id)
+    except Job.DoesNotExist:
+        raise Http404("Job not found")
+
+    return Response(JobSerializer(job).data)
+
+
+@api_view(['GET'])
+def job_result(request, job_id):
+    """Download the output of a completed job"""
+    try:
+        job = Job.objects.get(id=job_id)
+    except Job.DoesNotExist:
+        raise Http404("Job not found")
+
+    if job.status == 'failed':
+        return Response({'status': job.status, 'error': job.error_message},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if job.status != 'completed':
+        # Not ready yet - client should keep polling the status endpoint
+        return Response({'status': job.status, 'progress': job.progress,
+                         'status_url': job.status_url},
+                        status=status.HTTP_202_ACCEPTED)
+
+    output = job.open_output()
+    if output is None:
+        raise Http404("File not found")
+
+    return FileResponse(
+        output,
+        content_type=job.output_content_type or 'application/octet-stream',
+        as_attachment=True,
+        filename=job.output_filename or os.path.basename(job.output_file_path)
+    )
@@ -0,0 +1,27 @@
+"""
+Entry points executed inside job worker processes.
+
+Worker processes are spawned, so this module is imported before Django is
+set up and must not import models at module level.
+"""
+
+
+def init_worker():
+    """Prepare a worker process: load Django and drop inherited DB connections"""
+    import django
+    from django.db import connections
+
+    django.setup()
+    connections.close_all()
+
+
+def execute_job(job_id):
+    """Run a job and release the database connection afterwards"""
+    from django.db import connections
+    from .queue import run_job
+
+    try:
+        run_job(job_id)
+    finally:
+        # Worker processes must not hold connections between jobs
+        connections.close_all()
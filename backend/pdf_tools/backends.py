@@ -0,0 +1,386 @@
+"""
+PDF backends.
+
+PyMuPDF (fitz) does the work in C and is used whenever it is installed;
+PyPDF2 (plus poppler for rasterizing) is the pure-Python fallback. Set
+PDF_BACKEND to 'pymupdf' or 'pypdf2' to force one.
+
+Every backend implements the same operations, and PDF sources may be a
+path, bytes or a file object:
+
+    backend = get_backend()
+    backend.merge(pdf_files, output_path)
+    backend.watermark_text(input_path, output_path, 'DRAFT', 'center', 0.3, 48, '#ff0000')
+"""
+import io
+import os
+import platform
+import tempfile
+from functools import lru_cache
+from django.conf import settings
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+# Pages rasterized per poppler call
+PDF_RENDER_WINDOW = 4
+# Distance of a text watermark from the page edges, in points
+WATERMARK_MARGIN = 50
+# Rendered watermark stamps kept in memory across requests
+WATERMARK_STAMP_CACHE_SIZE = 128
+
+
+def pdf_source(pdf_file):
+    """Path of the PDF when it is already on disk, otherwise its bytes"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return os.fspath(pdf_file)
+    if hasattr(pdf_file, 'temporary_file_path'):
+        return pdf_file.temporary_file_path()
+    if hasattr(pdf_file, 'seek'):
+        pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def _get_poppler_path():
+    """Poppler binaries on Windows (local copy first, then common install paths)"""
+    if platform.system() != 'Windows':
+        return None
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    local_poppler = os.path.join(current_dir, '..', 'poppler', 'poppler-24.08.0', 'Library', 'bin')
+
+    possible_paths = [
+        local_poppler,
+        r'C:\Program Files\poppler\bin',
+        r'C:\poppler\bin',
+        r'C:\Program Files (x86)\poppler\bin'
+    ]
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    # Might still be in PATH
+    return None
+
+
+def hex_to_rgb(color):
+    """'#rrggbb' to an (r, g, b) tuple of floats between 0 and 1"""
+    return tuple(int(color[i:i+2], 16) / 255.0 for i in (1, 3, 5))
+
+
+def text_width(text, font_size):
+    """Width of text set in Helvetica, in points"""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    return stringWidth(text, 'Helvetica', font_size)
+
+
+def watermark_origin(position, page_width, page_height, text, font_size):
+    """Baseline start (x, y) of a text watermark, measured from the bottom-left corner"""
+    width = text_width(text, font_size)
+    margin = WATERMARK_MARGIN
+
+    positions = {
+        'bottom-right': (page_width - width - margin, margin),
+        'bottom-left': (margin, margin),
+        'top-right': (page_width - width - margin, page_height - margin - font_size),
+        'top-left': (margin, page_height - margin - font_size),
+        'center': ((page_width - width) / 2, page_height / 2),
+    }
+    return positions.get(position, positions['bottom-right'])
+
+
+def text_stamp_pdf(text, position, opacity, font_size, color, page_size):
+    """One-page PDF of page_size holding only the watermark text"""
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    width, height = page_size
+    p = canvas.Canvas(buffer, pagesize=page_size)
+
+    x, y = watermark_origin(position, width, height, text, font_size)
+
+    # Set opacity and color
+    p.setFillAlpha(opacity)
+    p.setFillColorRGB(*hex_to_rgb(color))
+
+    # Add text
+    p.setFont("Helvetica", font_size)
+    p.drawString(x, y, text)
+    p.save()
+
+    buffer.seek(0)
+    return buffer
+
+
+@lru_cache(maxsize=WATERMARK_STAMP_CACHE_SIZE)
+def cached_text_stamp(text, position, opacity, font_size, color, page_box):
+    """PDF bytes of a watermark stamp, rendered once per distinct look and page box"""
+    return text_stamp_pdf(text, position, opacity, font_size, color, page_box).getvalue()
+
+
+def _page_box_key(width, height):
+    return (round(float(width), 2), round(float(height), 2))
+
+
+def _stamp_matrix(rotation, width, height, x0, y0):
+    """Matrix drawing a stamp laid out on the visible (rotated) page into unrotated user space"""
+    matrices = {
+        0: (1, 0, 0, 1, 0, 0),
+        90: (0, 1, -1, 0, width, 0),
+        180: (-1, 0, 0, -1, width, height),
+        270: (0, -1, 1, 0, 0, height),
+    }
+    a, b, c, d, e, f = matrices[rotation]
+    return (a, b, c, d, e + x0, f + y0)
+
+
+def _content_stream(writer, data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+
+def _form_xobject(writer, stamp_page):
+    """Copy a stamp page into writer as a form XObject and return its reference"""
+    xobject = DecodedStreamObject()
+    xobject.set_data(stamp_page.get_contents().get_data())
+    box = stamp_page.mediabox
+    xobject.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject([FloatObject(v) for v in (box.left, box.bottom, box.right, box.top)]),
+        NameObject('/Resources'): stamp_page['/Resources'].get_object().clone(writer),
+    })
+    return writer._add_object(xobject)
+
+
+def _child_dict(parent, key):
+    value = parent.get(key)
+    if value is None:
+        value = DictionaryObject()
+        parent[NameObject(key)] = value
+    return value.get_object()
+
+
+class PyPDF2Backend:
+    """Pure-Python backend"""
+
+    name = 'pypdf2'
+
+    def _reader(self, pdf_file):
+        source = pdf_source(pdf_file)
+        return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+    def page_count(self, pdf_file):
+        return len(self._reader(pdf_file).pages)
+
+    def merge(self, pdf_files, output_path):
+        """Concatenate pdf_files into output_path and return the page count"""
+        merger = PdfWriter()
+        for pdf_file in pdf_files:
+            for page in self._reader(pdf_file).pages:
+                merger.add_page(page)
+
+        with open(output_path, 'wb') as output_file:
+            merger.write(output_file)
+        return len(merger.pages)
+
+    def iter_split(self, pdf_file, plan):
+        """Yield (name, PDF bytes) per part; plan(page_count) lists (name, first, last) parts"""
+        reader = self._reader(pdf_file)
+        for name, first, last in plan(len(reader.pages)):
+            writer = PdfWriter()
+            for page_num in range(first - 1, last):
+                writer.add_page(reader.pages[page_num])
+
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            yield name, buffer.getvalue()
+
+    def render_pages(self, pdf_file, dpi=150, first_page=1, last_page=None):
+        """Yield (page number, PIL image), rasterized by poppler a few pages at a time"""
+        from pdf2image import convert_from_path, pdfinfo_from_path
+
+        source = pdf_source(pdf_file)
+        poppler_path = _get_poppler_path()
+        temp_path = None
+        if not isinstance(source, str):
+            # Poppler reads from disk; write the upload once rather than once per window
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+                temp_pdf.write(source)
+                temp_path = source = temp_pdf.name
+
+        try:
+            try:
+                page_count = pdfinfo_from_path(source, poppler_path=poppler_path)['Pages']
+            except Exception as e:
+                raise Exception(f"PDF to image conversion requires poppler. Please install poppler for Windows or ensure it's in your PATH. Error: {str(e)}")
+
+            last_page = page_count if last_page is None else min(last_page, page_count)
+            for start in range(first_page, last_page + 1, PDF_RENDER_WINDOW):
+                end = min(start + PDF_RENDER_WINDOW - 1, last_page)
+                images = convert_from_path(source, dpi=dpi, first_page=start,
+                                           last_page=end, poppler_path=poppler_path)
+                for offset, img in enumerate(images):
+                    yield start + offset, img
+        finally:
+            if temp_path:
+                os.unlink(temp_path)
+
+    def watermark_text(self, pdf_file, output_path, text, position, opacity, font_size, color):
+        """Stamp text on every page and write the result to output_path.
+
+        The stamp is stored once per page size as a form XObject; each page
+        only gains a resource entry and a short content stream drawing it.
+        """
+        reader = self._reader(pdf_file)
+        writer = PdfWriter()
+
+        # Saves the page's graphics state so the stamp is drawn untransformed
+        save_state = _content_stream(writer, b'q\n')
+        stamps = {}  # (box, rotation) -> (name, draw stream)
+
+        for page in reader.pages:
+            page = writer.add_page(page)
+            box = page.cropbox
+            rotation = page.get('/Rotate', 0) % 360
+            width, height = float(box.width), float(box.height)
+            visible = _page_box_key(height, width) if rotation in (90, 270) else _page_box_key(width, height)
+
+            key = (visible, rotation, width, height, float(box.left), float(box.bottom))
+            if key not in stamps:
+                stamp_pdf = cached_text_stamp(text, position, opacity, font_size, color, visible)
+                xobject = _form_xobject(writer, PdfReader(io.BytesIO(stamp_pdf)).pages[0])
+                name = f'/EDWatermark{len(stamps)}'
+                matrix = ' '.join(f'{v:g}' for v in _stamp_matrix(rotation, width, height,
+                                                                   float(box.left), float(box.bottom)))
+                draw = _content_stream(writer, f'\nQ\nq {matrix} cm {name} Do Q\n'.encode())
+                stamps[key] = (name, xobject, draw)
+            name, xobject, draw = stamps[key]
+
+            resources = _child_dict(page, '/Resources')
+            _child_dict(resources, '/XObject')[NameObject(name)] = xobject
+
+            contents = page.get('/Contents')
+            if contents is None:
+                parts = []
+            elif isinstance(contents.get_object(), ArrayObject):
+                parts = list(contents.get_object())
+            else:
+                parts = [contents]
+            page[NameObject('/Contents')] = ArrayObject([save_state, *parts, draw])
+
+        with open(output_path, 'wb') as output_file:
+            writer.write(output_file)
+        return len(writer.pages)
+
+
+class PyMuPDFBackend:
+    """PyMuPDF (fitz) backend"""
+
+    name = 'pymupdf'
+
+    def _open(self, pdf_file):
+        import fitz
+
+        source = pdf_source(pdf_file)
+        if isinstance(source, str):
+            return fitz.open(source)
+        return fitz.open(stream=source, filetype='pdf')
+
+    def page_count(self, pdf_file):
+        doc = self._open(pdf_file)
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+
+    def merge(self, pdf_files, output_path):
+        import fitz
+
+        merged = fitz.open()
+        try:
+            for pdf_file in pdf_files:
+                doc = self._open(pdf_file)
+                try:
+                    merged.insert_pdf(doc)
+                finally:
+                    doc.close()
+            merged.save(output_path)
+            return merged.page_count
+        finally:
+            merged.close()
+
+    def iter_split(self, pdf_file, plan):
+        import fitz
+
+        doc = self._open(pdf_file)
+        try:
+            # Plan before building anything so bad ranges fail early
+            parts = list(plan(doc.page_count))
+            for name, first, last in parts:
+                # insert_pdf copies only the objects the selected pages reference
+                part = fitz.open()
+                part.insert_pdf(doc, from_page=first - 1, to_page=last - 1)
+                data = part.tobytes()
+                part.close()
+                yield name, data
+        finally:
+            doc.close()
+
+    def render_pages(self, pdf_file, dpi=150, first_page=1, last_page=None):
+        doc = self._open(pdf_file)
+        try:
+            last_page = doc.page_count if last_page is None else min(last_page, doc.page_count)
+            for number in range(first_page, last_page + 1):
+                pix = doc[number - 1].get_pixmap(dpi=dpi, alpha=False)
+                img = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+                del pix
+                yield number, img
+        finally:
+            doc.close()
+
+    def watermark_text(self, pdf_file, output_path, text, position, opacity, font_size, color):
+        import fitz
+
+        doc = self._open(pdf_file)
+        stamps = {}  # visible page box -> stamp document
+        try:
+            for page in doc:
+                # page.rect is the visible (rotated) page the stamp is laid out for
+                visible = _page_box_key(page.rect.width, page.rect.height)
+                if visible not in stamps:
+                    stamp_pdf = cached_text_stamp(text, position, opacity, font_size, color, visible)
+                    stamps[visible] = fitz.open(stream=stamp_pdf, filetype='pdf')
+
+                # The stamp page becomes one shared XObject; each page gets a small reference to it
+                page.show_pdf_page(page.rect * page.derotation_matrix, stamps[visible], 0,
+                                   rotate=page.rotation)
+            doc.save(output_path)
+            return doc.page_count
+        finally:
+            for stamp in stamps.values():
+                stamp.close()
+            doc.close()
+
+
+BACKENDS = {
+    PyMuPDFBackend.name: PyMuPDFBackend,
+    PyPDF2Backend.name: PyPDF2Backend,
+}
+
+
+def get_backend(name=None):
+    """Backend named by name or PDF_BACKEND; 'auto' prefers PyMuPDF when installed"""
+    name = (name or getattr(settings, 'PDF_BACKEND', 'auto')).lower()
+    if name not in ('auto', *BACKENDS):
+        raise ValueError(f"Unknown PDF backend: {name}")
+
+    if name in ('auto', PyMuPDFBackend.name):
+        try:
+            import fitz  # noqa: F401
+            return PyMuPDFBackend()
+        except ImportError:
+            if name == PyMuPDFBackend.name:
+                raise
+    return PyPDF2Backend()
@@ -0,0 +1,166 @@
+import os
+import time
+import shutil
+import zipfile
+import tempfile
+import statistics
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PyPDF2 import PdfReader, PdfWriter
+from functools import partial
+from core.zip_stream import write_zip
+from pdf_tools import utils
+from pdf_tools.backends import PyMuPDFBackend, PyPDF2Backend, _get_poppler_path
+
+
+def _legacy_split(pdf_path, output_path, pages_per_split):
+    """Previous split_pdf: a PdfWriter and a temp file per part, then a ZIP on disk"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        reader = PdfReader(pdf_path)
+        total_pages = len(reader.pages)
+        pdf_paths = []
+        for i in range(0, total_pages, pages_per_split):
+            writer = PdfWriter()
+            for page_num in range(i, min(i + pages_per_split, total_pages)):
+                writer.add_page(reader.pages[page_num])
+            split_path = os.path.join(temp_dir, f'split_{i//pages_per_split + 1}.pdf')
+            with open(split_path, 'wb') as output_file:
+                writer.write(output_file)
+            pdf_paths.append(split_path)
+
+        with zipfile.ZipFile(output_path, 'w') as zip_file:
+            for pdf_path in pdf_paths:
+                zip_file.write(pdf_path, os.path.basename(pdf_path))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = "Benchmark PDF operations per backend against a sample document"
+    requires_system_checks = []
+
+    operations = ('split', 'merge', 'watermark', 'render')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(settings.BASE_DIR / 'test_large.pdf'),
+                            help='PDF to benchmark with')
+        parser.add_argument('--copies', type=int, default=1,
+                            help='Concatenate the document this many times to simulate a larger file')
+        parser.add_argument('--pages-per-split', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per implementation (the median is reported)')
+        parser.add_argument('--operations', nargs='+', choices=self.operations,
+                            default=list(self.operations))
+
+    def handle(self, *args, **options):
+        pdf_path = self._prepare_document(options['file'], options['copies'])
+        page_count = len(PdfReader(pdf_path).pages)
+        self.stdout.write(f"Document: {options['file']} x{options['copies']} "
+                          f"({page_count} pages, {os.path.getsize(pdf_path) / 1024:.0f} KB)")
+
+        self.backends = [PyPDF2Backend()]
+        try:
+            import fitz  # noqa: F401
+            self.backends.append(PyMuPDFBackend())
+        except ImportError:
+            self.stdout.write("PyMuPDF not installed, only the PyPDF2 backend is measured")
+
+        self.repeat = options['repeat']
+        self.output_path = tempfile.mktemp()
+        try:
+            for operation in options['operations']:
+                getattr(self, f'_benchmark_{operation}')(pdf_path, options)
+        finally:
+            if os.path.exists(self.output_path):
+                os.unlink(self.output_path)
+            if pdf_path != options['file']:
+                os.unlink(pdf_path)
+
+    def _prepare_document(self, path, copies):
+        if copies <= 1:
+            return path
+
+        reader = PdfReader(path)
+        writer = PdfWriter()
+        for _ in range(copies):
+            for page in reader.pages:
+                writer.add_page(page)
+
+        fd, output_path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            writer.write(f)
+        return output_path
+
+    def _time(self, func):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    def _run(self, title, implementations, size_from_result=False):
+        """Time each (name, func) pair; output size is read from self.output_path
+        unless size_from_result, in which case func returns it"""
+        rows = []
+        for name, func in implementations:
+            results = []
+            seconds = self._time(lambda: results.append(func()))
+            size = results[-1] if size_from_result else os.path.getsize(self.output_path)
+            rows.append((name, seconds, size))
+
+        self.stdout.write(f"\n{title}")
+        self.stdout.write(f"{'implementation':<28}{'median (s)':>12}{'output (KB)':>14}{'speedup':>10}")
+        baseline = rows[0][1]
+        for name, seconds, size in rows:
+            self.stdout.write(f"{name:<28}{seconds:>12.3f}{size / 1024:>14.0f}{baseline / seconds:>9.1f}x")
+
+    def _benchmark_split(self, pdf_path, options):
+        pages_per_split = options['pages_per_split']
+        plan = partial(utils._split_parts, pages_per_split=pages_per_split, page_ranges=None)
+
+        implementations = [
+            ('legacy (temp files)', lambda: _legacy_split(pdf_path, self.output_path, pages_per_split)),
+        ]
+        for backend in self.backends:
+            implementations.append((backend.name, lambda backend=backend: write_zip(
+                backend.iter_split(pdf_path, plan), self.output_path)))
+        self._run(f"Split, {pages_per_split} page(s) per part", implementations)
+
+    def _benchmark_merge(self, pdf_path, options):
+        # Merge the document with itself a few times
+        sources = [pdf_path] * 4
+        self._run("Merge, 4 copies", [
+            (backend.name, lambda backend=backend: backend.merge(sources, self.output_path))
+            for backend in self.backends
+        ])
+
+    def _benchmark_watermark(self, pdf_path, options):
+        self._run("Text watermark on every page", [
+            (backend.name, lambda backend=backend: backend.watermark_text(
+                pdf_path, self.output_path, 'CONFIDENTIAL', 'center', 0.3, 48, '#ff0000'))
+            for backend in self.backends
+        ])
+
+    def _benchmark_render(self, pdf_path, options):
+        def render(backend):
+            size = 0
+            for number, image in backend.render_pages(pdf_path, dpi=72):
+                size += image.width * image.height * 3
+                image.close()
+            return size
+
+        implementations = []
+        for backend in self.backends:
+            if backend.name == PyPDF2Backend.name and not _has_poppler():
+                self.stdout.write("\npoppler not found, skipping PyPDF2/poppler rendering")
+                continue
+            implementations.append((backend.name, lambda backend=backend: render(backend)))
+        if implementations:
+            self._run("Rasterize pages at 72 dpi (output = raw pixels)", implementations,
+                      size_from_result=True)
+
+
+def _has_poppler():
+    return shutil.which('pdftoppm') is not None or _get_poppler_path() is not None
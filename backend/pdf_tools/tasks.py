@@ -0,0 +1,36 @@
+import os
+from django.conf import settings
+from jobs.registry import register_task
+from .models import PDFOperationHistory
+from .utils import pdf_to_images
+
+
+@register_task('pdf_to_image')
+def pdf_to_image_task(job, progress):
+    """Convert the uploaded PDF of a job to a ZIP of page images"""
+    input_file = job.input_files[0]
+    output_path = os.path.join(job.output_dir, 'pdf_images.zip')
+
+    progress(10, 'Rendering pages')
+    with open(input_file['path'], 'rb') as pdf_file:
+        result = pdf_to_images(
+            pdf_file,
+            output_path,
+            job.params.get('output_format', 'jpeg'),
+            job.params.get('dpi', 150),
+            workers=settings.PDF_RENDER_WORKERS
+        )
+
+    PDFOperationHistory.objects.create(
+        operation_type='pdf_to_image',
+        file_count=1,
+        total_size=input_file['size'],
+        ip_address=job.ip_address or '0.0.0.0'
+    )
+
+    return {
+        'output_path': output_path,
+        'output_filename': 'pdf_images.zip',
+        'content_type': 'application/zip',
+        'result': {'image_count': result['image_count']}
+    }
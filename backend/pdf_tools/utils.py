@@ -1,146 +1,176 @@
+import io
 import os
 import tempfile
-from PyPDF2 import PdfReader, PdfWriter
-from PIL import Image
-import zipfile
+from functools import partial
+from core.process_pool import imap_in_pool
+from core.result_cache import cached_result
+from core.zip_stream import write_zip
+from .backends import get_backend, pdf_source
+
+# Upper bound on pages per task when rendering in parallel
+PDF_RENDER_CHUNK_PAGES = 8
 
 
 def merge_pdfs(pdf_files, output_path):
     """Merge multiple PDF files into one"""
     try:
-        merger = PdfWriter()
-        
-        for pdf_file in pdf_files:
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                merger.add_page(page)
-        
-        with open(output_path, 'wb') as output_file:
-            merger.write(output_file)
+        page_count = get_backend().merge(pdf_files, output_path)
         
         return {
             'file_path': output_path,
             'filename': 'merged.pdf',
-            'page_count': len(merger.pages)
+            'page_count': page_count
         }
     except Exception as e:
         raise Exception(f"PDF merge failed: {str(e)}")
 
 
-def pdf_to_images(pdf_file, output_path, output_format='PNG', dpi=150):
+def render_pdf_pages(pdf_file, dpi=150, first_page=1, last_page=None):
+    """Rasterize PDF pages one at a time, yielding (page number, PIL image)"""
+    return get_backend().render_pages(pdf_file, dpi, first_page, last_page)
+
+
+def pdf_page_count(pdf_file):
+    """Number of pages in a PDF"""
+    return get_backend().page_count(pdf_file)
+
+
+def _encode_page(number, image, output_format):
+    buffer = io.BytesIO()
+    image.save(buffer, output_format.upper())
+    image.close()
+    return f'page_{number}.{output_format.lower()}', buffer.getvalue()
+
+
+def _render_page_chunk(pdf_path, output_format, dpi, first_page, last_page):
+    """Worker entry point: render and encode a contiguous range of pages"""
+    return [
+        _encode_page(number, image, output_format)
+        for number, image in render_pdf_pages(pdf_path, dpi, first_page, last_page)
+    ]
+
+
+def _iter_page_images_parallel(pdf_file, output_format, dpi, workers, temp_dir=None):
+    source = pdf_source(pdf_file)
+    temp_path = None
+    if not isinstance(source, str):
+        # Workers open the document themselves; give them a path instead of the bytes
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=temp_dir) as temp_pdf:
+            temp_pdf.write(source)
+            temp_path = source = temp_pdf.name
+
+    try:
+        page_count = pdf_page_count(source)
+        # Several chunks per worker keep every core busy and the output flowing in order
+        chunk_size = max(1, min(PDF_RENDER_CHUNK_PAGES, -(-page_count // (workers * 2))))
+        chunks = (
+            (source, output_format, dpi, start, min(start + chunk_size - 1, page_count))
+            for start in range(1, page_count + 1, chunk_size)
+        )
+        for pages in imap_in_pool(_render_page_chunk, chunks, max_in_flight=workers):
+            yield from pages
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+
+def iter_page_images(pdf_file, output_format='PNG', dpi=150, workers=1, temp_dir=None):
+    """Yield (filename, image bytes) per page, in page order.
+
+    With workers > 1 page ranges are rendered concurrently in the image worker
+    pool, which read an uploaded document from a copy written to temp_dir;
+    otherwise pages are rendered here one at a time.
+    """
+    if workers > 1:
+        yield from _iter_page_images_parallel(pdf_file, output_format, dpi, workers, temp_dir)
+        return
+
+    for number, image in render_pdf_pages(pdf_file, dpi):
+        yield _encode_page(number, image, output_format)
+
+
+@cached_result('pdf_to_images', params=['output_format', 'dpi'], output_arg='output_path')
+def pdf_to_images(pdf_file, output_path, output_format='PNG', dpi=150, workers=1):
     """Convert PDF pages to images"""
-    temp_dir = tempfile.mkdtemp()
     try:
-        from pdf2image import convert_from_bytes
-        import platform
-        
-        # Read PDF file
-        pdf_bytes = pdf_file.read()
-        
-        # Convert to images with platform-specific poppler path
-        try:
-            if platform.system() == 'Windows':
-                # Try local poppler first, then common Windows poppler paths
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                local_poppler = os.path.join(current_dir, '..', 'poppler', 'poppler-24.08.0', 'Library', 'bin')
-                
-                possible_paths = [
-                    local_poppler,
-                    r'C:\Program Files\poppler\bin',
-                    r'C:\poppler\bin',
-                    r'C:\Program Files (x86)\poppler\bin'
-                ]
-                
-                poppler_path = None
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        poppler_path = path
-                        break
-                
-                if poppler_path:
-                    images = convert_from_bytes(pdf_bytes, dpi=dpi, poppler_path=poppler_path)
-                else:
-                    # Try without poppler_path (might be in PATH)
-                    images = convert_from_bytes(pdf_bytes, dpi=dpi)
-            else:
-                images = convert_from_bytes(pdf_bytes, dpi=dpi)
-        except Exception as e:
-            # Fallback: try with different settings
-            try:
-                images = convert_from_bytes(pdf_bytes, dpi=100)
-            except:
-                raise Exception(f"PDF to image conversion requires poppler. Please install poppler for Windows or ensure it's in your PATH. Error: {str(e)}")
-        
-        image_paths = []
-        for i, image in enumerate(images):
-            image_path = os.path.join(temp_dir, f'page_{i+1}.{output_format.lower()}')
-            image.save(image_path, output_format)
-            image_paths.append(image_path)
-        
-        # Create ZIP file with all images
-        with zipfile.ZipFile(output_path, 'w') as zip_file:
-            for image_path in image_paths:
-                zip_file.write(image_path, os.path.basename(image_path))
-        
+        # Pages are written to the ZIP as they are rendered, never all held at once
+        # Any copy of the upload for the workers goes next to the output
+        pages = iter_page_images(pdf_file, output_format, dpi, workers,
+                                 temp_dir=os.path.dirname(os.path.abspath(output_path)))
+        image_count = write_zip(pages, output_path)
+
         return {
             'file_path': output_path,
             'filename': 'pdf_images.zip',
-            'image_count': len(images)
+            'image_count': image_count
         }
     except Exception as e:
         raise Exception(f"PDF to image conversion failed: {str(e)}")
-    finally:
-        # Clean up temp directory
+
+
+def parse_page_ranges(expression, page_count):
+    """Parse a page range expression like "1-5,9,12-" into (first, last) pairs (1-based, inclusive).
+
+    Each range becomes its own file, so a range given twice is rejected rather
+    than written to the ZIP under the same name again.
+    """
+    ranges = []
+    for part in expression.replace(' ', '').split(','):
+        if not part:
+            continue
         try:
-            for file in os.listdir(temp_dir):
-                os.remove(os.path.join(temp_dir, file))
-            os.rmdir(temp_dir)
-        except:
-            pass
+            if '-' in part:
+                first, last = part.split('-', 1)
+                first = int(first) if first else 1
+                last = int(last) if last else page_count
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid page range: '{part}'")
+
+        if first > last:
+            raise ValueError(f"Invalid page range: '{part}'")
+        if first < 1 or last > page_count:
+            raise ValueError(f"Page range '{part}' is outside the document (1-{page_count})")
+        if (first, last) in ranges:
+            raise ValueError(f"Page range '{part}' is listed more than once")
+        ranges.append((first, last))
+
+    if not ranges:
+        raise ValueError("No pages selected")
+    return ranges
 
 
-def split_pdf(pdf_file, output_path, pages_per_split=1):
+def _split_parts(page_count, pages_per_split, page_ranges):
+    """(filename, first page, last page) for every part of a split"""
+    if page_ranges:
+        for first, last in parse_page_ranges(page_ranges, page_count):
+            name = f'page_{first}.pdf' if first == last else f'pages_{first}-{last}.pdf'
+            yield name, first, last
+    else:
+        for index, first in enumerate(range(1, page_count + 1, pages_per_split)):
+            yield f'split_{index + 1}.pdf', first, min(first + pages_per_split - 1, page_count)
+
+
+def iter_split_pdfs(pdf_file, pages_per_split=1, page_ranges=None):
+    """Yield (filename, PDF bytes) for each part of the split as soon as it is built.
+
+    The source is parsed once; parts are either fixed-size chunks of
+    pages_per_split pages or one part per range of a page_ranges expression.
+    """
+    plan = partial(_split_parts, pages_per_split=pages_per_split, page_ranges=page_ranges)
+    return get_backend().iter_split(pdf_file, plan)
+
+
+def split_pdf(pdf_file, output_path, pages_per_split=1, page_ranges=None):
     """Split PDF into separate files"""
-    temp_dir = tempfile.mkdtemp()
     try:
-        reader = PdfReader(pdf_file)
-        total_pages = len(reader.pages)
-        
-        pdf_paths = []
-        for i in range(0, total_pages, pages_per_split):
-            writer = PdfWriter()
-            
-            # Add pages to this split
-            end_page = min(i + pages_per_split, total_pages)
-            for page_num in range(i, end_page):
-                writer.add_page(reader.pages[page_num])
-            
-            # Save split PDF
-            split_filename = f'split_{i//pages_per_split + 1}.pdf'
-            split_path = os.path.join(temp_dir, split_filename)
-            
-            with open(split_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            pdf_paths.append(split_path)
-        
-        # Create ZIP file with all splits
-        with zipfile.ZipFile(output_path, 'w') as zip_file:
-            for pdf_path in pdf_paths:
-                zip_file.write(pdf_path, os.path.basename(pdf_path))
-        
+        split_count = write_zip(iter_split_pdfs(pdf_file, pages_per_split, page_ranges), output_path)
+
         return {
             'file_path': output_path,
             'filename': 'split_pdfs.zip',
-            'split_count': len(pdf_paths)
+            'split_count': split_count
         }
     except Exception as e:
         raise Exception(f"PDF split failed: {str(e)}")
-    finally:
-        # Clean up temp directory
-        try:
-            for file in os.listdir(temp_dir):
-                os.remove(os.path.join(temp_dir, file))
-            os.rmdir(temp_dir)
-        except:
-            pass
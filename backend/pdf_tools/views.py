@@ -1,14 +1,21 @@
-import os
-import shutil
-import tempfile
-import threading
-import time
+from itertools import chain
+from django.conf import settings
 from django.http import FileResponse, JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from jobs.queue import create_job, submit_job
+from core.scratch import uses_scratch
+from core.zip_stream import zip_response
+from jobs.utils import wants_async, job_accepted_payload
 from .models import PDFOperationHistory
-from .utils import merge_pdfs, pdf_to_images, split_pdf
+from .utils import merge_pdfs, pdf_to_images, iter_page_images, iter_split_pdfs
+
+
+def wants_stream(request):
+    """True when the client asked for the output to be streamed as it is produced"""
+    value = request.POST.get('stream', request.GET.get('stream', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
 
 
 def get_client_ip(request):
@@ -22,6 +29,7 @@ def get_client_ip(request):
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(uses_scratch, name='post')
 class MergePDFView(View):
     def post(self, request):
         try:
@@ -40,53 +48,33 @@ class MergePDFView(View):
                 if file.size == 0:
                     return JsonResponse({'error': f'File {file.name} is empty'}, status=400)
 
-            # Create temporary directory
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-                temp_pdf_path = temp_pdf.name
-
-            try:
-                result = merge_pdfs(pdf_files, temp_pdf_path)
-                
-                # Save to history
-                total_size = sum([f.size for f in pdf_files])
-                PDFOperationHistory.objects.create(
-                    operation_type='merge',
-                    file_count=len(pdf_files),
-                    total_size=total_size,
-                    ip_address=get_client_ip(request)
-                )
-                
-                # Return file
-                response = FileResponse(
-                    open(temp_pdf_path, 'rb'),
-                    content_type='application/pdf',
-                    as_attachment=True,
-                    filename='merged_pdf.pdf'
-                )
-
-                # Schedule file deletion
-                def cleanup_file():
-                    time.sleep(2)
-                    try:
-                        os.unlink(temp_pdf_path)
-                    except:
-                        pass
-
-                threading.Thread(target=cleanup_file, daemon=True).start()
-                return response
-                
-            except Exception as e:
-                try:
-                    os.unlink(temp_pdf_path)
-                except:
-                    pass
-                raise e
+            # Written to the request's scratch directory, removed once the response is sent
+            temp_pdf_path = request.scratch.path('merged_pdf.pdf')
+            result = merge_pdfs(pdf_files, temp_pdf_path)
+            
+            # Save to history
+            total_size = sum([f.size for f in pdf_files])
+            PDFOperationHistory.objects.create(
+                operation_type='merge',
+                file_count=len(pdf_files),
+                total_size=total_size,
+                ip_address=get_client_ip(request)
+            )
+            
+            # Return file
+            return FileResponse(
+                open(temp_pdf_path, 'rb'),
+                content_type='application/pdf',
+                as_attachment=True,
+                filename='merged_pdf.pdf'
+            )
 
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(uses_scratch, name='post')
 class PDFToImageView(View):
     def post(self, request):
         try:
@@ -97,46 +85,54 @@ class PDFToImageView(View):
             output_format = request.POST.get('output_format', 'jpeg')
             dpi = int(request.POST.get('dpi', 150))
 
-            # Create temporary ZIP file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-                temp_zip_path = temp_zip.name
+            if wants_async(request):
+                # Run in the job queue and let the client poll for the result
+                job = create_job(
+                    'pdf_to_image',
+                    files=[pdf_file],
+                    params={'output_format': output_format, 'dpi': dpi},
+                    ip_address=get_client_ip(request)
+                )
+                submit_job(job)
+                return JsonResponse(job_accepted_payload(job), status=202)
+
+            if wants_stream(request):
+                # Render page by page straight into the response
+                pages = iter_page_images(pdf_file, output_format, dpi, settings.PDF_RENDER_WORKERS,
+                                         temp_dir=request.scratch.root)
+                # Render the first page now so a broken PDF still gets a JSON error
+                first_page = next(pages, None)
+                if first_page is None:
+                    return JsonResponse({'error': 'PDF has no pages'}, status=400)
 
-            try:
-                result = pdf_to_images(pdf_file, temp_zip_path, output_format, dpi)
-                
-                # Save to history
                 PDFOperationHistory.objects.create(
                     operation_type='pdf_to_image',
                     file_count=1,
                     total_size=pdf_file.size,
                     ip_address=get_client_ip(request)
                 )
-                
-                # Return file
-                response = FileResponse(
-                    open(temp_zip_path, 'rb'),
-                    content_type='application/zip',
-                    as_attachment=True,
-                    filename='pdf_images.zip'
-                )
+                return zip_response(chain([first_page], pages), 'pdf_images.zip')
 
-                # Schedule file deletion
-                def cleanup_file():
-                    time.sleep(2)
-                    try:
-                        os.unlink(temp_zip_path)
-                    except:
-                        pass
-
-                threading.Thread(target=cleanup_file, daemon=True).start()
-                return response
-                
-            except Exception as e:
-                try:
-                    os.unlink(temp_zip_path)
-                except:
-                    pass
-                raise e
+            # Written to the request's scratch directory, removed once the response is sent
+            temp_zip_path = request.scratch.path('pdf_images.zip')
+            result = pdf_to_images(pdf_file, temp_zip_path, output_format, dpi,
+                                   workers=settings.PDF_RENDER_WORKERS)
+            
+            # Save to history
+            PDFOperationHistory.objects.create(
+                operation_type='pdf_to_image',
+                file_count=1,
+                total_size=pdf_file.size,
+                ip_address=get_client_ip(request)
+            )
+            
+            # Return file
+            return FileResponse(
+                open(temp_zip_path, 'rb'),
+                content_type='application/zip',
+                as_attachment=True,
+                filename='pdf_images.zip'
+            )
 
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -151,47 +147,30 @@ class SplitPDFView(View):
                 return JsonResponse({'error': 'No PDF file provided'}, status=400)
 
             pages_per_split = int(request.POST.get('pages_per_split', 1))
-
-            # Create temporary ZIP file  
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-                temp_zip_path = temp_zip.name
-
+            if pages_per_split < 1:
+                return JsonResponse({'error': 'pages_per_split must be at least 1'}, status=400)
+            # Optional page range expression, e.g. "1-5,9,12-" (one file per range)
+            page_ranges = request.POST.get('ranges', '').strip() or None
+
+            # Parts are built in memory and streamed into the ZIP response
+            parts = iter_split_pdfs(pdf_file, pages_per_split, page_ranges)
+            # Build the first part now so a broken PDF or bad range still gets a JSON error
             try:
-                result = split_pdf(pdf_file, temp_zip_path, pages_per_split)
-                
-                # Save to history
-                PDFOperationHistory.objects.create(
-                    operation_type='split',
-                    file_count=1,
-                    total_size=pdf_file.size,
-                    ip_address=get_client_ip(request)
-                )
-                
-                # Return file
-                response = FileResponse(
-                    open(temp_zip_path, 'rb'),
-                    content_type='application/zip',
-                    as_attachment=True,
-                    filename='split_pdfs.zip'
-                )
-
-                # Schedule file deletion
-                def cleanup_file():
-                    time.sleep(2)
-                    try:
-                        os.unlink(temp_zip_path)
-                    except:
-                        pass
-
-                threading.Thread(target=cleanup_file, daemon=True).start()
-                return response
-                
-            except Exception as e:
-                try:
-                    os.unlink(temp_zip_path)
-                except:
-                    pass
-                raise e
+                first_part = next(parts, None)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            if first_part is None:
+                return JsonResponse({'error': 'PDF has no pages'}, status=400)
+
+            # Save to history
+            PDFOperationHistory.objects.create(
+                operation_type='split',
+                file_count=1,
+                total_size=pdf_file.size,
+                ip_address=get_client_ip(request)
+            )
+
+            return zip_response(chain([first_part], parts), 'split_pdfs.zip')
 
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:23
+
+import os
+import mimetypes
+from django.db import migrations
+
+
+def _content_type(old_job):
+    """MIME type of a legacy job's output, from its file name"""
+    name = old_job.output_filename or os.path.basename(old_job.output_file_path or '')
+    return mimetypes.guess_type(name)[0] if name else None
+
+
+def copy_qr_jobs(apps, schema_editor):
+    """Move QRCodeJob rows into the shared jobs table"""
+    QRCodeJob = apps.get_model('qr_tools', 'QRCodeJob')
+    Job = apps.get_model('jobs', 'Job')
+
+    for old_job in QRCodeJob.objects.all():
+        Job.objects.create(
+            id=old_job.id,
+            job_type=old_job.job_type,
+            status=old_job.status,
+            progress=100 if old_job.status == 'completed' else 0,
+            params={
+                'qr_content': old_job.qr_content,
+                'qr_size': old_job.qr_size,
+                'qr_error_correction': old_job.qr_error_correction,
+            },
+            output_file_path=old_job.output_file_path,
+            output_filename=old_job.output_filename,
+            output_content_type=_content_type(old_job),
+            completed_at=old_job.completed_at,
+            error_message=old_job.error_message,
+        )
+        # created_at is auto_now_add, so restore it separately
+        Job.objects.filter(id=old_job.id).update(created_at=old_job.created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+        ('qr_tools', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_qr_jobs, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='QRCodeJob',
+        ),
+    ]
@@ -5,12 +5,21 @@ import os
 from PIL import Image, ImageFilter
 from pyzbar import pyzbar
 import logging
+from core.result_cache import cached_result
+from core.zip_stream import zip_response
+from core.encoding import encode_image
+from core.imaging import open_image, load_image
 
 logger = logging.getLogger(__name__)
 
 
+@cached_result('generate_qr_code', input_kind='text',
+               params=['size', 'error_correction', 'output_format', 'fill_color', 'back_color',
+                       'encode_profile'],
+               file_params=['logo_path'])
 def generate_qr_code(content, size=200, error_correction='M', output_format='PNG', 
-                    fill_color="black", back_color="white", logo_path=None):
+                    fill_color="black", back_color="white", logo_path=None,
+                    encode_profile='balanced'):
     """Enhanced QR code generation with customization options"""
     try:
         # Validate input
@@ -72,11 +81,11 @@ def generate_qr_code(content, size=200, error_correction='M', output_format='PNG
         # Add logo if provided
         if logo_path and os.path.exists(logo_path):
             try:
-                logo = Image.open(logo_path)
-                
                 # Calculate logo size (10% of QR code size)
                 logo_size = size // 10
-                logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
+                
+                # A large JPEG logo is decoded at reduced scale straight to the small size
+                logo = load_image(logo_path, size=(logo_size, logo_size))
                 
                 # Create a white background for logo
                 logo_bg = Image.new('RGB', (logo_size + 10, logo_size + 10), 'white')
@@ -102,24 +111,23 @@ def generate_qr_code(content, size=200, error_correction='M', output_format='PNG
         
         # Optimize for different formats
         save_kwargs = {}
-        if output_format.upper() == 'PNG':
-            save_kwargs = {'optimize': True, 'compress_level': 6}
-        elif output_format.upper() in ['JPEG', 'JPG']:
-            save_kwargs = {'quality': 95, 'optimize': True}
+        if output_format.upper() in ['JPEG', 'JPG']:
+            save_kwargs = {'quality': 95}
             # Convert to RGB for JPEG
             if img.mode == 'RGBA':
                 background = Image.new('RGB', img.size, back_color)
                 background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
                 img = background
         elif output_format.upper() == 'WEBP':
-            save_kwargs = {'quality': 90, 'optimize': True}
+            save_kwargs = {'quality': 90}
         
         # Save to temporary file
         output_dir = tempfile.mkdtemp()
         output_filename = f"qr_code.{output_format.lower()}"
         output_path = os.path.join(output_dir, output_filename)
         
-        img.save(output_path, format=output_format.upper(), **save_kwargs)
+        with open(output_path, 'wb') as f:
+            f.write(encode_image(img, output_format, encode_profile, **save_kwargs))
         
         # Validate output
         if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
@@ -135,8 +143,8 @@ def generate_qr_code(content, size=200, error_correction='M', output_format='PNG
 def read_qr_code(image_path):
     """Read QR code from image"""
     try:
-        # Open image
-        image = Image.open(image_path)
+        # Open image, refusing ones over the pixel budget
+        image = open_image(image_path)
         
         # Decode QR codes
         qr_codes = pyzbar.decode(image)
@@ -181,10 +189,13 @@ END:VCARD"""
         raise Exception(f"Failed to generate contact QR: {str(e)}")
 
 
-def batch_generate_qr(content_list, size=200):
-    """Generate multiple QR codes with enhanced optimization"""
+def batch_generate_qr(content_list, size=200, encode_profile='balanced'):
+    """Generate multiple QR codes with enhanced optimization.
+
+    Each entry carries the PNG bytes under 'data', ready for qr_zip_response
+    without touching disk.
+    """
     try:
-        output_dir = tempfile.mkdtemp()
         generated_files = []
         
         for i, content in enumerate(content_list):
@@ -219,14 +230,10 @@ def batch_generate_qr(content_list, size=200):
                 img = img.resize((size, size), Image.Resampling.LANCZOS)
             
             filename = f"qr_code_{i+1}.png"
-            filepath = os.path.join(output_dir, filename)
-            
-            # Save with optimization
-            img.save(filepath, 'PNG', optimize=True)
-            
+
             generated_files.append({
                 'filename': filename,
-                'filepath': filepath,
+                'data': encode_image(img, 'PNG', encode_profile),
                 'content': content
             })
         
@@ -237,20 +244,6 @@ def batch_generate_qr(content_list, size=200):
         raise Exception(f"Failed to generate batch QR codes: {str(e)}")
 
 
-def create_qr_zip(qr_files):
-    """Create ZIP file containing multiple QR codes"""
-    import zipfile
-    
-    try:
-        output_dir = tempfile.mkdtemp()
-        zip_path = os.path.join(output_dir, "qr_codes.zip")
-        
-        with zipfile.ZipFile(zip_path, 'w') as zip_file:
-            for qr_file in qr_files:
-                zip_file.write(qr_file['filepath'], qr_file['filename'])
-        
-        return zip_path
-        
-    except Exception as e:
-        logger.error(f"QR ZIP creation error: {str(e)}")
-        raise Exception(f"Failed to create QR ZIP: {str(e)}")
+def qr_zip_response(qr_files, filename='qr_codes.zip'):
+    """Stream a ZIP of QR codes from batch_generate_qr straight into the response"""
+    return zip_response(((qr_file['filename'], qr_file['data']) for qr_file in qr_files), filename)
@@ -7,13 +7,22 @@ from django.core.files.base import ContentFile
 from django.utils import timezone
 import json
 import qrcode
-import io
 import base64
 from PIL import Image
 from pyzbar import pyzbar
-from .models import QRCodeJob, ContactQR
+from jobs.models import Job
+from core.encoding import encode_image, resolve_profile
+from core.imaging import open_image
+from .models import ContactQR
+from .utils import batch_generate_qr, qr_zip_response
 # from .utils import generate_qr_code, read_qr_code
 
+QR_JOB_TYPES = ['generate_text', 'generate_url', 'generate_contact', 'read_qr', 'batch_generate']
+
+# Upper bounds for one batch request; every code is generated before the ZIP streams
+MAX_BATCH_QR_CODES = 100
+MAX_BATCH_QR_SIZE = 2000
+
 
 def qr_tools_home(request):
     """Main QR Tools page."""
@@ -29,16 +38,22 @@ def generate_qr_from_text(request):
         text_content = data.get('text_content', '')
         qr_size = int(data.get('qr_size', 200))
         error_correction = data.get('error_correction', 'M')
+        try:
+            encode_profile = resolve_profile(data.get('encode_profile'), 'balanced')
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         if not text_content:
             return JsonResponse({'error': 'Text content is required'}, status=400)
         
         # Create QR job
-        job = QRCodeJob.objects.create(
+        job = Job.objects.create(
             job_type='generate_text',
-            qr_content=text_content,
-            qr_size=qr_size,
-            qr_error_correction=error_correction,
+            params={
+                'qr_content': text_content,
+                'qr_size': qr_size,
+                'qr_error_correction': error_correction,
+            },
             status='processing'
         )
         
@@ -56,15 +71,13 @@ def generate_qr_from_text(request):
             # Create QR image
             qr_image = qr.make_image(fill_color="black", back_color="white")
             
-            # Save to memory
-            img_buffer = io.BytesIO()
-            qr_image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
+            # Encode to memory
+            qr_png = encode_image(qr_image.get_image(), 'PNG', encode_profile)
             
             # Save file
             output_path = default_storage.save(
                 f'qr_codes/{job.id}_qr.png',
-                ContentFile(img_buffer.getvalue())
+                ContentFile(qr_png)
             )
             
             # Update job
@@ -75,8 +88,7 @@ def generate_qr_from_text(request):
             job.save()
             
             # Convert to base64 for immediate display
-            img_buffer.seek(0)
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+            img_base64 = base64.b64encode(qr_png).decode()
             
             return JsonResponse({
                 'success': True,
@@ -105,6 +117,10 @@ def generate_qr_from_url(request):
         url_content = data.get('url_content', '')
         qr_size = int(data.get('qr_size', 200))
         error_correction = data.get('error_correction', 'M')
+        try:
+            encode_profile = resolve_profile(data.get('encode_profile'), 'balanced')
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         if not url_content:
             return JsonResponse({'error': 'URL is required'}, status=400)
@@ -114,11 +130,13 @@ def generate_qr_from_url(request):
             url_content = 'https://' + url_content
         
         # Create QR job
-        job = QRCodeJob.objects.create(
+        job = Job.objects.create(
             job_type='generate_url',
-            qr_content=url_content,
-            qr_size=qr_size,
-            qr_error_correction=error_correction,
+            params={
+                'qr_content': url_content,
+                'qr_size': qr_size,
+                'qr_error_correction': error_correction,
+            },
             status='processing'
         )
         
@@ -136,15 +154,13 @@ def generate_qr_from_url(request):
             # Create QR image
             qr_image = qr.make_image(fill_color="black", back_color="white")
             
-            # Save to memory
-            img_buffer = io.BytesIO()
-            qr_image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
+            # Encode to memory
+            qr_png = encode_image(qr_image.get_image(), 'PNG', encode_profile)
             
             # Save file
             output_path = default_storage.save(
                 f'qr_codes/{job.id}_qr.png',
-                ContentFile(img_buffer.getvalue())
+                ContentFile(qr_png)
             )
             
             # Update job
@@ -155,8 +171,7 @@ def generate_qr_from_url(request):
             job.save()
             
             # Convert to base64 for immediate display
-            img_buffer.seek(0)
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+            img_base64 = base64.b64encode(qr_png).decode()
             
             return JsonResponse({
                 'success': True,
@@ -198,13 +213,19 @@ def generate_qr_from_contact(request):
         
         qr_size = int(data.get('qr_size', 200))
         error_correction = data.get('error_correction', 'M')
+        try:
+            encode_profile = resolve_profile(data.get('encode_profile'), 'balanced')
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Create QR job
-        job = QRCodeJob.objects.create(
+        job = Job.objects.create(
             job_type='generate_contact',
-            qr_content=vcard_data,
-            qr_size=qr_size,
-            qr_error_correction=error_correction,
+            params={
+                'qr_content': vcard_data,
+                'qr_size': qr_size,
+                'qr_error_correction': error_correction,
+            },
             status='processing'
         )
         
@@ -222,15 +243,13 @@ def generate_qr_from_contact(request):
             # Create QR image
             qr_image = qr.make_image(fill_color="black", back_color="white")
             
-            # Save to memory
-            img_buffer = io.BytesIO()
-            qr_image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
+            # Encode to memory
+            qr_png = encode_image(qr_image.get_image(), 'PNG', encode_profile)
             
             # Save file
             output_path = default_storage.save(
                 f'qr_codes/{job.id}_contact_qr.png',
-                ContentFile(img_buffer.getvalue())
+                ContentFile(qr_png)
             )
             
             # Update job
@@ -241,8 +260,7 @@ def generate_qr_from_contact(request):
             job.save()
             
             # Convert to base64 for immediate display
-            img_buffer.seek(0)
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+            img_base64 = base64.b64encode(qr_png).decode()
             
             return JsonResponse({
                 'success': True,
@@ -263,6 +281,60 @@ def generate_qr_from_contact(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_qr_batch(request):
+    """Generate one QR code per entry and stream them back as a ZIP."""
+    try:
+        data = json.loads(request.body)
+        contents = data.get('contents', [])
+        try:
+            qr_size = int(data.get('qr_size', 200))
+            encode_profile = resolve_profile(data.get('encode_profile'), 'balanced')
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        if not isinstance(contents, list) or not all(isinstance(c, str) for c in contents):
+            return JsonResponse({'error': 'contents must be a list of strings'}, status=400)
+        contents = [c for c in contents if c.strip()]
+        if not contents:
+            return JsonResponse({'error': 'At least one content entry is required'}, status=400)
+        if len(contents) > MAX_BATCH_QR_CODES:
+            return JsonResponse({'error': f'At most {MAX_BATCH_QR_CODES} QR codes per batch'}, status=400)
+        if not 1 <= qr_size <= MAX_BATCH_QR_SIZE:
+            return JsonResponse({'error': f'qr_size must be between 1 and {MAX_BATCH_QR_SIZE}'}, status=400)
+        
+        # Create QR job
+        job = Job.objects.create(
+            job_type='batch_generate',
+            params={
+                'qr_content': '\n'.join(contents),
+                'qr_size': qr_size,
+                'batch_size': len(contents),
+            },
+            status='processing'
+        )
+        
+        try:
+            qr_files = batch_generate_qr(contents, qr_size, encode_profile=encode_profile)
+        except Exception as e:
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.save()
+            return JsonResponse({'error': f'QR generation failed: {str(e)}'}, status=500)
+        
+        job.output_filename = 'qr_codes.zip'
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.save()
+        
+        # The codes are already in memory, so the ZIP streams without a temp file
+        return qr_zip_response(qr_files, 'qr_codes.zip')
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def read_qr_code_view(request):
@@ -274,15 +346,15 @@ def read_qr_code_view(request):
         file = request.FILES['file']
         
         # Create QR job
-        job = QRCodeJob.objects.create(
+        job = Job.objects.create(
             job_type='read_qr',
-            qr_content='',
+            params={'qr_content': ''},
             status='processing'
         )
         
         try:
-            # Open and read QR code
-            image = Image.open(file)
+            # Open and read QR code, refusing images over the pixel budget
+            image = open_image(file)
             qr_codes = pyzbar.decode(image)
             
             if not qr_codes:
@@ -295,7 +367,7 @@ def read_qr_code_view(request):
             qr_data = qr_codes[0].data.decode('utf-8')
             
             # Update job
-            job.qr_content = qr_data
+            job.params['qr_content'] = qr_data
             job.status = 'completed'
             job.completed_at = timezone.now()
             job.save()
@@ -349,16 +421,17 @@ def read_qr_code_view(request):
 @require_http_methods(["GET"])
 def get_qr_jobs(request):
     """Get recent QR code jobs."""
-    jobs = QRCodeJob.objects.all().order_by('-created_at')[:20]
+    jobs = Job.objects.filter(job_type__in=QR_JOB_TYPES).order_by('-created_at')[:20]
     
     jobs_data = []
     for job in jobs:
+        qr_content = job.params.get('qr_content', '')
         jobs_data.append({
             'id': str(job.id),
             'job_type': job.job_type,
             'status': job.status,
-            'qr_content': job.qr_content[:100] + '...' if len(job.qr_content) > 100 else job.qr_content,
-            'qr_size': job.qr_size,
+            'qr_content': qr_content[:100] + '...' if len(qr_content) > 100 else qr_content,
+            'qr_size': job.params.get('qr_size', 200),
             'output_filename': job.output_filename,
             'created_at': job.created_at.isoformat(),
             'completed_at': job.completed_at.isoformat() if job.completed_at else None,
@@ -14,6 +14,7 @@ import hashlib
 import base64
 import io
 import zipfile
+from core.imaging import load_image
 from .models import PasswordProtectedDocument, EncryptedDocument, WatermarkSecurity, AccessLog, SecurityPolicy
 
 
@@ -233,8 +234,8 @@ def add_watermark(request):
         
         # For this example, we'll handle image files
         if file.content_type.startswith('image/'):
-            # Open image
-            image = Image.open(file)
+            # Decode upright, refusing images over the pixel budget
+            image = load_image(file)
             
             # Create watermark overlay
             overlay = Image.new('RGBA', image.size, (255, 255, 255, 0))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:23
+
+import os
+import mimetypes
+from django.db import migrations
+
+
+def _content_type(old_job):
+    """MIME type of a legacy job's output, from its file name"""
+    name = old_job.output_filename or os.path.basename(old_job.output_file_path or '')
+    return mimetypes.guess_type(name)[0] if name else None
+
+
+def copy_watermark_jobs(apps, schema_editor):
+    """Move WatermarkJob rows into the shared jobs table"""
+    WatermarkJob = apps.get_model('watermark_tools', 'WatermarkJob')
+    Job = apps.get_model('jobs', 'Job')
+
+    for old_job in WatermarkJob.objects.all():
+        Job.objects.create(
+            id=old_job.id,
+            job_type=old_job.job_type,
+            status=old_job.status,
+            progress=100 if old_job.status == 'completed' else 0,
+            input_files=[{
+                'name': old_job.input_filename,
+                'path': old_job.input_file_path,
+                'size': old_job.input_file_size,
+            }],
+            params={
+                'file_type': old_job.file_type,
+                'watermark_text': old_job.watermark_text,
+                'watermark_position': old_job.watermark_position,
+                'watermark_opacity': old_job.watermark_opacity,
+                'watermark_font_size': old_job.watermark_font_size,
+                'watermark_color': old_job.watermark_color,
+            },
+            output_file_path=old_job.output_file_path,
+            output_filename=old_job.output_filename,
+            output_content_type=_content_type(old_job),
+            completed_at=old_job.completed_at,
+            error_message=old_job.error_message,
+        )
+        # created_at is auto_now_add, so restore it separately
+        Job.objects.filter(id=old_job.id).update(created_at=old_job.created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+        ('watermark_tools', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_watermark_jobs, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='WatermarkJob',
+        ),
+    ]
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.watermark_home, name='watermark_home'),
     path('apply/', views.apply_watermark, name='apply_watermark'),
+    path('apply-batch/', views.apply_watermark_batch, name='apply_watermark_batch'),
     path('add-text/', views.add_text_watermark, name='add_text_watermark'),
     path('remove/', views.remove_watermark_view, name='remove_watermark'),
     path('jobs/', views.get_watermark_jobs, name='get_watermark_jobs'),
@@ -1,38 +1,108 @@
 import os
 import tempfile
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
-from PyPDF2 import PdfReader, PdfWriter
+from pdf_tools.backends import get_backend, cached_text_stamp
+from core.imaging import load_image
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Rendered text marks kept in memory across requests
+TEXT_MARK_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=16)
+def load_font(font_size):
+    """Arial at font_size, falling back to Pillow's built-in font"""
+    try:
+        return ImageFont.truetype("arial.ttf", font_size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=font_size)
+        except TypeError:
+            # Pillow < 10.1 has a single fixed-size default font
+            return ImageFont.load_default()
+
+
+def _opacity_lut(opacity):
+    return [round(value * opacity) for value in range(256)]
+
+
+@lru_cache(maxsize=TEXT_MARK_CACHE_SIZE)
+def render_text_mark(text, font_size, color='#000000', opacity=1.0):
+    """RGBA layer holding only the text, cropped to its bounding box.
+
+    Cached by all arguments and shared between requests, so callers must
+    not modify the returned image.
+    """
+    font = load_font(font_size)
+    left, top, right, bottom = font.getbbox(text)
+    size = (max(1, right - left), max(1, bottom - top))
+
+    # Glyph coverage becomes the alpha channel under a solid color
+    coverage = Image.new('L', size, 0)
+    ImageDraw.Draw(coverage).text((-left, -top), text, font=font, fill=255)
+
+    color_rgb = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
+    mark = Image.new('RGBA', size, color_rgb + (0,))
+    mark.putalpha(coverage.point(_opacity_lut(opacity)))
+    return mark
+
+
+def set_mark_opacity(mark, opacity):
+    """Copy of mark as RGBA with its alpha scaled by opacity (0-1) through a lookup table"""
+    mark = mark.convert('RGBA') if mark.mode != 'RGBA' else mark.copy()
+    if opacity < 1:
+        mark.putalpha(mark.getchannel('A').point(_opacity_lut(opacity)))
+    return mark
+
+
+def composite_mark(image, mark, position):
+    """Blend an RGBA mark onto image in place at position (x, y).
+
+    Only the mark's bounding box is read and written, so no full-size
+    overlay is ever allocated.
+    """
+    x, y = position
+
+    # Clip the mark to the image
+    left, top = max(0, -x), max(0, -y)
+    right = min(mark.width, image.width - x)
+    bottom = min(mark.height, image.height - y)
+    if right <= left or bottom <= top:
+        return image
+    if (left, top, right, bottom) != (0, 0, mark.width, mark.height):
+        mark = mark.crop((left, top, right, bottom))
+
+    box = (x + left, y + top, x + left + mark.width, y + top + mark.height)
+    if image.mode == 'RGBA':
+        # Keep the image's own transparency correct
+        region = image.crop(box)
+        region.alpha_composite(mark)
+        image.paste(region, box)
+    else:
+        # Over an opaque image, pasting through the mark's alpha is the same blend
+        image.paste(mark, box[:2], mark)
+    return image
+
+
 def add_text_watermark_to_image(input_path, watermark_text, position='bottom-right', 
                                opacity=0.3, font_size=12, color='#000000'):
     """Add text watermark to image"""
     try:
-        # Open image
-        image = Image.open(input_path)
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-        
-        # Create transparent overlay
-        overlay = Image.new('RGBA', image.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(overlay)
+        # Decode upright, refusing images over the pixel budget
+        image = load_image(input_path)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = 'A' in image.mode or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
         
-        # Try to load font
-        try:
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
+        mark = render_text_mark(watermark_text, font_size, color, opacity)
         
         # Calculate text position
-        text_bbox = draw.textbbox((0, 0), watermark_text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
+        text_width, text_height = mark.size
         
         margin = 20
         if position == 'bottom-right':
@@ -54,16 +124,8 @@ def add_text_watermark_to_image(input_path, watermark_text, position='bottom-rig
             x = image.width - text_width - margin
             y = image.height - text_height - margin
         
-        # Convert hex color to RGB
-        color_rgb = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
-        alpha = int(opacity * 255)
-        color_rgba = color_rgb + (alpha,)
-        
-        # Draw text
-        draw.text((x, y), watermark_text, font=font, fill=color_rgba)
-        
-        # Combine image with overlay
-        watermarked = Image.alpha_composite(image, overlay)
+        # Blend the text into its bounding box only
+        watermarked = composite_mark(image, mark, (x, y))
         
         # Save result
         output_dir = tempfile.mkdtemp()
@@ -86,27 +148,14 @@ def add_text_watermark_to_pdf(input_path, watermark_text, position='bottom-right
                              opacity=0.3, font_size=12, color='#000000'):
     """Add text watermark to PDF"""
     try:
-        # Read PDF
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-        
-        # Create watermark
-        watermark_buffer = create_watermark_pdf(watermark_text, position, opacity, font_size, color)
-        watermark_reader = PdfReader(watermark_buffer)
-        watermark_page = watermark_reader.pages[0]
-        
-        # Apply watermark to each page
-        for page in reader.pages:
-            page.merge_page(watermark_page)
-            writer.add_page(page)
-        
         # Save result
         output_dir = tempfile.mkdtemp()
         output_filename = f"watermarked_{os.path.basename(input_path)}"
         output_path = os.path.join(output_dir, output_filename)
         
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+        get_backend().watermark_text(
+            input_path, output_path, watermark_text, position, opacity, font_size, color
+        )
         
         return output_path
         
@@ -115,47 +164,10 @@ def add_text_watermark_to_pdf(input_path, watermark_text, position='bottom-right
         raise Exception(f"Failed to add watermark: {str(e)}")
 
 
-def create_watermark_pdf(text, position, opacity, font_size, color):
+def create_watermark_pdf(text, position, opacity, font_size, color, page_size=letter):
     """Create watermark PDF"""
     import io
-    
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Calculate position
-    margin = 50
-    if position == 'bottom-right':
-        x = width - len(text) * font_size * 0.6 - margin
-        y = margin
-    elif position == 'bottom-left':
-        x = margin
-        y = margin
-    elif position == 'top-right':
-        x = width - len(text) * font_size * 0.6 - margin
-        y = height - margin - font_size
-    elif position == 'top-left':
-        x = margin
-        y = height - margin - font_size
-    elif position == 'center':
-        x = width // 2 - len(text) * font_size * 0.3
-        y = height // 2
-    else:
-        x = width - len(text) * font_size * 0.6 - margin
-        y = margin
-    
-    # Set opacity and color
-    p.setFillAlpha(opacity)
-    color_rgb = [int(color[i:i+2], 16)/255.0 for i in (1, 3, 5)]
-    p.setFillColorRGB(*color_rgb)
-    
-    # Add text
-    p.setFont("Helvetica", font_size)
-    p.drawString(x, y, text)
-    p.save()
-    
-    buffer.seek(0)
-    return buffer
+    return io.BytesIO(cached_text_stamp(text, position, opacity, font_size, color, tuple(page_size)))
 
 
 def get_file_size_mb(file_path):
@@ -5,12 +5,26 @@ from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.utils import timezone
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import json
 import io
 import os
-from .models import WatermarkJob, DigitalSignature
-from .utils import add_text_watermark_to_image, add_text_watermark_to_pdf
+from jobs.models import Job
+from .models import DigitalSignature
+from core.zip_stream import zip_response
+from core.imaging import open_image, load_image, ImageTooLarge
+from .utils import (
+    add_text_watermark_to_image, add_text_watermark_to_pdf,
+    render_text_mark, set_mark_opacity, composite_mark,
+)
+
+WATERMARK_JOB_TYPES = ['text_watermark', 'image_watermark', 'remove_watermark']
+
+# watermark_type of an apply request and the job type it is recorded as
+APPLY_WATERMARK_TYPES = {'text': 'text_watermark', 'image': 'image_watermark'}
+
+# Largest font size accepted for text watermarks
+MAX_FONT_SIZE = 512
 
 
 def watermark_home(request):
@@ -18,6 +32,73 @@ def watermark_home(request):
     return render(request, 'watermark_tools/home.html')
 
 
+def _apply_options(request):
+    """Validated (watermark_type, position, opacity, rotation) of an apply request; raises ValueError"""
+    watermark_type = request.POST.get('watermark_type', 'text')
+    if watermark_type not in APPLY_WATERMARK_TYPES:
+        raise ValueError(f"watermark_type must be one of: {', '.join(APPLY_WATERMARK_TYPES)}")
+    try:
+        opacity = int(request.POST.get('opacity', 50))
+        rotation = int(request.POST.get('rotation', 0))
+        font_size = int(request.POST.get('font_size', 48))
+    except ValueError:
+        raise ValueError("opacity, rotation and font_size must be whole numbers")
+    if not 0 <= opacity <= 100:
+        raise ValueError("opacity must be between 0 and 100")
+    if watermark_type == 'text' and not 1 <= font_size <= MAX_FONT_SIZE:
+        raise ValueError(f"font_size must be between 1 and {MAX_FONT_SIZE}")
+    if watermark_type == 'image' and 'watermark_image' not in request.FILES:
+        raise ValueError("No watermark image provided")
+    return watermark_type, request.POST.get('position', 'center'), opacity, rotation
+
+
+def _build_mark(request, watermark_type, opacity):
+    """Watermark layer for an apply request with opacity applied.
+
+    Returns (mark, fit_to_image); fit_to_image marks uploaded watermark images,
+    which are shrunk to a quarter of each target image. mark is None for an
+    unknown watermark type.
+    """
+    if watermark_type == 'text':
+        text = request.POST.get('text', 'WATERMARK')
+        font_size = int(request.POST.get('font_size', 48))
+        # Cached glyph layer, shared by every image in the request
+        return render_text_mark(text, font_size, '#000000', opacity / 100), False
+
+    if watermark_type == 'image':
+        watermark_img = load_image(request.FILES['watermark_image'])
+        return set_mark_opacity(watermark_img, opacity / 100), True
+
+    return None, False
+
+
+def _watermark_image(image_file, mark, fit_to_image, position, rotation):
+    """Watermark one uploaded image and return it as PNG bytes"""
+    img = load_image(image_file)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    if mark is not None:
+        if fit_to_image:
+            # Resize watermark if needed (max 25% of original image)
+            max_size = min(img.size[0] // 4, img.size[1] // 4)
+            if mark.size[0] > max_size or mark.size[1] > max_size:
+                mark = mark.copy()
+                mark.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+        # Apply rotation if specified
+        if rotation != 0:
+            mark = mark.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
+
+        # Blend the mark into its bounding box only
+        x, y = calculate_position(position, img.size, mark.size)
+        composite_mark(img, mark, (x, y))
+
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def apply_watermark(request):
@@ -27,97 +108,49 @@ def apply_watermark(request):
             return JsonResponse({'error': 'No image provided'}, status=400)
         
         image = request.FILES['image']
-        watermark_type = request.POST.get('watermark_type', 'text')
-        position = request.POST.get('position', 'center')
-        opacity = int(request.POST.get('opacity', 50))
-        rotation = int(request.POST.get('rotation', 0))
+        
+        # Everything is validated before the job is recorded, so a rejected request leaves no row behind
+        try:
+            watermark_type, position, opacity, rotation = _apply_options(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        try:
+            # Reads the header only; dimensions are checked against the pixel budget
+            open_image(image)
+            image.seek(0)
+        except ImageTooLarge as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception:
+            return JsonResponse({'error': f'File {image.name} is not a valid image'}, status=400)
+        
+        try:
+            mark, fit_to_image = _build_mark(request, watermark_type, opacity)
+        except Exception as e:
+            return JsonResponse({'error': f'Invalid watermark image: {str(e)}'}, status=400)
         
         # Create watermark job
-        job = WatermarkJob.objects.create(
-            job_type=f'{watermark_type}_watermark',
-            file_type='image',
-            input_filename=image.name,
-            input_file_size=image.size,
-            watermark_position=position,
-            watermark_opacity=opacity / 100.0,
+        params = {
+            'file_type': 'image',
+            'watermark_position': position,
+            'watermark_opacity': opacity / 100.0,
+        }
+        if watermark_type == 'text':
+            params['watermark_text'] = request.POST.get('text', 'WATERMARK')
+            params['watermark_font_size'] = int(request.POST.get('font_size', 48))
+        job = Job.objects.create(
+            job_type=APPLY_WATERMARK_TYPES[watermark_type],
+            input_files=[{'name': image.name, 'size': image.size}],
+            params=params,
             status='processing'
         )
         
         try:
-            # Open image with PIL
-            img = Image.open(image)
-            img = img.convert('RGBA')
-            
-            # Create overlay for watermark
-            overlay = Image.new('RGBA', img.size, (255, 255, 255, 0))
-            draw = ImageDraw.Draw(overlay)
-            
-            if watermark_type == 'text':
-                # Text watermark
-                text = request.POST.get('text', 'WATERMARK')
-                font_size = int(request.POST.get('font_size', 48))
-                
-                try:
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                except:
-                    font = ImageFont.load_default()
-                
-                # Get text dimensions
-                bbox = draw.textbbox((0, 0), text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                # Calculate position
-                x, y = calculate_position(position, img.size, (text_width, text_height))
-                
-                # Draw text with opacity
-                text_color = (0, 0, 0, int(255 * opacity / 100))
-                draw.text((x, y), text, font=font, fill=text_color)
-                
-                job.watermark_text = text
-                job.watermark_font_size = font_size
-                
-            elif watermark_type == 'image':
-                # Image watermark
-                if 'watermark_image' not in request.FILES:
-                    return JsonResponse({'error': 'No watermark image provided'}, status=400)
-                
-                watermark_img = Image.open(request.FILES['watermark_image'])
-                watermark_img = watermark_img.convert('RGBA')
-                
-                # Resize watermark if needed (max 25% of original image)
-                max_size = min(img.size[0] // 4, img.size[1] // 4)
-                if watermark_img.size[0] > max_size or watermark_img.size[1] > max_size:
-                    watermark_img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                
-                # Apply opacity
-                if opacity < 100:
-                    alpha = watermark_img.split()[-1]
-                    alpha = alpha.point(lambda p: int(p * opacity / 100))
-                    watermark_img.putalpha(alpha)
-                
-                # Calculate position
-                x, y = calculate_position(position, img.size, watermark_img.size)
-                
-                # Paste watermark
-                overlay.paste(watermark_img, (x, y), watermark_img)
-            
-            # Apply rotation if specified
-            if rotation != 0:
-                overlay = overlay.rotate(rotation, expand=True)
-            
-            # Combine original image with watermark
-            watermarked = Image.alpha_composite(img, overlay)
-            watermarked = watermarked.convert('RGB')
-            
-            # Save to memory
-            img_buffer = io.BytesIO()
-            watermarked.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
+            watermarked = _watermark_image(image, mark, fit_to_image, position, rotation)
             
             # Return as HTTP response
             from django.http import HttpResponse
-            response = HttpResponse(img_buffer.getvalue(), content_type='image/png')
+            response = HttpResponse(watermarked, content_type='image/png')
             response['Content-Disposition'] = f'attachment; filename="watermarked_{image.name}"'
             
             # Update job
@@ -137,6 +170,75 @@ def apply_watermark(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def apply_watermark_batch(request):
+    """Apply the same watermark to several images and stream them back as a ZIP."""
+    try:
+        images = request.FILES.getlist('images')
+        if not images:
+            return JsonResponse({'error': 'No images provided'}, status=400)
+        
+        try:
+            watermark_type, position, opacity, rotation = _apply_options(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # Check every upload is an image before the response starts streaming
+        for image in images:
+            try:
+                # Reads the header only; dimensions are checked against the pixel budget
+                open_image(image)
+                image.seek(0)
+            except ImageTooLarge as e:
+                return JsonResponse({'error': f'{image.name}: {e}'}, status=400)
+            except Exception:
+                return JsonResponse({'error': f'File {image.name} is not a valid image'}, status=400)
+        
+        try:
+            mark, fit_to_image = _build_mark(request, watermark_type, opacity)
+        except Exception as e:
+            return JsonResponse({'error': f'Invalid watermark image: {str(e)}'}, status=400)
+        
+        job = Job.objects.create(
+            job_type=APPLY_WATERMARK_TYPES[watermark_type],
+            input_files=[{'name': image.name, 'size': image.size} for image in images],
+            params={
+                'file_type': 'image',
+                'watermark_position': position,
+                'watermark_opacity': opacity / 100.0,
+                'watermark_text': request.POST.get('text', 'WATERMARK') if watermark_type == 'text' else None,
+                'batch_size': len(images),
+            },
+            status='processing'
+        )
+        
+        def watermarked_images():
+            used_names = set()
+            try:
+                for index, image in enumerate(images):
+                    name = f"watermarked_{os.path.splitext(image.name)[0]}.png"
+                    if name in used_names:
+                        name = f"watermarked_{os.path.splitext(image.name)[0]}_{index + 1}.png"
+                    used_names.add(name)
+                    yield name, _watermark_image(image, mark, fit_to_image, position, rotation)
+                
+                job.status = 'completed'
+                job.output_filename = 'watermarked_images.zip'
+                job.completed_at = timezone.now()
+                job.save()
+            except Exception as e:
+                job.status = 'failed'
+                job.error_message = str(e)
+                job.save()
+                raise
+        
+        return zip_response(watermarked_images(), 'watermarked_images.zip')
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 def calculate_position(position, img_size, watermark_size):
     """Calculate watermark position based on position string."""
     img_width, img_height = img_size
@@ -176,45 +278,48 @@ def add_text_watermark(request):
         file_type = 'image' if file.content_type.startswith('image/') else 'pdf'
         
         # Create watermark job
-        job = WatermarkJob.objects.create(
+        job = Job.objects.create(
             job_type='text_watermark',
-            file_type=file_type,
-            input_filename=file.name,
-            input_file_size=file.size,
-            watermark_text=watermark_text,
-            watermark_position=position,
-            watermark_opacity=opacity,
-            watermark_font_size=font_size,
-            watermark_color=color
+            params={
+                'file_type': file_type,
+                'watermark_text': watermark_text,
+                'watermark_position': position,
+                'watermark_opacity': opacity,
+                'watermark_font_size': font_size,
+                'watermark_color': color,
+            }
         )
         
         # Save input file
         input_path = default_storage.save(f'watermark/input/{job.id}_{file.name}', ContentFile(file.read()))
-        job.input_file_path = input_path
+        job.input_files = [{'name': file.name, 'path': input_path, 'size': file.size}]
         job.status = 'processing'
         job.save()
         
         try:
+            # Copy the stored input to a local file for processing
+            with default_storage.open(input_path, 'rb') as f:
+                temp_path = f'/tmp/{file.name}'
+                with open(temp_path, 'wb') as temp_file:
+                    temp_file.write(f.read())
+
             if file_type == 'image':
                 # Process image watermark
-                with default_storage.open(input_path, 'rb') as f:
-                    temp_path = f'/tmp/{file.name}'
-                    with open(temp_path, 'wb') as temp_file:
-                        temp_file.write(f.read())
-                    
                 output_path = add_text_watermark_to_image(
                     temp_path, watermark_text, position, opacity, font_size, color
                 )
-                
-                # Save to storage
-                with open(output_path, 'rb') as output_file:
-                    output_path = default_storage.save(
-                        f'watermark/output/watermarked_{file.name}',
-                        ContentFile(output_file.read())
-                    )
             else:
-                # Process PDF watermark - simplified for now
-                output_path = input_path
+                # Process PDF watermark
+                output_path = add_text_watermark_to_pdf(
+                    temp_path, watermark_text, position, opacity, font_size, color
+                )
+            
+            # Save to storage
+            with open(output_path, 'rb') as output_file:
+                output_path = default_storage.save(
+                    f'watermark/output/watermarked_{file.name}',
+                    ContentFile(output_file.read())
+                )
             
             # Update job with success
             job.output_file_path = output_path
@@ -254,16 +359,14 @@ def remove_watermark_view(request):
         file_type = 'image' if file.content_type.startswith('image/') else 'pdf'
         
         # Create watermark job
-        job = WatermarkJob.objects.create(
+        job = Job.objects.create(
             job_type='remove_watermark',
-            file_type=file_type,
-            input_filename=file.name,
-            input_file_size=file.size
+            params={'file_type': file_type}
         )
         
         # Save input file
         input_path = default_storage.save(f'watermark/input/{job.id}_{file.name}', ContentFile(file.read()))
-        job.input_file_path = input_path
+        job.input_files = [{'name': file.name, 'path': input_path, 'size': file.size}]
         job.status = 'processing'
         job.save()
         
@@ -298,18 +401,18 @@ def remove_watermark_view(request):
 @require_http_methods(["GET"])
 def get_watermark_jobs(request):
     """Get recent watermark jobs."""
-    jobs = WatermarkJob.objects.all().order_by('-created_at')[:20]
+    jobs = Job.objects.filter(job_type__in=WATERMARK_JOB_TYPES).order_by('-created_at')[:20]
     
     jobs_data = []
     for job in jobs:
         jobs_data.append({
             'id': str(job.id),
             'job_type': job.job_type,
-            'file_type': job.file_type,
+            'file_type': job.params.get('file_type'),
             'status': job.status,
-            'input_filename': job.input_filename,
+            'input_filename': job.input_files[0]['name'] if job.input_files else None,
             'output_filename': job.output_filename,
-            'watermark_text': job.watermark_text,
+            'watermark_text': job.params.get('watermark_text'),
             'created_at': job.created_at.isoformat(),
             'completed_at': job.completed_at.isoformat() if job.completed_at else None,
             'error_message': job.error_message
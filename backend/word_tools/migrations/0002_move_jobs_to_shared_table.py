@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_word_jobs(apps, schema_editor):
+    """Move WordProcessingJob rows into the shared jobs table"""
+    WordProcessingJob = apps.get_model('word_tools', 'WordProcessingJob')
+    Job = apps.get_model('jobs', 'Job')
+
+    for old_job in WordProcessingJob.objects.all():
+        documents = list(old_job.input_files.all())
+        Job.objects.create(
+            id=old_job.id,
+            job_type=old_job.job_type,
+            status=old_job.status,
+            progress=100 if old_job.status == 'completed' else 0,
+            input_files=[
+                {'name': doc.filename, 'path': doc.file_path, 'size': doc.file_size}
+                for doc in documents
+            ],
+            params={'output_format': old_job.output_format},
+            output_file_path=old_job.output_file_path,
+            output_filename=old_job.output_filename,
+            output_content_type=(
+                'application/pdf' if old_job.output_format == 'pdf'
+                else 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            ),
+            completed_at=old_job.completed_at,
+            error_message=old_job.error_message,
+        )
+        # created_at is auto_now_add, so restore it separately
+        Job.objects.filter(id=old_job.id).update(created_at=old_job.created_at)
+
+        for doc in documents:
+            doc.job_id = old_job.id
+            doc.save(update_fields=['job'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+        ('word_tools', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worddocument',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='word_documents', to='jobs.job'),
+        ),
+        migrations.RunPython(copy_word_jobs, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='WordProcessingJob',
+        ),
+    ]
@@ -0,0 +1,53 @@
+import os
+import shutil
+from jobs.registry import register_task
+
+
+# .utils needs the Windows-only COM bindings, so it is imported inside the
+# handlers to keep task registration working on every platform.
+
+@register_task('word_to_pdf')
+def word_to_pdf_task(job, progress):
+    """Convert the uploaded Word document of a job to PDF"""
+    from .utils import convert_word_to_pdf
+
+    input_file = job.input_files[0]
+
+    progress(10, 'Converting to PDF')
+    converted_path = convert_word_to_pdf(input_file['path'], input_file['name'])
+
+    output_path = os.path.join(job.output_dir, os.path.basename(converted_path))
+    shutil.move(converted_path, output_path)
+    shutil.rmtree(os.path.dirname(converted_path), ignore_errors=True)
+
+    return {
+        'output_path': output_path,
+        'output_filename': os.path.basename(output_path),
+        'content_type': 'application/pdf',
+    }
+
+
+@register_task('merge_word')
+def merge_word_task(job, progress):
+    """Merge the uploaded Word documents of a job"""
+    from .utils import merge_word_documents
+
+    output_format = job.params.get('output_format', 'pdf')
+
+    progress(10, 'Merging documents')
+    merged_path = merge_word_documents([f['path'] for f in job.input_files], output_format)
+
+    output_path = os.path.join(job.output_dir, os.path.basename(merged_path))
+    shutil.move(merged_path, output_path)
+    shutil.rmtree(os.path.dirname(merged_path), ignore_errors=True)
+
+    if output_format == 'pdf':
+        content_type = 'application/pdf'
+    else:
+        content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+    return {
+        'output_path': output_path,
+        'output_filename': os.path.basename(output_path),
+        'content_type': content_type,
+    }
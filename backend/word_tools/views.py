@@ -9,14 +9,55 @@ from rest_framework.response import Response
 from rest_framework import status
 import os
 import json
-from .models import WordDocument, WordProcessingJob
-from .utils import convert_word_to_pdf, merge_word_documents
-from .serializers import WordDocumentSerializer, WordProcessingJobSerializer
-import tempfile
+from jobs.models import Job
+from jobs.queue import create_job, submit_job, run_job, delete_job_files, delete_job_inputs
+from jobs.serializers import JobSerializer
+from jobs.utils import wants_async, job_accepted_payload
+from .models import WordDocument
+from .serializers import WordDocumentSerializer
 import logging
 
 logger = logging.getLogger(__name__)
 
+WORD_JOB_TYPES = ['word_to_pdf', 'merge_word']
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def _record_documents(job):
+    """Create WordDocument records for the input files of a job"""
+    for input_file in job.input_files:
+        WordDocument.objects.create(
+            filename=input_file['name'],
+            file_path=input_file['path'],
+            file_size=input_file['size'],
+            job=job
+        )
+
+
+def _run_or_queue(request, job):
+    """Queue the job when asked to, otherwise process it within the request"""
+    if wants_async(request):
+        submit_job(job)
+        return Response(job_accepted_payload(job), status=status.HTTP_202_ACCEPTED)
+
+    run_job(job.id)
+    job.refresh_from_db()
+    # The uploads are no longer needed; an output stays for download until JOB_RETENTION
+    if job.status == 'failed':
+        delete_job_files(job)
+    else:
+        delete_job_inputs(job)
+    return None
+
 
 @api_view(['POST'])
 def convert_word_to_pdf_view(request):
@@ -32,57 +73,29 @@ def convert_word_to_pdf_view(request):
             return Response({'error': 'File must be a Word document (.doc or .docx)'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        # Save uploaded file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-            for chunk in file.chunks():
-                temp_file.write(chunk)
-            temp_path = temp_file.name
-        
-        # Create WordDocument record
-        word_doc = WordDocument.objects.create(
-            filename=file.name,
-            file_path=temp_path,
-            file_size=file.size
+        # Create processing job with the uploaded file
+        job = create_job(
+            'word_to_pdf',
+            files=[file],
+            params={'output_format': 'pdf'},
+            ip_address=get_client_ip(request)
         )
+        _record_documents(job)
         
-        # Create processing job
-        job = WordProcessingJob.objects.create(
-            job_type='word_to_pdf',
-            output_format='pdf'
-        )
-        job.input_files.add(word_doc)
+        queued_response = _run_or_queue(request, job)
+        if queued_response:
+            return queued_response
         
-        # Convert to PDF
-        try:
-            job.status = 'processing'
-            job.save()
-            
-            output_path = convert_word_to_pdf(temp_path, file.name)
-            
-            job.output_file_path = output_path
-            job.output_filename = os.path.basename(output_path)
-            job.status = 'completed'
-            job.completed_at = timezone.now()
-            job.save()
-            
-            return Response({
-                'success': True,
-                'job_id': str(job.id),
-                'download_url': f'/api/word-tools/download/{job.id}/'
-            })
-            
-        except Exception as e:
-            job.status = 'failed'
-            job.error_message = str(e)
-            job.save()
-            logger.error(f"Word to PDF conversion failed: {str(e)}")
-            return Response({'error': f'Conversion failed: {str(e)}'}, 
+        if job.status == 'failed':
+            logger.error(f"Word to PDF conversion failed: {job.error_message}")
+            return Response({'error': f'Conversion failed: {job.error_message}'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        return Response({
+            'success': True,
+            'job_id': str(job.id),
+            'download_url': f'/api/word-tools/download/{job.id}/'
+        })
                 
     except Exception as e:
         logger.error(f"Word to PDF view error: {str(e)}")
@@ -106,69 +119,35 @@ def merge_word_documents_view(request):
                           status=status.HTTP_400_BAD_REQUEST)
         
         # Validate all files are Word documents
-        temp_paths = []
-        word_docs = []
-        
         for file in files:
             if not file.name.lower().endswith(('.doc', '.docx')):
                 return Response({'error': f'File {file.name} must be a Word document (.doc or .docx)'}, 
                               status=status.HTTP_400_BAD_REQUEST)
-            
-            # Save uploaded file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-                for chunk in file.chunks():
-                    temp_file.write(chunk)
-                temp_paths.append(temp_file.name)
-            
-            # Create WordDocument record
-            word_doc = WordDocument.objects.create(
-                filename=file.name,
-                file_path=temp_file.name,
-                file_size=file.size
-            )
-            word_docs.append(word_doc)
-        
-        # Create processing job
-        job = WordProcessingJob.objects.create(
-            job_type='merge_word',
-            output_format=output_format
+        
+        # Create processing job with the uploaded files
+        job = create_job(
+            'merge_word',
+            files=files,
+            params={'output_format': output_format},
+            ip_address=get_client_ip(request)
         )
-        for word_doc in word_docs:
-            job.input_files.add(word_doc)
+        _record_documents(job)
         
-        # Merge documents
-        try:
-            job.status = 'processing'
-            job.save()
-            
-            output_path = merge_word_documents(temp_paths, output_format)
-            
-            job.output_file_path = output_path
-            job.output_filename = os.path.basename(output_path)
-            job.status = 'completed'
-            job.completed_at = timezone.now()
-            job.save()
-            
-            return Response({
-                'success': True,
-                'job_id': str(job.id),
-                'download_url': f'/api/word-tools/download/{job.id}/',
-                'output_format': output_format
-            })
-            
-        except Exception as e:
-            job.status = 'failed'
-            job.error_message = str(e)
-            job.save()
-            logger.error(f"Word merge failed: {str(e)}")
-            return Response({'error': f'Merge failed: {str(e)}'}, 
+        queued_response = _run_or_queue(request, job)
+        if queued_response:
+            return queued_response
+        
+        if job.status == 'failed':
+            logger.error(f"Word merge failed: {job.error_message}")
+            return Response({'error': f'Merge failed: {job.error_message}'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        finally:
-            # Clean up temporary files
-            for temp_path in temp_paths:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+        return Response({
+            'success': True,
+            'job_id': str(job.id),
+            'download_url': f'/api/word-tools/download/{job.id}/',
+            'output_format': output_format
+        })
                 
     except Exception as e:
         logger.error(f"Word merge view error: {str(e)}")
@@ -180,7 +159,7 @@ def merge_word_documents_view(request):
 def download_result(request, job_id):
     """Download the processed file"""
     try:
-        job = WordProcessingJob.objects.get(id=job_id, status='completed')
+        job = Job.objects.get(id=job_id, job_type__in=WORD_JOB_TYPES, status='completed')
         
         if not job.output_file_path or not os.path.exists(job.output_file_path):
             raise Http404("File not found")
@@ -188,17 +167,14 @@ def download_result(request, job_id):
         with open(job.output_file_path, 'rb') as f:
             response = HttpResponse(f.read())
             
-        # Set content type based on output format
-        if job.output_format == 'pdf':
-            response['Content-Type'] = 'application/pdf'
-        else:
-            response['Content-Type'] = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        
+        response['Content-Type'] = job.output_content_type
         response['Content-Disposition'] = f'attachment; filename="{job.output_filename}"'
         return response
         
-    except WordProcessingJob.DoesNotExist:
+    except Job.DoesNotExist:
         raise Http404("Job not found")
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         return Response({'error': 'Download failed'}, 
@@ -209,8 +185,9 @@ def download_result(request, job_id):
 def job_status(request, job_id):
     """Get job status"""
     try:
-        job = WordProcessingJob.objects.get(id=job_id)
-        serializer = WordProcessingJobSerializer(job)
-        return Response(serializer.data)
-    except WordProcessingJob.DoesNotExist:
+        job = Job.objects.get(id=job_id, job_type__in=WORD_JOB_TYPES)
+        data = JobSerializer(job).data
+        data['input_files'] = WordDocumentSerializer(job.word_documents.all(), many=True).data
+        return Response(data)
+    except Job.DoesNotExist:
         raise Http404("Job not found")
@@ -33,12 +33,12 @@ def check_ffmpeg_available():
             pass
     return False
 
-def download_youtube_video(url, format='mp4', quality='720p'):
+def download_youtube_video(url, format='mp4', quality='720p', output_dir=None):
     """Download YouTube video and convert to specified format with robust error handling"""
     temp_dir = None
     try:
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp()
+        # Download into the caller's directory, or a temporary one
+        temp_dir = output_dir or tempfile.mkdtemp()
         
         # Get FFmpeg path
         ffmpeg_path = get_ffmpeg_path()
@@ -174,9 +174,9 @@ def download_youtube_video(url, format='mp4', quality='720p'):
             raise Exception(f"YouTube download failed after {max_attempts} attempts: {str(last_error)}")
         
     except Exception as e:
-        # Clean up temp directory on error
+        # Clean up temp directory on error (the caller owns output_dir)
         try:
-            if temp_dir and os.path.exists(temp_dir):
+            if temp_dir and not output_dir and os.path.exists(temp_dir):
                 shutil.rmtree(temp_dir)
         except:
             pass
@@ -1,9 +1,9 @@
-import os
-import shutil
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import FileResponse
+from django.utils.decorators import method_decorator
+from core.scratch import uses_scratch
 from .serializers import YouTubeConversionSerializer
 from .models import ConversionHistory
 from .utils import download_youtube_video, validate_youtube_url, get_video_info
@@ -18,10 +18,10 @@ def get_client_ip(request):
     return ip
 
 class YouTubeConverterView(APIView):
+    @method_decorator(uses_scratch)
     def post(self, request):
         serializer = YouTubeConversionSerializer(data=request.data)
         if serializer.is_valid():
-            file_path = None
             try:
                 url = serializer.validated_data['url']
                 format = serializer.validated_data['format']
@@ -34,9 +34,8 @@ class YouTubeConverterView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Download and convert
-                result = download_youtube_video(url, format, quality)
-                file_path = result['file_path']
+                # Download and convert into the request's scratch directory
+                result = download_youtube_video(url, format, quality, output_dir=request.scratch.root)
                 
                 # Save to history
                 history = ConversionHistory.objects.create(
@@ -48,28 +47,14 @@ class YouTubeConverterView(APIView):
                     ip_address=get_client_ip(request)
                 )
                 
-                # Return file
-                response = FileResponse(
+                # Return file; the download is removed once it has been sent
+                return FileResponse(
                     open(result['file_path'], 'rb'),
                     as_attachment=True,
                     filename=result['filename']
                 )
                 
-                # Add custom header to track the temp directory for later cleanup
-                response['X-Temp-Dir'] = os.path.dirname(result['file_path'])
-                
-                return response
-                
             except Exception as e:
-                # Cleanup on error
-                if file_path:
-                    try:
-                        temp_dir = os.path.dirname(file_path)
-                        if os.path.exists(temp_dir):
-                            shutil.rmtree(temp_dir)
-                    except:
-                        pass
-                
                 # Log error for debugging
                 import logging
                 logger = logging.getLogger(__name__)